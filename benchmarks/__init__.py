@@ -0,0 +1,5 @@
+"""pdfwork 的性能基准测试
+
+用 :mod:`benchmarks.corpus` 在本地生成可复现的合成 PDF 语料，
+再用 ``python -m benchmarks.run`` 对各个 ``action_*`` 函数计时并与基线比较。
+"""
@@ -0,0 +1,126 @@
+"""生成可复现的合成 PDF 语料
+
+同样的参数与随机种子总是生成内容相同的文件（文件 ID 除外）。
+"""
+import random
+import zlib
+from dataclasses import asdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict
+from typing import List
+
+from pikepdf import Dictionary  # type: ignore
+from pikepdf import Name
+from pikepdf import OutlineItem
+from pikepdf import Pdf
+
+__all__ = ("CorpusSpec", "make_pdf", "make_corpus", "make_outline_text")
+
+IMAGE_SIZE = 64
+
+
+@dataclass(frozen=True)
+class CorpusSpec:
+    """语料参数
+
+    :param int pages: 每个文件的页数
+    :param int files: 文件数
+    :param bool shared_images: 为 True 时所有页面共享同一个图像对象；
+        为 False 时每页一个内容相同但彼此独立的图像对象，用于测试去重
+    :param int outline_depth: 书签树的深度，为 0 时不生成书签
+    :param int outline_width: 书签树每个节点的子节点数
+    :param int seed: 随机种子
+    """
+    pages: int = 200
+    files: int = 20
+    shared_images: bool = False
+    outline_depth: int = 3
+    outline_width: int = 5
+    seed: int = 0
+
+    def asdict(self) -> Dict:
+        return asdict(self)
+
+
+def _image(pdf: Pdf, data: bytes):
+    return pdf.make_stream(zlib.compress(data),
+                           Type=Name.XObject,
+                           Subtype=Name.Image,
+                           Width=IMAGE_SIZE,
+                           Height=IMAGE_SIZE,
+                           BitsPerComponent=8,
+                           ColorSpace=Name.DeviceGray,
+                           Filter=Name.FlateDecode)
+
+
+def _outline_items(spec: CorpusSpec, pages: int, level: int,
+                   counter: List[int]) -> List[OutlineItem]:
+    items = []
+    for i in range(spec.outline_width):
+        counter[0] += 1
+        item = OutlineItem(f"第 {counter[0]} 节", counter[0] % pages, "Fit")
+        if level + 1 < spec.outline_depth:
+            item.children.extend(
+                _outline_items(spec, pages, level + 1, counter))
+        items.append(item)
+    return items
+
+
+def make_pdf(path: Path, spec: CorpusSpec, index: int = 0) -> Path:
+    """按照 ``spec`` 生成一个 PDF 文件
+
+    :param int index: 文件序号，与随机种子一起决定文件内容
+    """
+    rnd = random.Random(spec.seed * 100003 + index)
+    pixels = bytes(rnd.getrandbits(8) for _ in range(IMAGE_SIZE * IMAGE_SIZE))
+    font = Dictionary(Type=Name.Font,
+                      Subtype=Name.Type1,
+                      BaseFont=Name.Helvetica)
+
+    pdf = Pdf.new()
+    shared = _image(pdf, pixels)
+    for i in range(spec.pages):
+        pdf.add_blank_page()
+        page = pdf.pages[-1]
+        lines = b"".join(b"BT /F1 10 Tf 40 %d Td (file %d page %d line %d) Tj ET\n"
+                         % (760 - 12 * j, index, i, j) for j in range(40))
+        page.Contents = pdf.make_stream(lines + b"q 64 0 0 64 40 40 cm /Im0 Do Q")
+        page.Resources = Dictionary(
+            Font=Dictionary(F1=font),
+            XObject=Dictionary(
+                Im0=shared if spec.shared_images else _image(pdf, pixels)))
+
+    if spec.outline_depth > 0:
+        with pdf.open_outline() as outline:
+            outline.root.extend(_outline_items(spec, spec.pages, 0, [0]))
+
+    pdf.save(path, static_id=True)
+    return path
+
+
+def make_corpus(workdir: Path, spec: CorpusSpec) -> List[Path]:
+    """在 ``workdir`` 中生成 ``spec.files`` 个 PDF 文件
+    """
+    workdir.mkdir(parents=True, exist_ok=True)
+    return [
+        make_pdf(workdir / f"{i:04d}.pdf", spec, i) for i in range(spec.files)
+    ]
+
+
+def make_outline_text(spec: CorpusSpec, pages: int) -> str:
+    """生成与 ``spec`` 的书签树形状相同的书签描述文本
+    """
+    lines = []
+    counter = 0
+
+    def walk(level: int):
+        nonlocal counter
+        for _ in range(spec.outline_width):
+            counter += 1
+            lines.append("    " * level + f"第{counter}节 @ {counter % pages + 1}\n")
+            if level + 1 < spec.outline_depth:
+                walk(level + 1)
+
+    walk(0)
+    return "".join(lines)
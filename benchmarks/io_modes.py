@@ -0,0 +1,106 @@
+"""比较各种读取方式的吞吐量与峰值 RSS
+
+用法::
+
+    python -m benchmarks.io_modes --pages 5000
+
+每种方式都在一个新启动（spawn）的子进程中运行：打开文件，然后读取每一页的内容流
+与图像的原始数据。``pipe`` 表示从管道读取，需要先写入临时文件，见 :mod:`pdfwork.access` 。
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Tuple
+
+from .corpus import CorpusSpec
+from .corpus import make_pdf
+from .run import _peak_rss
+
+MODES = ("default", "mmap", "buffered", "pipe")
+
+
+def _feed(path: Path, fd: int):
+    with open(path, "rb") as src, os.fdopen(fd, "wb") as dst:
+        while chunk := src.read(1024 * 1024):
+            dst.write(chunk)
+
+
+def _read_all(mode: str, path: Path) -> int:
+    from pdfwork import access
+    if mode == "pipe":
+        r, w = os.pipe()
+        feeder = threading.Thread(target=_feed, args=(path, w))
+        feeder.start()
+        with os.fdopen(r, "rb") as src:
+            pdf = access.open_stream(src)
+        feeder.join()
+    else:
+        access.set_mode(mode)
+        pdf = access.open_pdf(path)
+
+    size = 0
+    for page in pdf.pages:
+        size += len(page.Contents.read_raw_bytes())
+        for _, xobject in page.Resources.XObject.items():
+            size += len(xobject.read_raw_bytes())
+    pdf.close()
+    return size
+
+
+def _child(mode: str, path: Path, queue):
+    try:
+        start = time.perf_counter()
+        _read_all(mode, path)
+        elapsed = time.perf_counter() - start
+    except BaseException:
+        queue.put(traceback.format_exc())
+        raise
+    queue.put((elapsed, _peak_rss()))
+
+
+def run_mode(mode: str, path: Path) -> Tuple[float, int]:
+    """在新的子进程中以 ``mode`` 读取文件
+
+    :returns: (耗时秒数, 峰值 RSS KiB)
+    """
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(mode, path, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    if isinstance(result, str):
+        raise RuntimeError(f"读取方式 {mode} 失败：\n{result}")
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.io_modes",
+                                     description="读取方式的性能比较")
+    parser.add_argument("--pages", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3, help="每种方式运行的次数，取最短耗时")
+    parser.add_argument("--mode", action="append", choices=MODES, help="只运行指定的方式")
+    args = parser.parse_args(argv)
+
+    with TemporaryDirectory(prefix="pdfwork-bench-") as tmp:
+        path = Path(tmp) / "large.pdf"
+        make_pdf(path, CorpusSpec(pages=args.pages, outline_depth=0))
+        mib = path.stat().st_size / 1024 / 1024
+        print(f"{args.pages} 页，{mib:.1f} MiB")
+        for mode in args.mode or MODES:
+            samples = [run_mode(mode, path) for _ in range(args.repeat)]
+            seconds = min(s for s, _ in samples)
+            rss = max(r for _, r in samples)
+            print(f"{mode:10s} {seconds * 1000:9.1f} ms {mib / seconds:8.1f} MiB/s "
+                  f"{rss / 1024:8.1f} MiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
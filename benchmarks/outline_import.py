@@ -0,0 +1,69 @@
+"""比较两种导入书签的方式：逐个创建 ``OutlineItem`` 与直接构建 ``/Outlines`` 字典
+
+用法::
+
+    python -m benchmarks.outline_import --width 10 --depth 4
+
+书签树的每一层有 ``width`` 个节点，共 ``depth`` 层。
+递归实现在书签树很深时会超出递归深度，这种情况下只报告 bulk 的耗时。
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from pikepdf import Pdf  # type: ignore
+
+from pdfwork.outline import outline_decode
+from pdfwork.utils import import_outline
+from pdfwork.utils import import_outline_bulk
+
+from .corpus import CorpusSpec
+from .corpus import make_outline_text
+from .corpus import make_pdf
+
+
+def measure(func, path: Path, text: str, repeat: int) -> float:
+    """返回 ``repeat`` 次中最短的耗时，包括保存，但不包括解析与打开文件"""
+    best = float("inf")
+    for _ in range(repeat):
+        root = outline_decode(text.splitlines(keepends=True))
+        with Pdf.open(path) as pdf:
+            start = time.perf_counter()
+            func(pdf, root, 0)
+            pdf.save(path.with_suffix(".out.pdf"))
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.outline_import",
+                                     description="书签导入的性能比较")
+    parser.add_argument("--width", type=int, default=10)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    spec = CorpusSpec(pages=args.pages,
+                      outline_depth=args.depth,
+                      outline_width=args.width)
+    text = make_outline_text(spec, args.pages)
+    print(f"{text.count(chr(10))} 个书签，{args.depth} 层，{args.pages} 页")
+
+    with TemporaryDirectory(prefix="pdfwork-bench-") as tmp:
+        path = Path(tmp) / "in.pdf"
+        make_pdf(path, spec, 0)
+        for func in (import_outline, import_outline_bulk):
+            try:
+                seconds = measure(func, path, text, args.repeat)
+            except RecursionError:
+                print(f"{func.__name__:20s} 超出递归深度")
+                continue
+            print(f"{func.__name__:20s} {seconds * 1000:9.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
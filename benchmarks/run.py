@@ -0,0 +1,225 @@
+"""对 ``action_*`` 函数计时，并与保存的基线比较
+
+用法::
+
+    # 与 benchmarks/baseline.json 比较，有回退时以状态码 1 退出
+    python -m benchmarks.run
+
+    # 重新记录基线
+    python -m benchmarks.run --update-baseline
+
+    # 调整语料参数（与基线参数不同时不做比较）
+    python -m benchmarks.run --pages 1000 --files 50 --shared-images
+
+每个用例都在一个新启动（spawn）的子进程中运行，以便单独记录峰值 RSS。
+计时只包括 ``action_*`` 函数本身，不包括解释器启动与语料生成。
+基线与机器相关，应在同一台机器上记录和比较。
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+import traceback
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+from .corpus import CorpusSpec
+from .corpus import make_corpus
+from .corpus import make_outline_text
+
+BASELINE = Path(__file__).parent / "baseline.json"
+
+
+def _peak_rss() -> int:
+    "当前进程的峰值 RSS，单位为 KiB"
+    # Linux 上 ru_maxrss 在 exec 之后仍然保留父进程的数值，
+    # 子进程需要从 VmHWM 读取自己的峰值
+    try:
+        with open("/proc/self/status", "rt") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 上以字节为单位
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def case_merge(files: List[Path], workdir: Path):
+    from pdfwork.actions import action_merge
+    action_merge([f.as_posix() for f in files],
+                 (workdir / "merged.pdf").as_posix())
+
+
+def case_split(files: List[Path], workdir: Path):
+    from pdfwork.actions import action_split
+    action_split(files[0].as_posix(), (workdir / "split").as_posix())
+
+
+def case_optimize(files: List[Path], workdir: Path):
+    from pdfwork.actions import action_optimize
+    action_optimize(files[0].as_posix(), (workdir / "optimized.pdf").as_posix())
+
+
+def case_import_outline(files: List[Path], workdir: Path):
+    from pdfwork.actions import action_import_outline
+    action_import_outline(files[0].as_posix(), (files[0].parent / "outline.txt").as_posix(),
+                          (workdir / "imported.pdf").as_posix())
+
+
+def case_export_outline(files: List[Path], workdir: Path):
+    from pdfwork.actions import action_export_outline
+    action_export_outline(files[0].as_posix(), (workdir / "exported.txt").as_posix())
+
+
+def case_erase_outline(files: List[Path], workdir: Path):
+    from pdfwork.actions import action_erase_outline
+    action_erase_outline(files[0].as_posix(), (workdir / "erased.pdf").as_posix())
+
+
+CASES: Dict[str, Callable[[List[Path], Path], None]] = {
+    "merge": case_merge,
+    "split": case_split,
+    "optimize": case_optimize,
+    "import_outline": case_import_outline,
+    "export_outline": case_export_outline,
+    "erase_outline": case_erase_outline,
+}
+
+
+def _child(name: str, files: List[Path], workdir: Path, queue):
+    # 进度条输出到 stderr，不计入结果
+    sys.stderr = open(os.devnull, "w")
+    sys.stdout = open(os.devnull, "w")
+    try:
+        start = time.perf_counter()
+        CASES[name](files, workdir)
+        elapsed = time.perf_counter() - start
+    except BaseException:
+        queue.put(traceback.format_exc())
+        raise
+    queue.put((elapsed, _peak_rss()))
+
+
+def run_case(name: str, files: List[Path], workdir: Path) -> Tuple[float, int]:
+    """在新的子进程中运行一个用例
+
+    :returns: (耗时秒数, 峰值 RSS KiB)
+    """
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    casedir = workdir / name
+    casedir.mkdir()
+    proc = ctx.Process(target=_child, args=(name, files, casedir, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    if isinstance(result, str):
+        raise RuntimeError(f"用例 {name} 失败：\n{result}")
+    return result
+
+
+def run(spec: CorpusSpec, repeat: int, cases: List[str]) -> Dict[str, Dict]:
+    results: Dict[str, Dict] = {}
+    with TemporaryDirectory(prefix="pdfwork-bench-") as tmp:
+        root = Path(tmp)
+        files = make_corpus(root / "corpus", spec)
+        (root / "corpus" / "outline.txt").write_text(make_outline_text(
+            spec, spec.pages),
+                                                     encoding="utf-8")
+        for name in cases:
+            samples = []
+            for i in range(repeat):
+                workdir = root / f"run{i}"
+                workdir.mkdir(exist_ok=True)
+                samples.append(run_case(name, files, workdir))
+            results[name] = {
+                "seconds": round(min(s for s, _ in samples), 4),
+                "peak_rss_kib": max(r for _, r in samples),
+            }
+            print(f"{name:16s} {results[name]['seconds'] * 1000:9.1f} ms "
+                  f"{results[name]['peak_rss_kib'] / 1024:8.1f} MiB")
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict],
+            tolerance: float) -> List[str]:
+    """返回所有超出基线 ``tolerance`` 倍的指标
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric in ("seconds", "peak_rss_kib"):
+            limit = baseline[name][metric] * tolerance
+            if result[metric] > limit:
+                regressions.append(
+                    f"{name}.{metric}: {result[metric]:.4g} > {limit:.4g} "
+                    f"(基线 {baseline[name][metric]:.4g} × {tolerance})")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run",
+                                     description="pdfwork 性能基准测试")
+    defaults = CorpusSpec()
+    parser.add_argument("--pages", type=int, default=defaults.pages)
+    parser.add_argument("--files", type=int, default=defaults.files)
+    parser.add_argument("--shared-images", action="store_true")
+    parser.add_argument("--outline-depth", type=int, default=defaults.outline_depth)
+    parser.add_argument("--outline-width", type=int, default=defaults.outline_width)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例运行的次数，取最短耗时")
+    parser.add_argument("--case", action="append", choices=list(CASES), help="只运行指定的用例")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=1.5, help="允许超出基线的倍数")
+    parser.add_argument("--update-baseline", action="store_true", help="将本次结果写入基线")
+    args = parser.parse_args(argv)
+
+    spec = CorpusSpec(pages=args.pages,
+                      files=args.files,
+                      shared_images=args.shared_images,
+                      outline_depth=args.outline_depth,
+                      outline_width=args.outline_width,
+                      seed=args.seed)
+    results = run(spec, args.repeat, args.case or list(CASES))
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps({
+            "corpus": spec.asdict(),
+            "results": results
+        },
+                                            indent=2,
+                                            ensure_ascii=False) + "\n",
+                                 encoding="utf-8")
+        print(f"已写入基线 {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"基线 {args.baseline} 不存在，使用 --update-baseline 记录")
+        return 0
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    if baseline["corpus"] != spec.asdict():
+        print("语料参数与基线不同，不做比较")
+        return 0
+
+    regressions = compare(results, baseline["results"], args.tolerance)
+    if regressions:
+        print("性能回退：")
+        for line in regressions:
+            print("    " + line)
+        return 1
+    print("未发现性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""命令行冷启动耗时
+
+用法::
+
+    # 超出预算时以状态码 1 退出
+    python -m benchmarks.startup
+
+    # 在较慢的机器上放宽预算
+    python -m benchmarks.startup --scale 2
+
+每次都启动一个新的解释器运行 ``pdfwork`` 命令，取多次运行的中位数，
+减去空解释器（``python -c pass``）的启动耗时后与 :data:`BUDGETS` 比较。
+``outline export`` 使用一个 50 页、带三层书签的合成 PDF，包括打开文件与导出书签的耗时。
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Dict
+from typing import List
+
+from .corpus import CorpusSpec
+from .corpus import make_pdf
+
+# 各命令在空解释器之外的耗时上限，单位为毫秒。
+# 预算留有余量，但重新在模块级导入 pikepdf、tqdm 或 rich 都会使其超出
+BUDGETS: Dict[str, float] = {
+    "--help": 250,
+    "version": 250,
+    "outline export": 350,
+}
+
+_CLI = "import sys; from pdfwork.cli import cli_main; cli_main(prog_name='pdfwork')"
+
+
+def _commands(pdf: Path) -> Dict[str, List[str]]:
+    return {
+        "--help": ["--help"],
+        "version": ["version"],
+        "outline export": ["outline", "export", pdf.as_posix()],
+    }
+
+
+def measure(argv: List[str], repeat: int) -> float:
+    """在新的解释器中运行 ``repeat`` 次，返回耗时的中位数（秒）
+
+    :param argv: 传给 ``python`` 的参数
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *argv],
+                       stdout=subprocess.DEVNULL,
+                       check=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup",
+                                     description="命令行冷启动耗时")
+    parser.add_argument("--repeat", type=int, default=10, help="每个命令运行的次数，取中位数")
+    parser.add_argument("--scale", type=float, default=1.0, help="预算的倍数")
+    args = parser.parse_args(argv)
+
+    with TemporaryDirectory(prefix="pdfwork-bench-") as tmp:
+        pdf = make_pdf(Path(tmp) / "outlined.pdf",
+                       CorpusSpec(pages=50, outline_depth=3, outline_width=3))
+        base = measure(["-c", "pass"], args.repeat)
+        print(f"{'python -c pass':24s} {base * 1000:8.1f} ms")
+
+        over = []
+        for name, command in _commands(pdf).items():
+            seconds = measure(["-c", _CLI, *command], args.repeat) - base
+            budget = BUDGETS[name] * args.scale
+            flag = "" if seconds * 1000 <= budget else "  超出预算"
+            print(f"{'pdfwork ' + name:24s} {seconds * 1000:8.1f} ms"
+                  f"  (预算 {budget:.0f} ms){flag}")
+            if flag:
+                over.append(name)
+
+    if over:
+        print(f"超出预算：{', '.join(over)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
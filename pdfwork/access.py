@@ -0,0 +1,127 @@
+"""打开输入文件的方式
+
+所有命令都通过 :func:`open_pdf` 打开输入文件，读取方式由全局设置决定
+（命令行中为 ``pdfwork --io-mode MODE``）：
+
++ ``default``：由 pikepdf 决定
++ ``mmap``：内存映射。页面数据直接从页缓存中读取，不复制到进程的堆上，
+  多 GB 的扫描件常驻内存（RSS）中只计入实际访问过的页，并且可以被系统回收
++ ``buffered``：通过文件句柄按块读取。不依赖内存映射，适合网络文件系统，
+  或者文件可能在处理期间被其他程序截断的情况
+
+路径为 ``-`` 时从 stdin 读取。qpdf 需要随机访问输入，因此只有在 stdin 不可定位
+（管道）时才会先将其写入临时文件；stdin 重定向自普通文件时直接读取。
+命名管道（例如 shell 的 ``<(...)``）也按同样的方式处理。
+通过 Python 文件对象逐块读取比直接读取文件慢数倍，因此除非指定了 ``buffered``，
+这些文件都以内存映射的方式读取。
+
+命令行在解析选项时就需要 :func:`set_mode` ，因此 pikepdf 推迟到第一次打开文件时才导入。
+"""
+import os
+import shutil
+import stat
+import sys
+from tempfile import TemporaryFile
+from typing import IO
+from typing import TYPE_CHECKING
+from typing import Union
+
+if TYPE_CHECKING:
+    # mypy 无法导入类型声明
+    from pikepdf import Pdf  # type: ignore
+
+__all__ = ("MODES", "STDIN", "set_mode", "get_mode", "is_stdin", "open_pdf",
+           "open_stream", "spool")
+
+MODES = ("default", "mmap", "buffered")
+
+# 表示 stdin 的路径
+STDIN = "-"
+
+# pikepdf 的 AccessMode 名称
+_ACCESS_MODES = {"default": "default", "mmap": "mmap", "buffered": "stream"}
+
+_mode = "default"
+
+
+def set_mode(mode: str):
+    """设置打开输入文件的方式
+
+    :raises ValueError: 未知的方式
+    """
+    global _mode
+    if mode not in MODES:
+        raise ValueError(f"未知的读取方式 {mode!r}，可选：{', '.join(MODES)}")
+    _mode = mode
+
+
+def get_mode() -> str:
+    return _mode
+
+
+def is_stdin(path: Union[str, os.PathLike]) -> bool:
+    return str(path) == STDIN
+
+
+def _seekable(f: IO[bytes]) -> bool:
+    try:
+        return f.seekable() and stat.S_ISREG(os.fstat(f.fileno()).st_mode)
+    except (OSError, ValueError):
+        return False
+
+
+def spool(src: IO[bytes]) -> IO[bytes]:
+    """返回可以随机访问的 ``src``
+
+    ``src`` 是普通文件时直接返回；否则将其全部内容复制到临时文件中。
+    """
+    if _seekable(src):
+        return src
+    buf = TemporaryFile()
+    shutil.copyfileobj(src, buf, 1024 * 1024)
+    buf.seek(0)
+    return buf
+
+
+def _access_mode(mode: str):
+    import pikepdf  # type: ignore
+    access_mode = getattr(pikepdf, "AccessMode", None)
+    if access_mode is None:
+        return None
+    return getattr(access_mode, _ACCESS_MODES[mode])
+
+
+def open_stream(src: IO[bytes], **kwargs) -> "Pdf":
+    """从文件对象打开 PDF 文件，不可定位的文件对象会先写入临时文件，见 :func:`spool`
+    """
+    from pikepdf import Pdf  # type: ignore
+    access_mode = _access_mode("buffered" if _mode == "buffered" else "mmap")
+    if access_mode is not None:
+        kwargs.setdefault("access_mode", access_mode)
+    # Pdf 会持有 src 的引用，在关闭之前 src 不会被回收
+    return Pdf.open(spool(src), **kwargs)
+
+
+def open_pdf(path: Union[str, os.PathLike], **kwargs) -> "Pdf":
+    """按照当前的读取方式打开 PDF 文件
+
+    :param path: 文件路径，``-`` 表示 stdin
+    :param kwargs: 传递给 ``Pdf.open`` 的其他参数
+    """
+    if is_stdin(path):
+        return open_stream(sys.stdin.buffer, **kwargs)
+
+    try:
+        fifo = stat.S_ISFIFO(os.stat(path).st_mode)
+    except OSError:
+        # 交给 pikepdf 报告文件不存在等错误
+        fifo = False
+    if fifo:
+        with open(path, "rb") as src:
+            return open_stream(src, **kwargs)
+
+    from pikepdf import Pdf  # type: ignore
+    access_mode = _access_mode(_mode)
+    if access_mode is not None and _mode != "default":
+        kwargs.setdefault("access_mode", access_mode)
+    return Pdf.open(path, **kwargs)
@@ -1,29 +1,49 @@
-from hashlib import md5 as get_hash
+import os
+import sys
 from pathlib import Path
-from sys import stdin
-from typing import Dict
+from tempfile import TemporaryDirectory
 from typing import List
 from typing import Optional
-from typing import Tuple
+from typing import Union
 
 import typer
 # mypy 无法导入类型声明
 from pikepdf import Pdf  # type: ignore
-from tqdm import tqdm  # type: ignore
 
-from .outline import Outline
-from .outline import outline_decode
-from .outline import outline_encode
-from .utils import check_paths_exists
-from .utils import export_outline
+# tqdm、多进程与去重模块只在用到它们的命令中导入，以减少其他命令的启动时间
+from . import trace
+from .access import is_stdin
+from .access import open_pdf
+from .exceptions import MergeError
+from .exceptions import SplitError
+from .outline import OutlineStore
+from .outline import decode_outline_format
+from .outline import outline_encode_iter
+from .profiles import get_profile
+from .profiles import save_pdf
+from .range import MultiRange
+from .range import RangeParseError
+from .utils import OutlineMerger
+from .utils import export_outline_store
 from .utils import fmt_pat
-from .utils import import_outline
-
-__all__ = ("action_merge", "action_split", "action_import_outline",
-           "action_export_outline", "action_erase_outline")
-
-
-def action_merge(inputs: List[str], output: str):
+from .utils import import_outline_bulk
+from .utils import read_paths
+
+__all__ = ("action_merge", "action_split", "action_extract",
+           "action_import_outline", "action_export_outline",
+           "action_erase_outline", "action_optimize", "action_pipe",
+           "merge_pages", "select_pages", "optimize_pdf")
+
+
+def action_merge(inputs: List[str],
+                 output: str,
+                 jobs: int = 1,
+                 group_size: int = 64,
+                 max_open: Optional[int] = None,
+                 prefetch: int = 4,
+                 profile: str = "web",
+                 outlines: Optional[str] = None,
+                 dedup: bool = False):
     """合并一系列 PDF 文件。
 
     :param input: 当输入一组路径时，按照顺序合并对应的文件；
@@ -31,62 +51,236 @@ def action_merge(inputs: List[str], output: str):
         从 `@files.txt` 读取文件路径并按顺序合并；
         当为 None 时，从 stdin 读取文件路径并按顺序合并。
     :param output: 输出路径。
+    :param str profile: 保存方案，见 :mod:`pdfwork.profiles`。并行合并产生的中间文件总是使用 ``fast`` 方案。
 
-    **注意** ：书签会丢失，如果想要保留，需提前导出备份，见 :meth:`action_export_outline`。
+    其余参数见 :func:`merge_pages` 。
     """
-    if len(inputs) == 0:
-        # 从 stdin 读取文件路径
-        paths = check_paths_exists([i.rstrip("\n") for i in stdin.readlines()])
-    elif len(inputs) == 1 and inputs[0].startswith("@"):
-        # 从 @file.list 读取文件路径
-        with open(inputs[0], "rt", encoding="utf-8") as file_list:
-            paths = check_paths_exists(
-                [i.rstrip("\n") for i in file_list.readlines()])
-    else:
-        paths = check_paths_exists(inputs)
-
-    pdfw: Pdf = Pdf.new()
-
-    for path in tqdm(paths, desc="合并", ascii=True):
-        pdfr = Pdf.open(path)
-        pdfw.pages.extend(pdfr.pages)
-        pdfr.close()
+    check_merge_outlines(outlines)
+    save_profile = get_profile(profile)
+    with trace.phase("read_paths") as ph:
+        paths = read_paths(inputs)
+        ph.add(len(paths))
+
+    with TemporaryDirectory(prefix=".pdfwork-",
+                            dir=Path(output).absolute().parent) as workdir:
+        pdfw: Pdf = Pdf.new()
+        try:
+            merge_pages(pdfw, paths, workdir, jobs, group_size, max_open,
+                        prefetch, outlines, dedup)
+        except MergeError as e:
+            typer.secho("ERROR: {}, inputs={}, output={}".format(
+                e, inputs, output),
+                        fg="red",
+                        err=True)
+            raise e
 
-    try:
-        pdfw.save(output, linearize=True)
-    except RuntimeError as e:
-        typer.secho("ERROR: {}, inputs={}, output={}".format(
-            e, inputs, output),
-                    fg="red",
-                    err=True)
-        raise e
+        try:
+            with trace.phase("save", len(pdfw.pages)):
+                save_pdf(pdfw, output, save_profile)
+        except RuntimeError as e:
+            typer.secho("ERROR: {}, inputs={}, output={}".format(
+                e, inputs, output),
+                        fg="red",
+                        err=True)
+            raise e
 
 
-def action_split(input: str, outputs: Optional[str]):
+def check_merge_outlines(outlines: Optional[str]):
+    "检查合并时保留书签的方式"
+    if outlines not in (None, "keep", "nest"):
+        raise ValueError(f"未知的书签处理方式 {outlines!r}，可选：keep、nest")
+
+
+def merge_pages(pdfw: Pdf,
+                paths: List[str],
+                workdir: str,
+                jobs: int = 1,
+                group_size: int = 64,
+                max_open: Optional[int] = None,
+                prefetch: int = 4,
+                outlines: Optional[str] = None,
+                dedup: bool = False):
+    """将一组文件的页面依次添加到 ``pdfw`` 末尾。
+
+    :param paths: 输入文件的路径
+    :param str workdir: 并行合并时存放中间文件的目录，保存 ``pdfw`` 之前不能删除
+    :param int jobs: 并行的工作进程数，默认为 1，即在当前进程中依次合并；
+        小于等于 0 时使用全部 CPU 核心。
+    :param int group_size: 并行合并时每组的文件数，见 :func:`pdfwork.parallel.merge_tree`。
+    :param max_open: 并行合并时同时打开的文件数上限，默认不限制。
+    :param int prefetch: 在后台线程中预先打开的文件数，为 0 时不预先打开，
+        见 :func:`pdfwork.parallel.prefetch_open`。
+    :param outlines: 默认丢弃输入文件的书签；为 ``keep`` 时保留书签，目标页码加上之前各文件的总页数；
+        为 ``nest`` 时还将每个文件的书签放在以文件名为标题的书签下。
+        书签与页面一起保存，见 :class:`pdfwork.utils.OutlineMerger`。
+        ``pdfw`` 中已有的书签会被保留，新的书签添加在它们之后。
+    :param bool dedup: 为 True 时在复制每个文件的页面之后，按内容去除与之前各文件重复的流对象，
+        并报告去除的对象数、节省的字节数与耗时，见 :class:`pdfwork.dedup.MergeDedup`。
+
+    :raises MergeError: 第一个出错的文件
+    """
+    from tqdm import tqdm  # type: ignore
+
+    from .dedup import DedupStats
+    from .dedup import MergeDedup
+    from .parallel import merge_tree
+    from .parallel import prefetch_open
+    from .parallel import resolve_jobs
+
+    check_merge_outlines(outlines)
+    jobs = resolve_jobs(jobs)
+    # 并行合并时各工作进程的去重结果
+    tree_stats = DedupStats()
+    # 工作进程无法读取 stdin
+    if jobs > 1 and len(paths) > group_size and not any(map(is_stdin, paths)):
+        with trace.phase("merge_tree", len(paths)):
+            paths = merge_tree(paths, workdir, jobs, group_size, max_open,
+                               prefetch, outlines, tree_stats if dedup else None)
+        # 中间文件中已经带有以原文件名为标题的书签
+        if outlines == "nest":
+            outlines = "keep"
+
+    merger = OutlineMerger(pdfw) if outlines is not None else None
+    # 去重只针对新添加的页面，pdfw 中原有的对象不会被索引
+    deduper = MergeDedup(pdfw) if dedup else None
+
+    opening = trace.span("open_inputs")
+    copying = trace.span("copy_pages")
+    outlining = trace.span("merge_outlines")
+    deduping = trace.span("dedup")
+    for path, pdfr in tqdm(trace.timed(prefetch_open(paths, prefetch), opening),
+                           total=len(paths),
+                           desc="合并",
+                           ascii=True):
+        offset = len(pdfw.pages)
+        with copying:
+            pdfw.pages.extend(pdfr.pages)
+        copying.add(len(pdfr.pages))
+        if deduper is not None:
+            with deduping:
+                deduping.add(deduper.add(pdfw.pages[offset:]))
+        if merger is not None:
+            with outlining:
+                outlining.add(
+                    merger.add(pdfr, offset,
+                               Path(path).stem if outlines == "nest" else None))
+        pdfr.close()
+    opening.finish()
+    copying.finish()
+    if merger is not None:
+        with outlining:
+            merger.finish()
+        outlining.finish()
+    if deduper is not None:
+        deduping.finish()
+        tree_stats += deduper.stats
+        typer.echo("去除了 {} 个重复对象，节省 {} 字节，耗时 {:.2f} 秒".format(
+            tree_stats.objects, tree_stats.bytes, tree_stats.seconds),
+                   err=True)
+
+
+def action_split(input: str,
+                 outputs: Optional[str],
+                 jobs: int = 1,
+                 profile: str = "fast",
+                 prune: bool = True,
+                 chunk_pages: Optional[int] = None,
+                 chunk_size: Optional[int] = None):
     """一个分割任务。
 
     :param input: 输入文件的路径
-    :param str outputs: 输出路径。可使用 Python format 模板格式化页码。
+    :param str outputs: 输出路径。可使用 Python format 模板格式化文件序号。
         如果只提供目录名（如 ``out/``），则会自动推导文件名格式化样式。
-        例如，假设文件有超过 100 但不足 1000 页时，
+        例如，假设输出超过 100 但不足 1000 个文件时，
         将格式化为 ``{:03d}.pdf``。默认输出到当前文件夹
+    :param int jobs: 并行的工作进程数，默认为 1，即在当前进程中逐页拆分；
+        小于等于 0 时使用全部 CPU 核心。
+    :param str profile: 保存方案，见 :mod:`pdfwork.profiles`。
+    :param bool prune: 是否去除每一页未使用的资源。源文件的各页共用一个列出全部字体、
+        图像的资源字典时，可以显著减小输出的总大小，见 :mod:`pdfwork.prune`。
+    :param chunk_pages: 每个文件至多包含的页数，默认每页一个文件
+    :param chunk_size: 每个文件预计的字节数上限，按照估计值一次规划全部分块，
+        见 :func:`pdfwork.chunk.chunk_by_bytes` 。单独一页超出上限时，该页单独保存为一个文件。
+        不能与 ``chunk_pages`` 同时使用
+    :returns: 写出的文件路径，按分块的顺序排列
 
     **注意** ：书签、标记等可能会遗失。
     """
-    pdfr: Pdf = Pdf.open(input)
-
-    fmt = fmt_pat(outputs, len(pdfr.pages)) if outputs else fmt_pat(
-        "", len(pdfr.pages))
+    from tqdm import tqdm  # type: ignore
+
+    from .chunk import SizeEstimator
+    from .chunk import chunk_by_bytes
+    from .chunk import chunk_by_pages
+    from .parallel import resolve_jobs
+    from .parallel import split_parallel
+    from .prune import ResourceUsage
+    from .prune import append_pruned
+
+    if chunk_pages is not None and chunk_size is not None:
+        raise ValueError("chunk_pages 与 chunk_size 不能同时使用")
+    save_profile = get_profile(profile)
+    with trace.phase("open_inputs", 1):
+        pdfr: Pdf = open_pdf(input)
+    total = len(pdfr.pages)
+
+    # 共用的资源字典、表单等只分析一次
+    usage = ResourceUsage() if prune else None
+    if chunk_size is not None:
+        with trace.phase("plan_chunks", total):
+            planned = chunk_by_bytes(pdfr, chunk_size, SizeEstimator(usage))
+        for start, stop, size in planned:
+            if size > chunk_size:
+                typer.secho("WARNING: 第 {} 页预计 {} 字节，超过了 {} 字节，单独保存".format(
+                    start + 1, size, chunk_size),
+                            fg="yellow",
+                            err=True)
+        chunks = [(start, stop) for start, stop, _ in planned]
+    elif chunk_pages is not None:
+        chunks = chunk_by_pages(total, chunk_pages)
+    else:
+        chunks = [(i, i + 1) for i in range(total)]
 
-    for i, page in enumerate(tqdm(pdfr.pages, ascii=True, desc=f"拆分 {fmt!r}")):
-        pdfw: Pdf = Pdf.new()
-        pdfw.pages.append(page)
+    fmt = fmt_pat(outputs, len(chunks)) if outputs else fmt_pat(
+        "", len(chunks))
+    paths = [fmt.format(n) for n in range(len(chunks))]
 
-        path = Path(fmt.format(i))
+    jobs = resolve_jobs(jobs)
+    # 工作进程无法再次读取 stdin
+    if jobs > 1 and len(chunks) > 1 and not is_stdin(input):
+        # 工作进程会各自打开源文件
+        pdfr.close()
+        try:
+            with trace.phase("split_parallel", total):
+                removed = split_parallel(input, fmt, total, jobs, save_profile,
+                                         prune, chunks)
+        except SplitError as e:
+            typer.secho("ERROR: {}, input={}, outputs={}".format(
+                e, input, fmt),
+                        fg="red",
+                        err=True)
+            raise e
+        if prune:
+            typer.echo("去除了 {} 个未使用的资源".format(removed), err=True)
+        return paths
+
+    copying = trace.span("copy_pages")
+    saving = trace.span("save")
+    progress = tqdm(total=total, ascii=True, desc=f"拆分 {fmt!r}")
+    for n, (start, stop) in enumerate(chunks):
+        with copying:
+            pdfw: Pdf = Pdf.new()
+            for i in range(start, stop):
+                if usage is not None:
+                    append_pruned(pdfw, pdfr.pages[i], usage)
+                else:
+                    pdfw.pages.append(pdfr.pages[i])
+
+        path = Path(paths[n])
         path.parent.mkdir(parents=True, exist_ok=True)
 
         try:
-            pdfw.save(path, linearize=True)
+            with saving:
+                save_pdf(pdfw, path, save_profile)
         except RuntimeError as e:
             # ERROR: operation for name attempted on object of type string
             # 是 PDF 内容的问题，见 https://github.com/qpdf/qpdf/issues/74
@@ -95,14 +289,94 @@ def action_split(input: str, outputs: Optional[str]):
                         fg="red",
                         err=True)
             raise e
+        progress.update(stop - start)
+    progress.close()
+
+    copying.finish(total)
+    saving.finish(len(chunks))
+    pdfr.close()
+    if usage is not None:
+        typer.echo("去除了 {} 个未使用的资源".format(usage.removed), err=True)
+    return paths
+
+
+def action_extract(input: str,
+                   pages: Union[str, MultiRange],
+                   output: str,
+                   profile: str = "web"):
+    """从 PDF 文件中提取一组页面，按顺序保存为一个文件。
+
+    :param str input: 输入文件的路径
+    :param pages: 页码区间，见 :mod:`pdfwork.range`。页码从 0 开始，规则与 Python 的切片相同，
+        例如 ``0:20,399:420,-5:`` 表示前 20 页、第 400~420 页与最后 5 页。
+        页面按照表示法的顺序排列，重复选中的页面会重复出现。
+    :param str output: 输出路径
+    :param str profile: 保存方案，见 :mod:`pdfwork.profiles`。
+
+    只打开、保存一次文件。从同一个文件复制的页面共用字体、图像等资源对象，不会重复保存。
 
+    **注意** ：书签会丢失。
+    """
+    save_profile = get_profile(profile)
+    try:
+        selection = pages if isinstance(pages,
+                                        MultiRange) else MultiRange(pages)
+    except RangeParseError as e:
+        typer.secho("ERROR: {}, input={}, pages={}, output={}".format(
+            e, input, pages, output),
+                    fg="red",
+                    err=True)
+        raise e
+
+    with trace.phase("open_inputs", 1):
+        pdfr: Pdf = open_pdf(input)
+
+    try:
+        pdfw = select_pages(pdfr, selection)
+    except IndexError as e:
+        typer.secho("ERROR: {}, input={}, pages={}, output={}".format(
+            e, input, pages, output),
+                    fg="red",
+                    err=True)
+        raise e
+
+    try:
+        with trace.phase("save", len(pdfw.pages)):
+            save_pdf(pdfw, output, save_profile)
+    except RuntimeError as e:
+        typer.secho("ERROR: {}, input={}, pages={}, output={}".format(
+            e, input, pages, output),
+                    fg="red",
+                    err=True)
+        raise e
     pdfr.close()
 
 
+def select_pages(pdfr: Pdf, selection: MultiRange) -> Pdf:
+    """将 ``pdfr`` 中选中的页面按顺序复制到一个新文档中，书签等文档级的信息不会被复制
+
+    :param selection: 页码区间，见 :func:`action_extract`
+    :raises IndexError: 页码超出范围，或者没有选中任何页面
+    """
+    from tqdm import tqdm  # type: ignore
+
+    bound = selection.bind(len(pdfr.pages))
+    if not len(bound):
+        raise IndexError("没有选中任何页面")
+
+    pdfw: Pdf = Pdf.new()
+    with trace.phase("copy_pages", len(bound)):
+        for i in tqdm(bound, total=len(bound), desc="提取", ascii=True):
+            pdfw.pages.append(pdfr.pages[i])
+    return pdfw
+
+
 def action_import_outline(pdf: str,
                           input: Optional[str],
                           output: str,
-                          offset=0):
+                          offset=0,
+                          profile: str = "web",
+                          fmt: str = "text"):
     """将输入的目录信息导入到 pdf 文件中。
 
     :param str pdf: 要导入的 PDF 文件的路径。
@@ -111,6 +385,7 @@ def action_import_outline(pdf: str,
         这个参数是为了弥补照抄书籍目录页时，
         由于前方页数未计算在内的造成的偏移。
         一般设置为目录页中标记为第一页的页面在 PDF 阅读器中的实际页码。
+    :param str profile: 保存方案，见 :mod:`pdfwork.profiles`。
 
     目录信息将具有以下格式::
 
@@ -119,17 +394,24 @@ def action_import_outline(pdf: str,
 
     **注意** ： 页码是在书籍目录页中书写的页码，一般从 1 开始。如果有一行没有标注页码，那么会继承上一行的页码。
     """
-    if input is None:
-        outline_src = stdin.read()
-    else:
-        with open(input, "rt", encoding="utf-8") as src:
-            outline_src = src.read()
-    root = outline_decode(outline_src)
-
-    pdfw = Pdf.open(pdf, allow_overwriting_input=True)
-    import_outline(pdfw, root, offset)
+    save_profile = get_profile(profile)
+    with trace.phase("parse_outline"):
+        if input is None:
+            root = decode_outline_format(sys.stdin, fmt)
+        else:
+            with open(input, "rt", encoding="utf-8") as src:
+                root = decode_outline_format(src, fmt)
+
+    with trace.phase("open_inputs", 1):
+        # 只有输出覆盖输入文件本身时才需要，stdin 与命名管道不支持这个参数
+        overwrite = not is_stdin(pdf) and os.path.isfile(pdf) and os.path.exists(output) \
+            and os.path.samefile(pdf, output)
+        pdfw = open_pdf(pdf, allow_overwriting_input=True) if overwrite else open_pdf(pdf)
+    with trace.phase("import_outline"):
+        import_outline_bulk(pdfw, root, offset)
     try:
-        pdfw.save(output, linearize=True)
+        with trace.phase("save", len(pdfw.pages)):
+            save_pdf(pdfw, output, save_profile)
     except RuntimeError as e:
         typer.secho("ERROR: {}, pdf={}, input={}, output={}, offset={}".format(
             e, pdf, input, output, offset),
@@ -138,44 +420,59 @@ def action_import_outline(pdf: str,
         raise e
 
 
-def action_export_outline(pdf: str, output: Optional[str]):
+def action_export_outline(pdf: str, output: Optional[str], fmt: str = "text"):
     """将 PDF 文件中的目录信息导出到文本文件中。
 
     :param Optional[str] output: 记录目录信息的文本文件，如果为 None 则输出到 stdout。
     :param str pdf: PDF 文件的路径。
+    :param str fmt: 输出格式，``text``、``json`` 或 ``jsonl``，
+        见 :func:`pdfwork.outline.outline_encode_iter`。
 
-    目录信息将具有以下格式::
+    ``text`` 格式的目录信息将具有以下格式::
 
         《标题》 @ <页码>
             《次级标题》 @ <页码>
 
     **注意** ： 页码是在书籍目录页中书写的页码，一般从 1 开始。如果有一行没有标注页码，那么会继承上一行的页码。
     """
-    pdfr = Pdf.open(pdf)
-    with pdfr.open_outline() as pikeoutline:
-        root: Outline = export_outline(pdfr, pikeoutline)
-
-    content = outline_encode(root)
-    if output is not None:
-        with open(output, "wt", encoding="utf-8") as outbuf:
-            outbuf.write(content)
-    else:
-        typer.echo_via_pager(content)
-
-
-def action_erase_outline(pdf: str, output: str):
+    # 在打开文件之前检查格式
+    outline_encode_iter(OutlineStore(), fmt)
+
+    with trace.phase("open_inputs", 1):
+        pdfr = open_pdf(pdf)
+    with trace.phase("export_outline"):
+        with pdfr.open_outline() as pikeoutline:
+            root: OutlineStore = export_outline_store(pdfr, pikeoutline)
+
+    # 边编码边写出，不在内存中拼接完整的结果
+    with trace.phase("encode_outline", len(root)):
+        if output is not None:
+            with open(output, "wt", encoding="utf-8") as outbuf:
+                outbuf.writelines(outline_encode_iter(root, fmt))
+        else:
+            outbuf = typer.get_text_stream("stdout")
+            outbuf.writelines(outline_encode_iter(root, fmt))
+            outbuf.flush()
+
+
+def action_erase_outline(pdf: str, output: str, profile: str = "web"):
     """抹除一个 PDF 文件中的目录信息
 
     :param str pdf: PDF 文件的路径
+    :param str profile: 保存方案，见 :mod:`pdfwork.profiles`。
     """
+    save_profile = get_profile(profile)
     pdfw = Pdf.new()
 
-    pdfr = Pdf.open(pdf)
-    pdfw.pages.extend(pdfr.pages)
+    with trace.phase("open_inputs", 1):
+        pdfr = open_pdf(pdf)
+    with trace.phase("copy_pages", len(pdfr.pages)):
+        pdfw.pages.extend(pdfr.pages)
     pdfr.close()
 
     try:
-        pdfw.save(output, linearize=True)
+        with trace.phase("save", len(pdfw.pages)):
+            save_pdf(pdfw, output, save_profile)
     except RuntimeError as e:
         typer.secho("ERROR: {}, pdf={}, output={}".format(e, pdf, output),
                     fg="red",
@@ -183,52 +480,110 @@ def action_erase_outline(pdf: str, output: str):
         raise e
 
 
-def action_optimize(src: str, output: Optional[str] = None):
-    """优化 PDF 文件：线性化、去重、去除未引用资源
+def action_optimize(src: str,
+                    output: Optional[str] = None,
+                    jobs: int = 4,
+                    all_streams: bool = False,
+                    profile: str = "compact"):
+    """优化 PDF 文件：去重、去除未引用资源，然后以紧凑的方式保存
 
     :param str src: 被处理的 PDF 文件路径
     :param str output: 输出路径，为 Nohene 则保存至原文档加 ``_`` 后缀的 PDF 文件
+    :param int jobs: 计算摘要的线程数，小于等于 0 时使用全部 CPU 核心
+    :param bool all_streams: 为 True 时对文档中的全部流对象（字体、ICC 配置、表单、图案等）去重，
+        见 :func:`pdfwork.dedup.dedup_streams`；否则只对页面资源中的图像去重。
+    :param str profile: 保存方案，见 :mod:`pdfwork.profiles`。默认生成对象流并重新压缩，
+        需要线性化时使用 ``web`` 方案。
     """
+    save_profile = get_profile(profile)
+    if is_stdin(src) and output is None:
+        raise ValueError("从 stdin 读取时必须指定输出路径")
     src_ = Path(src)
     stem = src_.stem
     parent = src_.parent
     output = (parent / "{}_.pdf".format(stem)
               ).as_posix() if (output is None) or (output == src) else output
-    pdf = Pdf.open(src)
-
-    # 来自讨论 https://github.com/pikepdf/pikepdf/issues/198
-    # hex hash => [(page number, object name)]
-    image_hash: Dict[str, List[Tuple[int, str]]] = {}
-
-    progress1 = tqdm(desc="查重")
-    # 构建引用表
-    for p in range(len(pdf.pages)):
-        for im in pdf.pages[p].images.keys():
-            # must record in image_hash
-            obj = pdf.pages[p].images[im]
-            hashsum = get_hash(obj.read_bytes()).hexdigest()
-            if hashsum in image_hash:
-                image_hash[hashsum].append((p, im))
-            else:
-                image_hash[hashsum] = [(p, im)]
-            progress1.update()
-    progress1.close()
-
-    progress2 = tqdm(desc="去重", total=progress1.n - len(image_hash.keys()))
-    # 将图像指向具有相同 hash 的第一个图像
-    for first, *others in image_hash.values():
-        p0, im0 = first
-        for p, im in others:
-            pdf.pages[p].Resources.XObject[im] = pdf.pages[
-                p0].Resources.XObject[im0]
-            progress2.update()
-    progress2.close()
-
-    pdf.remove_unreferenced_resources()
+    with trace.phase("open_inputs", 1):
+        pdf = open_pdf(src)
+
+    optimize_pdf(pdf, jobs, all_streams)
     try:
-        pdf.save(output, linearize=True)
+        with trace.phase("save", len(pdf.pages)):
+            save_pdf(pdf, output, save_profile)
     except RuntimeError as e:
         typer.secho("ERROR: {}, src={}, output={}".format(e, src, output),
                     fg="red",
                     err=True)
         raise e
+
+
+def optimize_pdf(pdf: Pdf, jobs: int = 4, all_streams: bool = False):
+    """对文档去重、去除未引用的资源，参数见 :func:`action_optimize`
+    """
+    from .dedup import dedup_images
+    from .dedup import dedup_streams
+    from .parallel import resolve_jobs
+
+    if all_streams:
+        with trace.phase("dedup") as ph:
+            summary = dedup_streams(pdf, resolve_jobs(jobs))
+            ph.add(sum(i.objects for i in summary.values()))
+        for kind, stats in sorted(summary.items()):
+            typer.echo("{}: 去除了 {} 个重复对象，节省 {} 字节".format(
+                kind, stats.objects, stats.bytes),
+                       err=True)
+        typer.echo("合计: 去除了 {} 个重复对象，节省 {} 字节".format(
+            sum(i.objects for i in summary.values()),
+            sum(i.bytes for i in summary.values())),
+                   err=True)
+    else:
+        # 来自讨论 https://github.com/pikepdf/pikepdf/issues/198
+        with trace.phase("dedup") as ph:
+            stats = dedup_images(pdf, resolve_jobs(jobs))
+            ph.add(stats.objects)
+        typer.echo("去除了 {} 个重复图像，节省 {} 字节".format(
+            stats.objects, stats.bytes),
+                   err=True)
+
+    with trace.phase("remove_unreferenced_resources", len(pdf.pages)):
+        pdf.remove_unreferenced_resources()
+
+
+def action_pipe(plan: Optional[str] = None,
+                steps: Optional[List[str]] = None,
+                output: Optional[str] = None,
+                profile: Optional[str] = None,
+                check: bool = False):
+    """在一个内存中的文档上依次执行多个步骤，最后只保存一次，见 :mod:`pdfwork.pipeline`。
+
+    :param plan: YAML 或 JSON 格式的计划文件
+    :param steps: 命令行写法的步骤，如 ``"merge a.pdf b.pdf outlines=keep"``，
+        添加在计划文件中的步骤之后
+    :param output: 输出路径，覆盖计划文件中的 ``output``
+    :param profile: 保存方案，覆盖计划文件中的 ``profile`` ，默认为 ``web``
+    :param bool check: 为 True 时只检查计划，不打开任何 PDF 文件
+    """
+    from .exceptions import PipelineError
+    from .pipeline import Pipeline
+    from .pipeline import Step
+
+    try:
+        pipeline = Pipeline.load(plan) if plan is not None else Pipeline([])
+        pipeline.steps.extend(Step.parse(i) for i in steps or [])
+        if output is not None:
+            pipeline.output = output
+        if profile is not None:
+            pipeline.profile = profile
+        if check:
+            pipeline.check()
+            typer.echo("计划有效，共 {} 步".format(len(pipeline.steps)), err=True)
+        else:
+            pipeline.run()
+    except PipelineError as e:
+        typer.secho("ERROR: plan={}, steps={}, output={}".format(
+            plan, steps, output),
+                    fg="red",
+                    err=True)
+        for problem in e.problems:
+            typer.secho("    {}".format(problem), fg="red", err=True)
+        raise e
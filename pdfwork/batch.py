@@ -0,0 +1,437 @@
+"""``pdfwork batch``：按清单并行执行大量任务
+
+清单中每个任务对应一次 ``action_*`` 调用，可以是 JSON lines，每行一个任务::
+
+    {"id": "jan", "action": "merge", "args": {"inputs": ["a.pdf", "b.pdf"], "output": "jan.pdf"}}
+    {"action": "optimize", "args": {"src": "big.pdf", "output": "big.min.pdf"}}
+
+也可以是 CSV，表头中除 ``id`` 与 ``action`` 之外的列都是参数，空白的单元格表示不指定。
+CSV 中的值按函数签名转换为整数或布尔值，``inputs`` 与 ``steps`` 以 ``;`` 分隔多个值::
+
+    id,action,inputs,output,src
+    jan,merge,a.pdf;b.pdf,jan.pdf,
+    ,optimize,,big.min.pdf,big.pdf
+
+没有 ``id`` 的任务以行号为 id。可用的任务与参数同 :data:`pdfwork.server.ACTIONS` ，路径相对于当前目录。
+
+调度方式：
+
++ 工作进程常驻，每个进程依次执行多个任务，不必为每个文件启动一次解释器
++ 按输入文件的总大小从大到小开始执行，避免最大的任务最后才开始、拖长总耗时
++ 指定内存上限时，只有在工作进程当前的内存占用加上新任务的估计值不超过上限时才开始新的任务；
+  任务按顺序开始，大任务不会被后面的小任务一直挤占。没有运行中的任务时总是开始下一个任务
++ 任务超时或工作进程异常退出时，结束并替换该进程；失败的任务最多重试 ``retries`` 次
+
+每个任务结束后向结果日志追加一行 JSON，记录状态、尝试次数、耗时与输出的字节数。
+中断之后以 ``resume=True`` 重新运行同一个清单时，日志中已经成功的任务会被跳过。
+"""
+import csv
+import inspect
+import json
+import os
+import threading
+import time
+from bisect import insort
+from dataclasses import dataclass
+from dataclasses import field
+from multiprocessing import get_context
+from multiprocessing.connection import wait
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+from tqdm import tqdm  # type: ignore
+
+from .access import get_mode
+from .cache import ResultCache
+from .cache import output_path
+from .server import ACTIONS
+from .server import init_worker
+from .server import run_job
+
+__all__ = ("Job", "load_manifest", "read_log", "run_batch")
+
+# 可能是输入文件的参数
+INPUT_KEYS = ("inputs", "input", "pdf", "src")
+# CSV 中以 ; 分隔的列表参数
+LIST_KEYS = ("inputs", "steps")
+# 任务的内存占用估计为输入大小的倍数
+MEMORY_FACTOR = 2
+# 等待工作进程时检查超时与内存的间隔（秒）
+POLL_INTERVAL = 0.2
+
+_TRUE = ("true", "yes", "on", "1")
+_FALSE = ("false", "no", "off", "0")
+
+
+@dataclass
+class Job:
+    """清单中的一个任务
+
+    :param str id: 任务 id，续跑时用来识别已经完成的任务
+    :param str action: ``action_*`` 函数名去掉前缀的部分
+    :param args: 函数的参数
+    :param int size: 输入文件的总字节数，用于排序与估计内存
+    :param int attempts: 已经尝试的次数
+    """
+    id: str
+    action: str
+    args: Dict[str, Any] = field(default_factory=dict)
+    size: int = 0
+    attempts: int = 0
+
+    def __lt__(self, other: "Job") -> bool:
+        # 排在前面的先执行
+        return self.size > other.size
+
+
+def _paths(value: Any) -> List[str]:
+    "参数中的文件路径，``@`` 开头的文件列表按行展开"
+    paths = value if isinstance(value, list) else [value]
+    result: List[str] = []
+    for p in paths:
+        if not isinstance(p, str):
+            continue
+        if p.startswith("@") and os.path.isfile(p[1:]):
+            with open(p[1:], "rt", encoding="utf-8") as file:
+                result.extend(line.rstrip("\n") for line in file if line.strip())
+        else:
+            result.append(p)
+    return result
+
+
+def input_size(args: Dict[str, Any]) -> int:
+    "任务的输入文件的总字节数，不存在的文件计为 0"
+    total = 0
+    for key in INPUT_KEYS:
+        for path in _paths(args.get(key)):
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+    return total
+
+
+def output_size(job: Job, outputs: Optional[List[str]] = None) -> Optional[int]:
+    """任务输出的字节数，没有输出文件时为 None
+
+    :param outputs: 任务报告的输出文件（split），见 :func:`pdfwork.server.run_job`；
+        只统计这些文件，不会计入同一目录中其他任务或程序写出的文件
+    """
+    if outputs is not None:
+        return sum(os.path.getsize(p) for p in outputs if os.path.isfile(p))
+    if job.action == "split":
+        return None
+    output = output_path(job.action, job.args)
+    if isinstance(output, str) and os.path.isfile(output):
+        return os.path.getsize(output)
+    return None
+
+
+def _convert_cell(param: inspect.Parameter, key: str, text: str) -> Any:
+    "按照参数的类型转换 CSV 单元格"
+    if key in LIST_KEYS:
+        return [i for i in text.split(";") if i]
+    default = param.default
+    annotation = param.annotation
+    if annotation is bool or isinstance(default, bool):
+        if text.lower() not in _TRUE + _FALSE:
+            raise ValueError(f"参数 {key} 应当为布尔值，而不是 {text!r}")
+        return text.lower() in _TRUE
+    if annotation in (int, Optional[int]) or (isinstance(default, int)
+                                              and not isinstance(default, bool)):
+        try:
+            return int(text)
+        except ValueError:
+            raise ValueError(f"参数 {key} 应当为整数，而不是 {text!r}") from None
+    return text
+
+
+def load_manifest(path: str) -> List[Job]:
+    """读取 JSON lines（默认）或 CSV（``.csv`` 后缀）格式的清单，并检查其中的全部任务
+
+    不会打开任何 PDF 文件，但会读取输入文件的大小。
+
+    :raises ValueError: 清单中的全部问题
+    """
+    from . import actions
+
+    is_csv = Path(path).suffix.lower() == ".csv"
+    problems: List[str] = []
+    jobs: List[Job] = []
+    ids: Set[str] = set()
+    with open(path, "rt", encoding="utf-8", newline="") as file:
+        # (行号, CSV 中的一行或 JSON 文本)
+        rows: Iterator[Tuple[int, Any]]
+        if is_csv:
+            rows = ((n, record) for n, record in enumerate(csv.DictReader(file), 2))
+        else:
+            rows = ((n, line) for n, line in enumerate(file, 1) if line.strip())
+        for n, row in rows:
+            where = f"{path} 第 {n} 行"
+            if is_csv:
+                job_id = row.get("id") or str(n)
+                action = row.get("action") or ""
+                raw = {
+                    k: v
+                    for k, v in row.items()
+                    if k not in ("id", "action") and k and v not in (None, "")
+                }
+            else:
+                try:
+                    record = json.loads(row)
+                except ValueError as e:
+                    problems.append(f"{where}：无法解析：{e}")
+                    continue
+                if not isinstance(record, dict) or not isinstance(
+                        record.get("args", {}), dict):
+                    problems.append(f"{where}：应当是包含 action 与 args 的 JSON 对象")
+                    continue
+                job_id = str(record.get("id", n))
+                action = record.get("action") or ""
+                raw = record.get("args", {})
+
+            if action not in ACTIONS:
+                problems.append(f"{where}：未知的任务 {action!r}，可选：{', '.join(ACTIONS)}")
+                continue
+            if job_id in ids:
+                problems.append(f"{where}：重复的 id {job_id!r}")
+                continue
+            signature = inspect.signature(getattr(actions, f"action_{action}"))
+            args = {}
+            for key, value in raw.items():
+                param = signature.parameters.get(key)
+                if param is not None and is_csv:
+                    try:
+                        value = _convert_cell(param, key, value)
+                    except ValueError as e:
+                        problems.append(f"{where}：{e}")
+                        continue
+                args[key] = value
+            try:
+                signature.bind(**args)
+            except TypeError as e:
+                problems.append(f"{where}：{action} 的参数有误：{e}")
+                continue
+            ids.add(job_id)
+            jobs.append(Job(job_id, action, args, input_size(args)))
+    if problems:
+        raise ValueError("\n".join(problems))
+    return jobs
+
+
+def _rss(pid: int) -> int:
+    "进程当前的常驻内存字节数，无法读取时为 0（只支持 Linux）"
+    try:
+        with open(f"/proc/{pid}/statm", "rt") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _run_cached(cache: Optional[ResultCache], action: str,
+                args: Dict[str, Any]) -> Dict[str, Any]:
+    "查找缓存，未命中时执行任务并保存结果；命中时的应答带有 ``cached``"
+    key = cache.key(action, args) if cache is not None else None
+    if key is None:
+        return run_job(action, args, None, None)
+    assert cache is not None
+    output = output_path(action, args)
+    # 有键的任务一定有输出路径，见 ResultCache.key
+    assert output is not None
+    if cache.fetch(key, output):
+        return {"ok": True, "cached": True}
+    cache.prepare(output)
+    result = run_job(action, args, None, None)
+    if result["ok"]:
+        try:
+            cache.store(key, action, output)
+        except OSError:
+            # 缓存只是加速，写入失败不影响任务本身
+            pass
+    return result
+
+
+def _worker_main(conn, io_mode: str, cache: Optional[ResultCache]):
+    "工作进程：依次接收 ``(action, args)`` 并返回 :func:`pdfwork.server.run_job` 的结果，收到 None 时退出"
+    init_worker(io_mode)
+    # tqdm 默认使用 multiprocessing 的锁，超时被结束的进程会遗留信号量
+    tqdm.set_lock(threading.RLock())
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        action, args = message
+        conn.send(_run_cached(cache, action, args))
+
+
+class _Worker:
+    "一个常驻的工作进程及其正在执行的任务"
+
+    def __init__(self, context, io_mode: str, cache: Optional[ResultCache]):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main,
+                                       args=(child, io_mode, cache),
+                                       daemon=True)
+        self.process.start()
+        child.close()
+        self.job: Optional[Job] = None
+        self.wall = 0.0
+        # 开始任务时的内存占用
+        self.base_rss = 0
+
+    def start(self, job: Job):
+        self.base_rss = _rss(self.process.pid)
+        self.job = job
+        self.wall = time.perf_counter()
+        self.conn.send((job.action, job.args))
+
+    def memory(self) -> int:
+        "当前占用的内存；刚开始的任务还没有分配内存，按估计值计算"
+        rss = _rss(self.process.pid)
+        if self.job is not None:
+            rss = max(rss, self.base_rss + self.job.size * MEMORY_FACTOR)
+        return rss
+
+    def stop(self, kill: bool = False):
+        if kill or self.job is not None:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join()
+        self.conn.close()
+
+
+def read_log(path: str) -> Set[str]:
+    "结果日志中已经成功的任务 id"
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rt", encoding="utf-8") as log:
+        for line in log:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 中断时可能只写了半行
+                continue
+            if record.get("status") == "ok":
+                done.add(record.get("id"))
+    return done
+
+
+def run_batch(jobs: List[Job],
+              log_path: str,
+              workers: int = 4,
+              retries: int = 1,
+              timeout: Optional[float] = None,
+              memory: Optional[int] = None,
+              resume: bool = False,
+              cache: Optional[ResultCache] = None) -> Dict[str, int]:
+    """并行执行一组任务
+
+    :param jobs: 任务，见 :func:`load_manifest`
+    :param str log_path: 结果日志，每个任务结束后追加一行 JSON；不续跑时会被清空
+    :param int workers: 工作进程数
+    :param int retries: 失败（出错、超时或工作进程异常退出）后最多重试的次数
+    :param timeout: 每次尝试的时间上限（秒），超时的工作进程会被结束
+    :param memory: 工作进程的内存总量上限（字节），只限制开始新的任务，不会结束运行中的任务
+    :param bool resume: 为 True 时跳过日志中已经成功的任务，并在日志末尾追加
+    :param cache: 结果缓存，命中的任务在日志中记录为 ``"cached": true``
+    :returns: 各状态的任务数，以及跳过的任务数 ``skipped``
+    """
+    done = read_log(log_path) if resume else set()
+    pending = sorted(job for job in jobs if job.id not in done)
+    summary = {"ok": 0, "failed": 0, "timeout": 0, "crashed": 0, "skipped": len(jobs) - len(pending)}
+    if not pending:
+        return summary
+
+    context = get_context("spawn")
+    io_mode = get_mode()
+    pool = [
+        _Worker(context, io_mode, cache)
+        for _ in range(min(workers, len(pending)))
+    ]
+    progress = tqdm(total=len(pending), desc="批处理", ascii=True)
+
+    def finish(worker: _Worker, status: str, result: Dict[str, Any]):
+        job = worker.job
+        assert job is not None
+        worker.job = None
+        job.attempts += 1
+        if status != "ok" and job.attempts <= retries:
+            insort(pending, job)
+            return
+        record = {
+            "id": job.id,
+            "action": job.action,
+            "status": status,
+            "attempts": job.attempts,
+            "seconds": round(time.perf_counter() - worker.wall, 6),
+            "input_bytes": job.size,
+            "output_bytes": output_size(job, result.get("outputs")) if status == "ok" else None,
+        }
+        if "error" in result:
+            record["error"] = result["error"]
+        if result.get("cached"):
+            record["cached"] = True
+        log.write(json.dumps(record, ensure_ascii=False) + "\n")
+        log.flush()
+        summary[status] += 1
+        progress.update()
+
+    with open(log_path, "at" if resume else "wt", encoding="utf-8") as log:
+        try:
+            while pending or any(w.job is not None for w in pool):
+                # 按顺序开始任务，内存不足时等待运行中的任务结束
+                for worker in pool:
+                    if not pending:
+                        break
+                    if worker.job is not None:
+                        continue
+                    running = [w for w in pool if w.job is not None]
+                    if (memory is not None and running
+                            and sum(w.memory() for w in pool) +
+                            pending[0].size * MEMORY_FACTOR > memory):
+                        break
+                    worker.start(pending.pop(0))
+
+                busy = [w for w in pool if w.job is not None]
+                wait([w.conn for w in busy] + [w.process.sentinel for w in busy],
+                     POLL_INTERVAL)
+                for i, worker in enumerate(pool):
+                    if worker.job is None:
+                        continue
+                    result: Optional[Dict[str, Any]] = None
+                    try:
+                        if worker.conn.poll():
+                            result = worker.conn.recv()
+                    except (EOFError, OSError):
+                        pass
+                    if result is not None:
+                        finish(worker, "ok" if result["ok"] else "failed", result)
+                        continue
+                    if not worker.process.is_alive():
+                        status = "crashed"
+                        error = f"工作进程异常退出，退出码 {worker.process.exitcode}"
+                    elif (timeout is not None
+                          and time.perf_counter() - worker.wall > timeout):
+                        status = "timeout"
+                        error = f"超过 {timeout} 秒"
+                    else:
+                        continue
+                    finish(worker, status, {"error": error})
+                    worker.stop(kill=True)
+                    pool[i] = _Worker(context, io_mode, cache)
+        finally:
+            progress.close()
+            for worker in pool:
+                worker.stop()
+    return summary
@@ -0,0 +1,309 @@
+"""按内容寻址的结果缓存
+
+重复处理没有变化的输入时（例如定期重新生成的合并文档），可以直接使用上一次的输出。
+缓存的键由以下内容计算：
+
++ 任务名与影响输出的参数（保存方案、页码偏移量、书签格式等，并行度等参数不计入）
++ 各个输入文件（PDF 与书签文件）内容的 SHA-256 摘要，与文件路径、修改时间无关
++ pdfwork 的版本号，升级之后不会使用旧版本的结果
+
+命中时将缓存的文件硬链接到输出路径（跨文件系统时复制），完全不需要导入 pikepdf。
+输入来自 stdin 的任务不使用缓存。
+
+缓存目录中每个结果对应两个文件::
+
+    <目录>/<键的前两位>/<键>.pdf    输出文件
+    <目录>/<键的前两位>/<键>.json   任务名、输出文件的大小与修改时间、命中次数
+
+``.json`` 文件的修改时间即最近一次使用的时间，总大小超过上限时按此淘汰最久未使用的结果。
+输出文件与缓存共用同一个文件，如果在缓存之外被改写，其大小或修改时间会与记录不符，
+该结果在下次查找时被丢弃，不会被当作有效的结果使用。
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from . import __version__
+from .access import is_stdin
+
+__all__ = ("ResultCache", "CacheEntry", "output_path", "DEFAULT_SIZE")
+
+# 默认的缓存大小上限
+DEFAULT_SIZE = 1024**3
+# 计算摘要时每次读取的字节数
+CHUNK_SIZE = 1024 * 1024
+
+# 可以缓存的任务 => (输入文件的参数, 不影响输出的参数)
+CACHEABLE: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "merge": (("inputs", ), ("jobs", "group_size", "max_open", "prefetch")),
+    "extract": (("input", ), ()),
+    "import_outline": (("pdf", "input"), ()),
+    "erase_outline": (("pdf", ), ()),
+    "optimize": (("src", ), ("jobs", )),
+}
+
+
+def output_path(action: str, args: Dict[str, Any]) -> Optional[str]:
+    "任务的输出文件路径；optimize 未指定输出时为源文件加 ``_`` 后缀"
+    output = args.get("output")
+    if action == "optimize" and (output is None or output == args.get("src")):
+        src = Path(args["src"])
+        output = (src.parent / "{}_.pdf".format(src.stem)).as_posix()
+    return output
+
+
+def _input_paths(value: Any) -> Optional[List[str]]:
+    "参数中的输入文件，``@`` 开头的文件列表按行展开；需要读取 stdin 时为 None"
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return None if is_stdin(value) else [value]
+    paths = list(value)
+    if len(paths) == 0:
+        return None
+    if len(paths) == 1 and paths[0].startswith("@"):
+        with open(paths[0][1:], "rt", encoding="utf-8") as file_list:
+            paths = [i.rstrip("\n") for i in file_list.readlines()]
+    return None if any(map(is_stdin, paths)) else paths
+
+
+def file_digest(path: str) -> str:
+    "文件内容的 SHA-256 摘要"
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class CacheEntry:
+    """缓存中的一个结果
+
+    :param str key: 键
+    :param str action: 任务名
+    :param int size: 输出文件的字节数
+    :param float used: 最近一次使用的时间戳
+    :param int hits: 命中次数
+    """
+    key: str
+    action: str
+    size: int
+    used: float
+    hits: int
+
+
+class ResultCache():
+    """保存在 ``root`` 目录中的结果缓存
+
+    :param root: 缓存目录，不存在时自动创建
+    :param int max_bytes: 输出文件的总大小上限，保存新结果之后淘汰最久未使用的结果
+    """
+
+    def __init__(self, root: str, max_bytes: int = DEFAULT_SIZE):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    def key(self, action: str, args: Dict[str, Any]) -> Optional[str]:
+        """计算任务的键，任务不能缓存（例如从 stdin 读取输入）时为 None
+
+        无法读取输入文件时也为 None，由任务本身报告错误。
+        """
+        if action not in CACHEABLE or output_path(action, args) is None:
+            return None
+        input_keys, ignored = CACHEABLE[action]
+        inputs: Dict[str, List[str]] = {}
+        for name in input_keys:
+            try:
+                paths = _input_paths(args.get(name))
+                if paths is None:
+                    return None
+                inputs[name] = [file_digest(p) for p in paths]
+            except OSError:
+                return None
+        params = {
+            k: v
+            for k, v in args.items()
+            if k not in input_keys and k not in ignored and k != "output"
+        }
+        if action == "merge" and args.get("outlines") == "nest":
+            # 文件名会成为书签的标题
+            params["names"] = [
+                Path(p).stem for p in _input_paths(args["inputs"]) or []
+            ]
+        record = {
+            "version": __version__,
+            "action": action,
+            "params": params,
+            "inputs": inputs,
+        }
+        text = json.dumps(record, sort_keys=True, default=str)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        folder = self.root / key[:2]
+        return folder / f"{key}.pdf", folder / f"{key}.json"
+
+    def _read_meta(self, meta_path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with open(meta_path, "rt", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, meta_path: Path, meta: Dict[str, Any]):
+        tmp = meta_path.with_name(f".{meta_path.name}.{uuid.uuid4().hex}")
+        with open(tmp, "wt", encoding="utf-8") as file:
+            json.dump(meta, file)
+        os.replace(tmp, meta_path)
+
+    def fetch(self, key: str, output: str) -> bool:
+        """命中时将结果放到 ``output`` （硬链接或复制）并返回 True
+
+        输出文件在缓存之外被改写过的结果会被丢弃。
+        """
+        pdf_path, meta_path = self._paths(key)
+        meta = self._read_meta(meta_path)
+        if meta is None:
+            return False
+        try:
+            st = os.stat(pdf_path)
+        except OSError:
+            return False
+        if st.st_size != meta.get("size") or st.st_mtime_ns != meta.get("mtime_ns"):
+            self._remove(key)
+            return False
+        try:
+            _place(pdf_path, Path(output))
+        except FileNotFoundError:
+            # 刚被其他进程淘汰
+            return False
+        meta["hits"] = meta.get("hits", 0) + 1
+        self._write_meta(meta_path, meta)
+        return True
+
+    def store(self, key: str, action: str, output: str):
+        "将任务的输出文件保存为 ``key`` 对应的结果，然后淘汰超出大小上限的结果"
+        pdf_path, meta_path = self._paths(key)
+        pdf_path.parent.mkdir(parents=True, exist_ok=True)
+        _place(Path(output), pdf_path)
+        st = os.stat(pdf_path)
+        self._write_meta(
+            meta_path, {
+                "action": action,
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "created": time.time(),
+                "hits": 0
+            })
+        self.prune()
+
+    @staticmethod
+    def prepare(output: str):
+        """在写出任务的输出之前调用
+
+        输出路径是上次命中时链接出去的文件时，先删除它，避免原地改写缓存中的结果。
+        """
+        try:
+            if os.stat(output).st_nlink > 1:
+                os.unlink(output)
+        except OSError:
+            pass
+
+    def entries(self) -> Iterator[CacheEntry]:
+        "缓存中的全部结果，顺序不定"
+        if not self.root.is_dir():
+            return
+        for meta_path in self.root.glob("??/*.json"):
+            meta = self._read_meta(meta_path)
+            try:
+                used = meta_path.stat().st_mtime
+            except OSError:
+                continue
+            if meta is None:
+                continue
+            yield CacheEntry(meta_path.stem, meta.get("action", ""),
+                             meta.get("size", 0), used, meta.get("hits", 0))
+
+    def stats(self) -> Dict[str, Any]:
+        "结果数、总字节数、大小上限、累计命中次数，以及各任务的结果数"
+        entries = list(self.entries())
+        actions: Dict[str, int] = {}
+        for entry in entries:
+            actions[entry.action] = actions.get(entry.action, 0) + 1
+        return {
+            "entries": len(entries),
+            "bytes": sum(e.size for e in entries),
+            "max_bytes": self.max_bytes,
+            "hits": sum(e.hits for e in entries),
+            "actions": actions,
+        }
+
+    def _remove(self, key: str):
+        pdf_path, meta_path = self._paths(key)
+        for path in (meta_path, pdf_path):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def prune(self, max_bytes: Optional[int] = None) -> Tuple[int, int]:
+        """按最近使用的时间淘汰结果，直到总大小不超过 ``max_bytes`` （默认为缓存的上限）
+
+        同时清理没有对应记录的输出文件与残留的临时文件。
+
+        :returns: (淘汰的结果数, 释放的字节数)
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self.entries(), key=lambda e: e.used)
+        total = sum(e.size for e in entries)
+        removed = freed = 0
+        for entry in entries:
+            if total <= limit:
+                break
+            self._remove(entry.key)
+            total -= entry.size
+            removed += 1
+            freed += entry.size
+
+        if self.root.is_dir():
+            now = time.time()
+            for path in self.root.glob("??/*"):
+                orphan = path.suffix == ".pdf" and not path.with_suffix(".json").exists()
+                stale = path.name.startswith(".")
+                try:
+                    # 其他进程可能正在写入，只清理一小时之前的文件
+                    if (orphan or stale) and now - path.stat().st_mtime > 3600:
+                        path.unlink()
+                except OSError:
+                    pass
+        return removed, freed
+
+
+def _place(src: Path, dst: Path):
+    "原子地将 ``src`` 硬链接到 ``dst`` ，无法硬链接时复制"
+    try:
+        if os.path.samefile(src, dst):
+            # 已经是同一个文件，rename 在这种情况下什么也不做，会留下临时文件
+            return
+    except OSError:
+        pass
+    tmp = dst.with_name(f".{dst.name}.{uuid.uuid4().hex}")
+    try:
+        os.link(src, tmp)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
@@ -0,0 +1,159 @@
+"""将文档拆分为多页的分块。
+
++ :func:`chunk_by_pages`：每块至多 N 页
++ :func:`chunk_by_bytes`：每块的预计大小不超过给定的字节数
+
+按大小分块时不试存文件，而是由 :class:`SizeEstimator` 估计每一页写入新文件时增加的字节数：
+遍历页面引用的全部间接对象（不包括页面树与其他页面），累加它们序列化后的长度与流的原始数据长度。
+同一块中已经计入的对象不再重复计入，因此多页共用的字体、图像只在每块中计算一次。
+对象的大小按对象编号缓存，整个文档只需遍历一遍。
+
+估计值偏保守：内容流在保存时可能被压缩，生成对象流的保存方案也会让实际文件更小。
+"""
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+# mypy 无法导入类型声明
+from pikepdf import Array  # type: ignore
+from pikepdf import Dictionary
+from pikepdf import Name
+from pikepdf import Object
+from pikepdf import Pdf
+from pikepdf import Stream
+
+from .prune import ResourceUsage
+
+__all__ = ("SizeEstimator", "chunk_by_pages", "chunk_by_bytes")
+
+ObjGen = Tuple[int, int]
+
+# 每个间接对象的 ``n 0 obj ... endobj`` 与交叉引用表条目
+OBJECT_OVERHEAD = 50
+# 流对象额外的 ``stream ... endstream`` 与 /Length
+STREAM_OVERHEAD = 40
+# 文件头、目录、页面树、交叉引用表与 trailer，以及线性化的提示流
+FILE_OVERHEAD = 4096
+
+# 可能引用其他对象的类型；数字、名称等在遍历时会被转换为 Python 对象
+_CONTAINERS = (Dictionary, Array, Stream)
+
+
+def chunk_by_pages(total: int, pages: int) -> List[Tuple[int, int]]:
+    """将 ``[0, total)`` 依次划分为每块至多 ``pages`` 页的左闭右开区间
+
+    :raises ValueError: ``pages`` 不是正数
+    """
+    if pages <= 0:
+        raise ValueError(f"每块的页数应当为正数：{pages}")
+    return [(start, min(start + pages, total)) for start in range(0, total, pages)]
+
+
+class SizeEstimator:
+    """估计页面写入新文件时增加的字节数
+
+    :param usage: 不为 None 时，按照去除未使用资源之后的资源字典估计，见 :mod:`pdfwork.prune`
+    """
+
+    def __init__(self, usage: Optional[ResourceUsage] = None):
+        self.usage = usage
+        self._sizes: Dict[ObjGen, int] = {}
+
+    def _size(self, obj: Object) -> int:
+        "间接对象自身序列化后的字节数，不包括它引用的其他间接对象"
+        key = obj.objgen
+        size = self._sizes.get(key)
+        if size is None:
+            if isinstance(obj, Stream):
+                length = obj.stream_dict.get("/Length")
+                raw = int(length) if length is not None else len(
+                    obj.read_raw_bytes())
+                size = len(obj.stream_dict.unparse()) + raw + STREAM_OVERHEAD
+            else:
+                size = len(obj.unparse(resolved=True))
+            size += OBJECT_OVERHEAD
+            self._sizes[key] = size
+        return size
+
+    def page_cost(self, page, seen: Set[ObjGen]) -> Tuple[int, Set[ObjGen]]:
+        """估计在已经包含 ``seen`` 中各对象的文件里加入 ``page`` 时增加的字节数
+
+        :param page: 页面
+        :param seen: 文件中已经计入的间接对象，不会被修改
+        :returns: (字节数, 新计入的间接对象)
+        """
+        obj = getattr(page, "obj", page)
+        resources = self.usage.prune(obj) if self.usage is not None else None
+        if resources is None:
+            resources = obj.get("/Resources")
+            if resources is None:
+                # 继承自页面树的资源字典会被复制到页面上
+                node = obj.get("/Parent")
+                while node is not None and resources is None:
+                    resources = node.get("/Resources")
+                    node = node.get("/Parent")
+
+        # 页面自身，资源字典另外计算
+        own = Dictionary(
+            {k: v
+             for k, v in obj.items() if k not in ("/Parent", "/Resources")})
+        added: Set[ObjGen] = {obj.objgen}
+        total = len(own.unparse()) + OBJECT_OVERHEAD
+        stack: List[Object] = [
+            v for v in own.values() if isinstance(v, _CONTAINERS)
+        ]
+        if resources is not None:
+            if resources.is_indirect:
+                stack.append(resources)
+            else:
+                # 直接对象形式的资源字典是页面的一部分
+                total += len(resources.unparse(resolved=True))
+                stack.extend(v for v in resources.values()
+                             if isinstance(v, _CONTAINERS))
+
+        while stack:
+            item = stack.pop()
+            if item.is_indirect:
+                key = item.objgen
+                if key in seen or key in added:
+                    continue
+                if isinstance(item, Dictionary) and item.get("/Type") == Name.Page:
+                    # 链接等指向的其他页面不会随当前页面一起复制
+                    continue
+                added.add(key)
+                total += self._size(item)
+            if isinstance(item, Array):
+                stack.extend(v for v in item if isinstance(v, _CONTAINERS))
+            else:
+                stack.extend(v for k, v in item.items()
+                             if k != "/Parent" and isinstance(v, _CONTAINERS))
+        return total, added
+
+
+def chunk_by_bytes(pdf: Pdf, max_bytes: int,
+                   estimator: SizeEstimator) -> List[Tuple[int, int, int]]:
+    """将文档的页面依次划分为预计大小不超过 ``max_bytes`` 的分块，只遍历一遍页面
+
+    单独一页就超过 ``max_bytes`` 时，该页单独成为一块。
+
+    :returns: ``(起始页, 结束页, 预计字节数)`` 的列表，页码为左闭右开区间
+    """
+    chunks: List[Tuple[int, int, int]] = []
+    start = 0
+    seen: Set[ObjGen] = set()
+    size = FILE_OVERHEAD
+    for i, page in enumerate(pdf.pages):
+        cost, added = estimator.page_cost(page, seen)
+        if i > start and size + cost > max_bytes:
+            chunks.append((start, i, size))
+            start = i
+            seen = set()
+            size = FILE_OVERHEAD
+            cost, added = estimator.page_cost(page, seen)
+        seen |= added
+        size += cost
+    if len(pdf.pages) > start:
+        chunks.append((start, len(pdf.pages), size))
+    return chunks
@@ -1,40 +1,258 @@
 """PdfWork 的命令行入口
+
+模块级只导入解析选项所需的轻量模块。pikepdf、tqdm 与各个 ``action_*`` 函数在执行命令时才导入，
+``--help``、``version`` 以及交给服务端执行的命令都不需要加载它们。
 """
+import inspect
+import re
+import signal
+import sys
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Dict
 from typing import List
 from typing import Optional
+from typing import cast
 
-import pikepdf
 import typer
 
 from . import __version__
-from .actions import action_erase_outline
-from .actions import action_export_outline
-from .actions import action_import_outline
-from .actions import action_merge
-from .actions import action_optimize
-from .actions import action_split
+from . import access
+from .profiles import PROFILES
+
+if TYPE_CHECKING:
+    from .cache import ResultCache
 
 __all__ = ("cli_main", )
 
-cli_main = typer.Typer(name="pdfwork")
+# 较新的 typer 默认用 rich 排版帮助信息，仅导入 rich 就要上百毫秒，这里改用 click 的纯文本格式
+_HELP_OPTIONS: Dict[str, Any] = {
+    "rich_markup_mode": None
+} if "rich_markup_mode" in inspect.signature(typer.Typer).parameters else {}
+
+cli_main = typer.Typer(name="pdfwork", **_HELP_OPTIONS)
+
+# 由 --server 设置，不为 None 时命令交给服务端执行
+_server: Optional[str] = None
+# 由 --cache 设置
+_cache: "Optional[ResultCache]" = None
+
+
+_SIZE_UNITS = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3}
+
+
+def _parse_size(text: Optional[str]) -> Optional[int]:
+    "解析 ``10M``、``500k``、``1.5GB``、``4096`` 这样的字节数，单位以 1024 为进制"
+    if text is None:
+        return None
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kmg]?)(?:i?b)?\s*", text,
+                         re.IGNORECASE)
+    if match is None:
+        raise typer.BadParameter(f"无法解析的大小 {text!r}，例如 10M、500k、4096")
+    size = int(float(match.group(1)) * _SIZE_UNITS[match.group(2).lower()])
+    if size <= 0:
+        raise typer.BadParameter("应当为正数")
+    return size
+
+
+@cli_main.callback()
+def main(ctx: typer.Context,
+         trace_path: Optional[str] = typer.Option(
+             None,
+             "--trace",
+             help="将各阶段的耗时、CPU 时间、条目数与进程的峰值内存写入此文件",
+             metavar="PATH"),
+         trace_format: str = typer.Option("jsonl",
+                                          help="记录格式：jsonl（每行一条，追加写入）或 chrome（trace-event）"),
+         io_mode: str = typer.Option("default",
+                                     help="读取输入文件的方式：default（由 pikepdf 决定）、mmap（内存映射）或 buffered（按块读取）"),
+         server: Optional[str] = typer.Option(
+             None,
+             envvar="PDFWORK_SERVER",
+             help="交给 pdfwork serve 执行：Unix 套接字路径或 http://127.0.0.1:端口",
+             metavar="ADDRESS"),
+         cache: Optional[str] = typer.Option(
+             None,
+             envvar="PDFWORK_CACHE",
+             help="结果缓存目录，输入与参数都相同时直接使用上一次的输出",
+             metavar="DIR"),
+         cache_size: Optional[str] = typer.Option(
+             None,
+             envvar="PDFWORK_CACHE_SIZE",
+             help="结果缓存的大小上限，如 500M，默认 1G，超出时淘汰最久未使用的结果",
+             metavar="SIZE",
+             callback=_parse_size)):
+    "基于 pikepdf 封装的 PDF 文件处理命令行工具"
+    global _server, _cache
+    _server = server
+    if cache is not None:
+        from .cache import DEFAULT_SIZE
+        from .cache import ResultCache
+
+        # 已经由 _parse_size 转换为字节数
+        max_bytes = cast(Optional[int], cache_size)
+        _cache = ResultCache(cache, max_bytes or DEFAULT_SIZE)
+    if io_mode not in access.MODES:
+        raise typer.BadParameter(f"可选：{', '.join(access.MODES)}",
+                                 param_hint="--io-mode")
+    access.set_mode(io_mode)
+    if trace_path is not None:
+        from . import trace
+        if trace_format not in trace.FORMATS:
+            raise typer.BadParameter(f"可选：{', '.join(trace.FORMATS)}",
+                                     param_hint="--trace-format")
+        trace.enable(trace_path, trace_format)
+        ctx.call_on_close(trace.disable)
+
+
+def _check_profile(value: Optional[str]) -> Optional[str]:
+    if value is not None and value not in PROFILES:
+        raise typer.BadParameter(f"可选：{', '.join(PROFILES)}")
+    return value
+
+
+def save_profile_option(default: Optional[str]):
+    "各命令共用的 ``--save-profile`` 选项"
+    return typer.Option(default,
+                        "--save-profile",
+                        help="保存方案：fast（最快）、compact（体积最小）、web（线性化，适合网络加载）",
+                        callback=_check_profile)
+
+
+def _check_outline_format(value: str) -> str:
+    from .outline import FORMATS as OUTLINE_FORMATS
+    if value not in OUTLINE_FORMATS:
+        raise typer.BadParameter(f"可选：{', '.join(OUTLINE_FORMATS)}")
+    return value
+
+
+def _check_merge_outlines(value: Optional[str]) -> Optional[str]:
+    if value is not None and value not in ("keep", "nest"):
+        raise typer.BadParameter("可选：keep, nest")
+    return value
+
+
+def outline_format_option():
+    "outline import / export 共用的 ``--format`` 选项"
+    return typer.Option("text",
+                        "--format",
+                        help="书签格式：text（缩进文本）、json（嵌套数组）或 jsonl（每行一个书签）",
+                        callback=_check_outline_format)
+
+
+def _call(action: str, **args):
+    """执行 ``action_{action}`` ；指定了 ``--server`` 时交给服务端执行，并转发其输出
+
+    指定了 ``--cache`` 时先查找缓存，命中则不再执行（也不导入 pikepdf），否则在成功后保存结果。
+    """
+    cache = _cache
+    key = cache.key(action, args) if cache is not None else None
+    if key is None:
+        return _run(action, **args)
+    assert cache is not None
+
+    from .cache import output_path
+    output = output_path(action, args)
+    # 有键的任务一定有输出路径，见 ResultCache.key
+    assert output is not None
+    if cache.fetch(key, output):
+        typer.echo(f"使用缓存的结果：{output}", err=True)
+        return
+    cache.prepare(output)
+    result = _run(action, **args)
+    try:
+        cache.store(key, action, output)
+    except OSError as e:
+        typer.secho(f"WARNING: 无法写入缓存：{e}", fg="yellow", err=True)
+    return result
+
+
+def _pdf_inputs(action: str, args: Dict[str, Any]) -> List[str]:
+    "任务参数中的 PDF 输入路径"
+    keys = ("pdf", ) if action == "import_outline" else ("pdf", "input", "inputs", "src")
+    paths: List[str] = []
+    for key in keys:
+        value = args.get(key)
+        if isinstance(value, str):
+            paths.append(value)
+        elif isinstance(value, list):
+            paths.extend(value)
+    return paths
+
+
+def _run(action: str, **args):
+    if _server is None:
+        from . import actions
+        return getattr(actions, f"action_{action}")(**args)
+
+    from . import client
+
+    if any(access.is_stdin(p) for p in _pdf_inputs(action, args)):
+        # 服务端的工作进程读不到客户端的 stdin
+        typer.secho("ERROR: 使用 --server 时 PDF 输入不能为 -，请先写入文件", fg="red", err=True)
+        raise typer.Exit(2)
+    stdin = None
+    if action == "import_outline" and args.get("input") is None:
+        stdin = sys.stdin.read()
+    try:
+        response = client.submit(_server, action, stdin=stdin, **args)
+    except OSError as e:
+        typer.secho(f"ERROR: 无法连接服务端 {_server}：{e}", fg="red", err=True)
+        raise typer.Exit(2)
+    sys.stdout.write(response.get("stdout", ""))
+    sys.stderr.write(response.get("stderr", ""))
+    if not response["ok"]:
+        typer.secho(f"ERROR: {response['error']}", fg="red", err=True)
+        raise typer.Exit(1)
 
 
 @cli_main.command()
 def version():
     "显示应用程序版本"
+    # 从安装信息中读取版本号，不必导入 pikepdf
+    from importlib.metadata import PackageNotFoundError
+    from importlib.metadata import version as package_version
+    try:
+        pikepdf_version = package_version("pikepdf")
+    except PackageNotFoundError:
+        pikepdf_version = "未安装"
     typer.echo(f"pdfwork {__version__}")
-    typer.echo(f"+ pikepdf {pikepdf.__version__}")
+    typer.echo(f"+ pikepdf {pikepdf_version}")
 
 
 @cli_main.command()
 def merge(pdfs: List[str] = typer.Argument(
     ..., help="PDF 文档路径，如果为 `@` 开头的文本文件，则按照每行一个的规则读取其中的文件路径"),
-          out: str = typer.Option(..., "-o", help="输出文件路径", metavar="PATH")):
-    """合并两个或多个 PDF 文档，注意，书签可能丢失，需要提前导出备份：
+          out: str = typer.Option(..., "-o", help="输出文件路径", metavar="PATH"),
+          jobs: int = typer.Option(1,
+                                   "--jobs",
+                                   "-j",
+                                   help="并行的工作进程数，小于等于 0 时使用全部 CPU 核心"),
+          group_size: int = typer.Option(64, help="并行合并时，每个工作进程一次合并的文件数"),
+          max_open: Optional[int] = typer.Option(None, help="并行合并时，同时打开的文件数上限"),
+          prefetch: int = typer.Option(4, help="在后台预先打开的文件数，为 0 时不预先打开"),
+          profile: str = save_profile_option("web"),
+          outlines: Optional[str] = typer.Option(
+              None,
+              help="保留书签：keep（目标页码依次顺延）或 nest（放在以文件名为标题的书签下），默认丢弃",
+              metavar="MODE",
+              callback=_check_merge_outlines),
+          dedup: bool = typer.Option(
+              False, help="按内容去除各文件中重复的字体、图像、ICC 配置等流对象，并报告节省的字节数")):
+    """合并两个或多个 PDF 文档，默认丢弃书签，使用 --outlines 保留：
 
-        pdfwork outline export -o outlines.txt this.pdf
+        pdfwork merge a.pdf b.pdf -o ab.pdf --outlines nest
     """
-    return action_merge(pdfs, out)
+    return _call("merge",
+                 inputs=pdfs,
+                 output=out,
+                 jobs=jobs,
+                 group_size=group_size,
+                 max_open=max_open,
+                 prefetch=prefetch,
+                 profile=profile,
+                 outlines=outlines,
+                 dedup=dedup)
 
 
 @cli_main.command()
@@ -42,12 +260,53 @@ def split(pdf: str = typer.Argument(..., help="输入文件路径"),
           out: Optional[str] = typer.Option(".",
                                             "-o",
                                             help="输出路径，用 {0:d} 表示序列化模板",
-                                            metavar="PATH TEMPLATE")):
-    "分隔 PDF 文档为单页文档"
-    return action_split(pdf, out)
+                                            metavar="PATH TEMPLATE"),
+          jobs: int = typer.Option(1,
+                                   "--jobs",
+                                   "-j",
+                                   help="并行的工作进程数，小于等于 0 时使用全部 CPU 核心"),
+          profile: str = save_profile_option("fast"),
+          prune: bool = typer.Option(True,
+                                     "--prune/--no-prune",
+                                     help="去除每一页未使用的字体、图像等资源"),
+          chunk_pages: Optional[int] = typer.Option(
+              None, help="每个文件至多包含的页数，默认每页一个文件", metavar="N"),
+          chunk_size: Optional[str] = typer.Option(
+              None,
+              help="每个文件预计的大小上限，如 10M、500k，按估计值一次规划全部分块",
+              metavar="SIZE",
+              callback=_parse_size)):
+    """分隔 PDF 文档为单页文档，或者按页数、大小分为多页的文件：
+
+        pdfwork split big.pdf -o "{:03d}.pdf" --chunk-size 10M
+    """
+    if chunk_pages is not None and chunk_size is not None:
+        raise typer.BadParameter("--chunk-pages 与 --chunk-size 只能指定一个")
+    if chunk_pages is not None and chunk_pages <= 0:
+        raise typer.BadParameter("应当为正数", param_hint="--chunk-pages")
+    # 已经由 _parse_size 转换为字节数
+    chunk_bytes = cast(Optional[int], chunk_size)
+    return _call("split",
+                 input=pdf,
+                 outputs=out,
+                 jobs=jobs,
+                 profile=profile,
+                 prune=prune,
+                 chunk_pages=chunk_pages,
+                 chunk_size=chunk_bytes)
+
 
+@cli_main.command()
+def extract(pdf: str = typer.Argument(..., help="输入文件路径"),
+            pages: str = typer.Argument(
+                ..., help="页码区间，从 0 开始，与 Python 切片规则相同，如 0:20,399:420,-5:"),
+            out: str = typer.Option(..., "-o", help="输出文件路径", metavar="PATH"),
+            profile: str = save_profile_option("web")):
+    "按页码区间提取页面，保存为一个 PDF 文档"
+    return _call("extract", input=pdf, pages=pages, output=out, profile=profile)
 
-outline = typer.Typer(name="outline", help="操作 PDF 中的书签对象")
+
+outline = typer.Typer(name="outline", help="操作 PDF 中的书签对象", **_HELP_OPTIONS)
 cli_main.add_typer(outline)
 
 
@@ -56,9 +315,10 @@ def erase_outline(pdf: str,
                   out: str = typer.Option(...,
                                           "-o",
                                           help="输出路径",
-                                          metavar="PATH")):
+                                          metavar="PATH"),
+                  profile: str = save_profile_option("web")):
     "抹除 PDF 中的书签"
-    action_erase_outline(pdf, out)
+    _call("erase_outline", pdf=pdf, output=out, profile=profile)
 
 
 @outline.command("import")
@@ -72,9 +332,17 @@ def import_outline(
         ),
         out: str = typer.Option(..., "-o", help="新生成 PDF 文件的保存路径"),
         offset: int = typer.Option(
-            0, help="物理页码对逻辑页码的差。例如，正文第 1 页在 PDF 文件的第 33 页，则认为偏差为 32")):
-    "从文本文件导入书签到 PDF"
-    action_import_outline(pdf, input, out, offset)
+            0, help="物理页码对逻辑页码的差。例如，正文第 1 页在 PDF 文件的第 33 页，则认为偏差为 32"),
+        profile: str = save_profile_option("web"),
+        fmt: str = outline_format_option()):
+    "从缩进文本、JSON 或 JSON lines 文件导入书签到 PDF"
+    _call("import_outline",
+          pdf=pdf,
+          input=input,
+          output=out,
+          offset=offset,
+          profile=profile,
+          fmt=fmt)
 
 
 @outline.command("export")
@@ -83,13 +351,200 @@ def export_outline(pdf: str = typer.Argument(..., help="PDF 文件路径"),
                        None,
                        "-o",
                        help="输出书签文本文件的路径，默认输出到 stdout",
-                       metavar="PATH")):
-    "将 PDF 中的书签导出为文本格式"
-    return action_export_outline(pdf, out)
+                       metavar="PATH"),
+                   fmt: str = outline_format_option()):
+    "将 PDF 中的书签导出为缩进文本、JSON 或 JSON lines 格式"
+    return _call("export_outline", pdf=pdf, output=out, fmt=fmt)
 
 
 @cli_main.command()
 def optimize(pdf: str = typer.Argument(..., help="PDF 文件路径"),
-             output: Optional[str] = typer.Option(None, "-o", help="输出路径")):
-    "优化 PDF 文件：线性化、去重、去除未引用资源"
-    action_optimize(pdf, output)
+             output: Optional[str] = typer.Option(None, "-o", help="输出路径"),
+             jobs: int = typer.Option(4,
+                                      "--jobs",
+                                      "-j",
+                                      help="计算摘要的线程数，小于等于 0 时使用全部 CPU 核心"),
+             all_streams: bool = typer.Option(False,
+                                              "--all-streams",
+                                              help="对字体、ICC 配置、表单、图案等全部流对象去重，而不仅是图像"),
+             profile: str = save_profile_option("compact")):
+    "优化 PDF 文件：去重、去除未引用资源，然后以紧凑的方式保存"
+    if access.is_stdin(pdf) and output is None:
+        raise typer.BadParameter("从 stdin 读取时必须指定输出路径", param_hint="-o")
+    _call("optimize",
+          src=pdf,
+          output=output,
+          jobs=jobs,
+          all_streams=all_streams,
+          profile=profile)
+
+
+@cli_main.command()
+def pipe(steps: Optional[List[str]] = typer.Argument(
+    None, help="步骤，每个参数一步，如 \"merge a.pdf b.pdf outlines=keep\"", metavar="STEP..."),
+         plan: Optional[str] = typer.Option(None,
+                                            "--plan",
+                                            "-p",
+                                            help="YAML 或 JSON 格式的计划文件",
+                                            metavar="PATH"),
+         out: Optional[str] = typer.Option(None,
+                                           "-o",
+                                           help="输出文件路径，覆盖计划文件中的 output",
+                                           metavar="PATH"),
+         profile: Optional[str] = save_profile_option(None),
+         check: bool = typer.Option(False, "--check", help="只检查计划，不打开任何 PDF 文件")):
+    """在一个内存中的文档上依次执行多个步骤，最后只保存一次：
+
+        pdfwork pipe -o book.pdf "merge a.pdf b.pdf" "extract 0:20,-5:" "import_outline toc.txt offset=2" optimize
+
+    可用的步骤：merge、extract、import_outline、erase_outline、optimize，参数与对应的命令相同。
+    """
+    if plan is None and not steps:
+        raise typer.BadParameter("需要指定 --plan 或者至少一个步骤")
+    _call("pipe", plan=plan, steps=steps or [], output=out, profile=profile,
+          check=check)
+
+
+@cli_main.command()
+def batch(manifest: str = typer.Argument(..., help="任务清单：JSON lines，或 .csv 后缀的 CSV"),
+          jobs: int = typer.Option(4,
+                                   "--jobs",
+                                   "-j",
+                                   help="工作进程数，小于等于 0 时使用全部 CPU 核心"),
+          log: Optional[str] = typer.Option(None,
+                                            help="结果日志，默认为清单路径加 .log.jsonl 后缀",
+                                            metavar="PATH"),
+          resume: bool = typer.Option(False, help="跳过结果日志中已经成功的任务，继续之前中断的批处理"),
+          retries: int = typer.Option(1, help="失败、超时或工作进程异常退出后重试的次数"),
+          timeout: Optional[float] = typer.Option(None,
+                                                  help="每个任务每次尝试的时间上限（秒）",
+                                                  metavar="SECONDS"),
+          memory: Optional[str] = typer.Option(None,
+                                               help="工作进程的内存总量上限，如 4G，超出时暂缓开始新的任务",
+                                               metavar="SIZE",
+                                               callback=_parse_size)):
+    """按清单并行执行大量任务，每行一个任务：
+
+        {"id": "jan", "action": "merge", "args": {"inputs": ["a.pdf", "b.pdf"], "output": "jan.pdf"}}
+
+    输入较大的任务先开始；每个任务结束后在结果日志中记录状态、耗时与输出大小，中断后用 --resume 继续。
+    """
+    from .batch import load_manifest
+    from .batch import run_batch
+    from .parallel import resolve_jobs
+
+    if retries < 0:
+        raise typer.BadParameter("不能为负数", param_hint="--retries")
+    if timeout is not None and timeout <= 0:
+        raise typer.BadParameter("应当为正数", param_hint="--timeout")
+    try:
+        tasks = load_manifest(manifest)
+    except (OSError, ValueError) as e:
+        typer.secho("ERROR: manifest={}".format(manifest), fg="red", err=True)
+        for problem in str(e).splitlines():
+            typer.secho("    {}".format(problem), fg="red", err=True)
+        raise typer.Exit(2)
+    log_path = log if log is not None else manifest + ".log.jsonl"
+    # 已经由 _parse_size 转换为字节数
+    memory_bytes = cast(Optional[int], memory)
+    try:
+        summary = run_batch(tasks, log_path, resolve_jobs(jobs), retries,
+                            timeout, memory_bytes, resume, _cache)
+    except KeyboardInterrupt:
+        typer.secho(f"已中断，使用 --resume 继续：pdfwork batch {manifest} --resume",
+                    fg="yellow",
+                    err=True)
+        raise typer.Exit(130)
+    typer.echo("成功 {ok}，失败 {failed}，超时 {timeout}，异常退出 {crashed}，跳过 {skipped}；"
+               "结果见 {log}".format(log=log_path, **summary),
+               err=True)
+    if summary["failed"] or summary["timeout"] or summary["crashed"]:
+        raise typer.Exit(1)
+
+
+cache_commands = typer.Typer(name="cache",
+                             help="管理结果缓存，缓存目录由 --cache 或 PDFWORK_CACHE 指定",
+                             **_HELP_OPTIONS)
+cli_main.add_typer(cache_commands)
+
+
+def _require_cache() -> "ResultCache":
+    if _cache is None:
+        typer.secho("ERROR: 未指定缓存目录，使用 pdfwork --cache DIR 或环境变量 PDFWORK_CACHE",
+                    fg="red",
+                    err=True)
+        raise typer.Exit(2)
+    return _cache
+
+
+@cache_commands.command("stats")
+def cache_stats():
+    "显示缓存中的结果数、总大小与命中次数"
+    cache = _require_cache()
+    stats = cache.stats()
+    typer.echo(f"目录：{cache.root}")
+    typer.echo("结果：{} 个{}".format(
+        stats["entries"], "（{}）".format("，".join(
+            f"{k} {v}" for k, v in sorted(stats["actions"].items())))
+        if stats["actions"] else ""))
+    typer.echo(f"大小：{stats['bytes']} 字节，上限 {stats['max_bytes']} 字节")
+    typer.echo(f"命中：{stats['hits']} 次")
+
+
+@cache_commands.command("prune")
+def cache_prune(max_size: Optional[str] = typer.Option(
+    None,
+    help="淘汰最久未使用的结果，直到总大小不超过此值，默认为 --cache-size",
+    metavar="SIZE",
+    callback=_parse_size),
+                all: bool = typer.Option(False, "--all", help="清空缓存")):
+    "按最近使用的时间淘汰缓存中的结果"
+    cache = _require_cache()
+    # 已经由 _parse_size 转换为字节数
+    max_bytes = cast(Optional[int], max_size)
+    removed, freed = cache.prune(0 if all else max_bytes)
+    typer.echo(f"淘汰了 {removed} 个结果，释放 {freed} 字节")
+
+
+@cli_main.command()
+def serve(socket: Optional[str] = typer.Option(None,
+                                               help="监听的 Unix 套接字路径",
+                                               metavar="PATH"),
+          port: Optional[int] = typer.Option(None, help="在 127.0.0.1 的此端口上提供 HTTP 服务"),
+          jobs: int = typer.Option(4,
+                                   "--jobs",
+                                   "-j",
+                                   help="工作进程数，即同时运行的任务数，小于等于 0 时使用全部 CPU 核心"),
+          queue: int = typer.Option(16, help="等待中的任务数上限，超出时拒绝新的任务")):
+    """常驻运行，预先启动工作进程，通过 Unix 套接字或 HTTP 接收任务：
+
+        pdfwork serve --socket /tmp/pdfwork.sock
+
+        pdfwork --server /tmp/pdfwork.sock outline import a.pdf -i a.txt -o b.pdf
+    """
+    from .parallel import resolve_jobs
+    from .server import JobServer
+    from .server import serve_http
+    from .server import serve_unix
+
+    if (socket is None) == (port is None):
+        raise typer.BadParameter("需要指定 --socket 或 --port 之一")
+    if queue < 0:
+        raise typer.BadParameter("不能为负数", param_hint="--queue")
+
+    # 收到 SIGTERM 时与 Ctrl-C 一样退出，以便清理套接字文件与工作进程
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    jobserver = JobServer(resolve_jobs(jobs), queue, access.get_mode())
+    jobserver.warm()
+    address = socket if socket is not None else f"http://127.0.0.1:{port}"
+    typer.echo(f"pdfwork serve: {address}，{jobserver.jobs} 个工作进程", err=True)
+    try:
+        if socket is not None:
+            serve_unix(socket, jobserver)
+        else:
+            assert port is not None
+            serve_http(port, jobserver)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        jobserver.close()
@@ -0,0 +1,88 @@
+"""``pdfwork serve`` 的客户端
+
+只依赖标准库，因此通过服务端执行命令时不需要导入 pikepdf。
+
+服务端地址可以是：
+
++ Unix 套接字的路径，或者 ``unix:`` 加路径：每行一个 JSON 请求，每行一个 JSON 应答，
+  同一个连接上可以依次发送多个请求
++ ``http://127.0.0.1:端口``：``POST /jobs`` 提交任务，``GET /status`` 查询状态
+
+请求的格式为::
+
+    {"action": "merge", "args": {"inputs": ["a.pdf", "b.pdf"], "output": "c.pdf"}, "cwd": "/path"}
+
+``action`` 为 :mod:`pdfwork.actions` 中 ``action_*`` 函数的后缀，或者 ``status``；
+``args`` 是传给该函数的关键字参数；相对路径按照 ``cwd`` 解析；
+``stdin`` 为可选的文本，作为任务的标准输入（例如 outline import 读取的书签）。
+
+应答的格式为::
+
+    {"ok": true, "stdout": "...", "stderr": "...", "seconds": 0.12}
+    {"ok": false, "error": "IndexError: ...", "stdout": "...", "stderr": "..."}
+"""
+import http.client
+import json
+import os
+import socket
+from typing import Any
+from typing import Dict
+from typing import Optional
+from urllib.parse import urlsplit
+
+__all__ = ("request", "submit")
+
+
+def request(address: str,
+            payload: Dict[str, Any],
+            timeout: Optional[float] = None) -> Dict[str, Any]:
+    """向服务端发送一个请求，返回应答
+
+    :raises OSError: 无法连接服务端
+    """
+    if address.startswith("http://"):
+        url = urlsplit(address)
+        conn = http.client.HTTPConnection(url.hostname or "127.0.0.1",
+                                          url.port or 80,
+                                          timeout=timeout)
+        try:
+            path = "/status" if payload.get("action") == "status" else "/jobs"
+            if path == "/status":
+                conn.request("GET", path)
+            else:
+                conn.request("POST",
+                             path,
+                             body=json.dumps(payload).encode("utf-8"),
+                             headers={"Content-Type": "application/json"})
+            return json.loads(conn.getresponse().read().decode("utf-8"))
+        finally:
+            conn.close()
+
+    path = address[len("unix:"):] if address.startswith("unix:") else address
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        with sock.makefile("rwb") as stream:
+            stream.write(json.dumps(payload).encode("utf-8") + b"\n")
+            stream.flush()
+            line = stream.readline()
+    if not line:
+        raise ConnectionError(f"服务端 {address} 关闭了连接")
+    return json.loads(line.decode("utf-8"))
+
+
+def submit(address: str,
+           action: str,
+           stdin: Optional[str] = None,
+           timeout: Optional[float] = None,
+           **args) -> Dict[str, Any]:
+    """提交一个任务，相对路径按照当前工作目录解析
+
+    :param str action: ``action_*`` 函数的后缀，例如 ``merge``、``import_outline``
+    :param stdin: 作为任务标准输入的文本
+    :param args: 传给 ``action_*`` 函数的关键字参数
+    """
+    payload: Dict[str, Any] = {"action": action, "args": args, "cwd": os.getcwd()}
+    if stdin is not None:
+        payload["stdin"] = stdin
+    return request(address, payload, timeout)
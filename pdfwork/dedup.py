@@ -0,0 +1,407 @@
+"""PDF 中重复流对象的识别与去重。
+
+流对象按 《原始（编码后的）数据 + 去除 ``/Length`` 的流字典》 计算摘要，
+因此无需解码数据，而 ``/Filter``、``/DecodeParms`` 以及图像尺寸、色彩空间等参数
+不同的流不会被误判为重复。
+
++ :func:`dedup_images` 、 :func:`dedup_streams` ：对一个已经打开的文档去重，用于 optimize
++ :class:`MergeDedup` ：合并时在复制每个文件的页面之后去重，用于 merge
+"""
+from collections import OrderedDict
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from hashlib import md5 as get_hash
+from time import perf_counter
+from typing import Deque
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+# mypy 无法导入类型声明
+from pikepdf import Array  # type: ignore
+from pikepdf import Dictionary
+from pikepdf import Name
+from pikepdf import Object
+from pikepdf import Pdf
+from pikepdf import Stream
+from tqdm import tqdm  # type: ignore
+
+__all__ = ("DedupStats", "MergeDedup", "stream_canonical_dict", "stream_kind",
+           "dedup_images", "dedup_streams")
+
+ObjGen = Tuple[int, int]
+
+# 可能引用其他对象的类型
+_CONTAINERS = (Dictionary, Array, Stream)
+# 合并去重时索引中最多保留的摘要数，每条约占 250 字节，默认上限约 50 MB
+MERGE_INDEX_SIZE = 200_000
+
+
+@dataclass
+class DedupStats:
+    """去重的统计结果
+
+    :param int objects: 被去除的重复对象数
+    :param int bytes: 被去除的重复对象的原始数据字节数
+    :param float seconds: 去重的耗时（秒），只在合并时统计
+    """
+    objects: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    def __iadd__(self, other: "DedupStats") -> "DedupStats":
+        self.objects += other.objects
+        self.bytes += other.bytes
+        self.seconds += other.seconds
+        return self
+
+
+def stream_canonical_dict(obj: Object) -> bytes:
+    """返回流字典的规范化表示：去除 ``/Length`` 后序列化。
+
+    qpdf 的字典键是有序的，间接引用会被序列化为 ``n g R``，因此结果是确定的。
+    """
+    stream_dict = obj.stream_dict
+    return Dictionary({k: v
+                       for k, v in stream_dict.items()
+                       if k != "/Length"}).unparse()
+
+
+def _digest(raw: bytes) -> bytes:
+    return get_hash(raw).digest()
+
+
+def _hash_streams(streams: List[Object], jobs: int,
+                  progress: tqdm) -> Tuple[List[bytes], List[int]]:
+    """计算一组流对象原始数据的摘要与长度。
+
+    qpdf 的对象不能在多个线程中同时读取，所以在当前线程中依次读取原始数据，
+    只将摘要计算交给线程池（hashlib 在计算时会释放 GIL）。
+    同时在计算中的数据块不超过 ``jobs * 2`` 个。
+    """
+    digests: List[bytes] = []
+    sizes: List[int] = []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending: Deque[Future] = deque()
+        for obj in streams:
+            raw = obj.read_raw_bytes()
+            sizes.append(len(raw))
+            pending.append(executor.submit(_digest, raw))
+            if len(pending) >= jobs * 2:
+                digests.append(pending.popleft().result())
+                progress.update()
+        while pending:
+            digests.append(pending.popleft().result())
+            progress.update()
+    return digests, sizes
+
+
+def dedup_images(pdf: Pdf, jobs: int = 4) -> DedupStats:
+    """将页面资源中重复的图像引用指向同一个对象。
+
+    每个间接对象只读取、计算一次摘要，摘要相同的对象中最先出现的一个作为规范对象。
+    被替换掉的对象不再被引用，保存时会被丢弃。
+
+    :param int jobs: 计算摘要的线程数
+    """
+    # 引用表：(页面, 资源名, 对象编号)
+    refs: List[Tuple[Object, str, ObjGen]] = []
+    # 对象编号 => 对象，保持首次出现的顺序
+    streams: Dict[ObjGen, Object] = {}
+
+    for page in pdf.pages:
+        resources = page.get("/Resources")
+        xobjects = resources.get("/XObject") if resources is not None else None
+        if xobjects is None:
+            continue
+        for name, obj in xobjects.items():
+            if obj.get("/Subtype") != Name.Image:
+                continue
+            refs.append((xobjects, name, obj.objgen))
+            streams.setdefault(obj.objgen, obj)
+
+    progress = tqdm(total=len(streams), desc="查重", ascii=True)
+    digests, sizes = _hash_streams(list(streams.values()), jobs, progress)
+    progress.close()
+
+    # 对象编号 => 规范对象
+    canonical: Dict[ObjGen, Object] = {}
+    first: Dict[bytes, Object] = {}
+    stats = DedupStats()
+    for (objgen, obj), digest, size in zip(streams.items(), digests, sizes):
+        kept = first.setdefault(stream_canonical_dict(obj) + digest, obj)
+        canonical[objgen] = kept
+        if kept is not obj:
+            stats.objects += 1
+            stats.bytes += size
+
+    for xobjects, name, objgen in tqdm(refs, desc="去重", ascii=True):
+        kept = canonical[objgen]
+        if kept.objgen != objgen:
+            xobjects[name] = kept
+
+    return stats
+
+
+def stream_kind(obj: Object) -> str:
+    """粗略判断流对象的用途，用于分类统计。
+    """
+    type_ = obj.get("/Type")
+    subtype = obj.get("/Subtype")
+    if type_ == Name.XObject and subtype == Name.Image:
+        return "Image"
+    elif type_ == Name.XObject and subtype == Name.Form:
+        return "Form"
+    elif "/PatternType" in obj:
+        return "Pattern"
+    elif "/ShadingType" in obj:
+        return "Shading"
+    elif "/FunctionType" in obj:
+        return "Function"
+    elif ("/Length1" in obj or "/Length2" in obj
+          or subtype in (Name.Type1C, Name.CIDFontType0C, Name.OpenType)):
+        return "FontFile"
+    elif "/N" in obj:
+        return "ICCProfile"
+    elif type_ == Name.Metadata:
+        return "Metadata"
+    else:
+        return "Stream"
+
+
+def _resolve(remap: Dict[ObjGen, ObjGen], objgen: ObjGen) -> ObjGen:
+    while objgen in remap:
+        objgen = remap[objgen]
+    return objgen
+
+
+def _canonical_dict(container: Object, remap: Dict[ObjGen, ObjGen]) -> bytes:
+    """序列化流字典（或其中嵌套的字典），去除 ``/Length`` ，
+    指向重复对象的引用被替换为指向规范对象的引用。
+
+    这样，引用了两个相同字体的两个表单对象也能被识别为重复。
+    """
+    return b"<<" + b" ".join(
+        k.encode() + b" " + _canonical_value(v, remap)
+        for k, v in sorted(_items(container), key=lambda kv: kv[0])
+        if k != "/Length") + b">>"
+
+
+def _canonical_value(obj: Object, remap: Dict[ObjGen, ObjGen]) -> bytes:
+    if isinstance(obj, Object) and obj.is_indirect:
+        num, gen = _resolve(remap, obj.objgen)
+        return f"{num} {gen} R".encode()
+    elif isinstance(obj, Dictionary):
+        return _canonical_dict(obj, remap)
+    elif isinstance(obj, Array):
+        return b"[" + b" ".join(_canonical_value(v, remap)
+                                for v in obj) + b"]"
+    elif isinstance(obj, Object):
+        return obj.unparse()
+    else:
+        return repr(obj).encode()
+
+
+def _items(container: Object) -> List[Tuple[str, Object]]:
+    if isinstance(container, Stream):
+        return list(container.stream_dict.items())
+    return list(container.items())
+
+
+def _iter_containers(pdf: Pdf) -> Iterator[Object]:
+    """遍历文档中所有可能包含引用的字典与数组，包括嵌套的直接对象。
+    """
+    stack = [pdf.trailer]
+    for obj in pdf.objects:
+        if isinstance(obj, (Dictionary, Array, Stream)):
+            stack.append(obj)
+    while stack:
+        container = stack.pop()
+        yield container
+        values = list(container) if isinstance(container, Array) else [
+            v for _, v in _items(container)
+        ]
+        for v in values:
+            if isinstance(v, (Dictionary, Array)) and not v.is_indirect:
+                stack.append(v)
+
+
+def _is_ref(v: Object, remap: Dict[ObjGen, ObjGen]) -> bool:
+    return isinstance(v, Object) and v.is_indirect and v.objgen in remap
+
+
+def dedup_streams(pdf: Pdf, jobs: int = 4) -> Dict[str, DedupStats]:
+    """对整个文档中的流对象按内容去重，并将所有引用改写为指向规范对象。
+
+    流对象按 《原始数据的摘要 + 规范化的流字典》 建立内容寻址索引。
+    由于流字典中可能引用其他流（例如表单对象引用的字体），
+    去重会重复进行，直到不再发现新的重复对象。
+    被替换掉的对象不再被引用，保存时会被丢弃。
+
+    :param int jobs: 计算摘要的线程数
+
+    :returns: 按 :func:`stream_kind` 分类的统计结果
+    """
+    streams: Dict[ObjGen, Object] = {
+        obj.objgen: obj
+        for obj in pdf.objects
+        if isinstance(obj, Stream)
+        and obj.get("/Type") not in (Name.ObjStm, Name.XRef)
+    }
+
+    progress = tqdm(total=len(streams), desc="查重", ascii=True)
+    digests, sizes = _hash_streams(list(streams.values()), jobs, progress)
+    progress.close()
+    raw = {
+        objgen: (digest, size)
+        for objgen, digest, size in zip(streams, digests, sizes)
+    }
+
+    # 重复对象编号 => 规范对象编号
+    remap: Dict[ObjGen, ObjGen] = {}
+    while True:
+        first: Dict[bytes, ObjGen] = {}
+        found = False
+        for objgen, obj in streams.items():
+            if objgen in remap:
+                continue
+            key = _canonical_dict(obj, remap) + raw[objgen][0]
+            kept = first.setdefault(key, objgen)
+            if kept != objgen:
+                remap[objgen] = kept
+                found = True
+        if not found:
+            break
+
+    stats: Dict[str, DedupStats] = {}
+    for objgen in remap:
+        kind = stats.setdefault(stream_kind(streams[objgen]), DedupStats())
+        kind.objects += 1
+        kind.bytes += raw[objgen][1]
+
+    if remap:
+        for container in tqdm(_iter_containers(pdf), desc="去重", ascii=True):
+            if isinstance(container, Array):
+                for i, v in enumerate(list(container)):
+                    if _is_ref(v, remap):
+                        container[i] = streams[_resolve(remap, v.objgen)]
+            else:
+                for k, v in _items(container):
+                    if _is_ref(v, remap):
+                        container[k] = streams[_resolve(remap, v.objgen)]
+    return stats
+
+
+def _slots(obj: Object) -> Iterator[Tuple[Object, object, Object]]:
+    """产生 ``obj`` 及其中嵌套的直接对象里的每个 ``(容器, 键或下标, 值)``
+
+    不包括 ``/Parent`` ，页面树不属于页面的内容。
+    """
+    stack = [obj.stream_dict if isinstance(obj, Stream) else obj]
+    while stack:
+        container = stack.pop()
+        if isinstance(container, Array):
+            items: Iterable[Tuple[object, Object]] = enumerate(container)
+        else:
+            items = ((k, v) for k, v in container.items() if k != "/Parent")
+        for k, v in items:
+            if not isinstance(v, _CONTAINERS):
+                continue
+            if v.is_indirect:
+                yield container, k, v
+            else:
+                stack.append(v)
+
+
+class MergeDedup:
+    """合并时跨文件的流对象去重。
+
+    每复制完一个文件的页面，就调用一次 :meth:`add` ：按后序遍历新页面引用的间接对象，
+    计算其中每个流对象的摘要，已经出现过的流由指向输出文档中已有对象的引用代替。
+    后序遍历保证流字典中引用的对象（例如表单引用的字体文件）先被替换，
+    因此引用了相同资源的表单也能被识别为重复。被替换掉的对象不再被引用，保存时会被丢弃。
+
+    流的数据逐个读取、计算摘要后即丢弃。索引只保存摘要与对象编号，
+    至多 ``max_entries`` 条，超出时淘汰最久没有被匹配到的摘要，
+    因此内存占用有上限，与输入文件的数量和总大小无关。
+    代价是：一个流的摘要被淘汰之后才再次出现的重复副本不会被识别，输出中会多保留一份。
+    公共资源（字体、徽标等）在每个文件中都会出现，会一直留在索引中；
+    只有不同的流超过 ``max_entries`` 个时才会漏掉重复。
+    ``max_entries`` 为 None 时不淘汰，此时内存随不同的流的数量增长。
+    只对流对象去重，字体字典等较小的非流对象仍然各自保留一份。
+
+    :param pdf: 输出文档
+    :param max_entries: 索引中最多保留的摘要数
+
+    :ivar DedupStats stats: 累计去除的对象数、原始数据字节数与耗时
+    """
+
+    def __init__(self, pdf: Pdf, max_entries: Optional[int] = MERGE_INDEX_SIZE):
+        self.pdf = pdf
+        self.stats = DedupStats()
+        self.max_entries = max_entries
+        # 摘要 => 输出文档中最先出现的对象编号，按最近一次匹配的顺序排列
+        self._index: "OrderedDict[bytes, ObjGen]" = OrderedDict()
+
+    def _post_order(self, pages: Iterable[Object]) -> List[Object]:
+        "页面引用的全部间接对象，被引用的对象排在引用它的对象之前；不进入其他页面"
+        visited: Set[ObjGen] = set()
+        order: List[Object] = []
+        stack: List[Tuple[Object, bool]] = [(page, False) for page in pages]
+        stack.reverse()
+        while stack:
+            obj, leaving = stack.pop()
+            if leaving:
+                order.append(obj)
+                continue
+            if obj.objgen in visited:
+                continue
+            visited.add(obj.objgen)
+            stack.append((obj, True))
+            for _, _, v in _slots(obj):
+                if (v.objgen not in visited and not (isinstance(v, Dictionary)
+                                                     and v.get("/Type") == Name.Page)):
+                    stack.append((v, False))
+        return order
+
+    def add(self, pages: Iterable) -> int:
+        """对刚添加到输出文档中的页面去重
+
+        应当在源文档关闭之前调用，此时才能读取复制过来的流数据。
+
+        :param pages: 新添加的页面
+        :returns: 本次去除的重复对象数
+        """
+        start = perf_counter()
+        # 本次发现的重复对象编号 => 保留的对象编号
+        remap: Dict[ObjGen, ObjGen] = {}
+        for obj in self._post_order([getattr(p, "obj", p) for p in pages]):
+            if remap:
+                for container, k, v in _slots(obj):
+                    kept = remap.get(v.objgen)
+                    if kept is not None:
+                        container[k] = self.pdf.get_object(kept)
+            if not isinstance(obj, Stream):
+                continue
+            raw = obj.read_raw_bytes()
+            h = get_hash(stream_canonical_dict(obj))
+            h.update(raw)
+            digest = h.digest()
+            kept = self._index.get(digest)
+            if kept is None:
+                self._index[digest] = obj.objgen
+                if self.max_entries is not None and len(self._index) > self.max_entries:
+                    self._index.popitem(last=False)
+                continue
+            self._index.move_to_end(digest)
+            remap[obj.objgen] = kept
+            self.stats.objects += 1
+            self.stats.bytes += len(raw)
+        self.stats.seconds += perf_counter() - start
+        return len(remap)
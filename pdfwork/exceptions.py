@@ -1,3 +1,6 @@
+from typing import List
+
+
 class PdfWorkException(Exception):
     "pdfwork 包的基础异常"
     pass
@@ -6,3 +9,49 @@ class PdfWorkException(Exception):
 class OutlineParseError(Exception):
     "在解析大纲源码时发生的异常"
     pass
+
+
+class SplitError(PdfWorkException):
+    """拆分某一页时发生的异常
+
+    :param int page: 出错的页码（从 0 开始）
+    :param str reason: 错误信息
+    """
+
+    def __init__(self, page: int, reason: str):
+        super().__init__(page, reason)
+        self.page = page
+        self.reason = reason
+
+    def __str__(self) -> str:
+        return f"第 {self.page} 页：{self.reason}"
+
+
+class MergeError(PdfWorkException):
+    """合并某个文件时发生的异常
+
+    :param str path: 出错的文件路径
+    :param str reason: 错误信息
+    """
+
+    def __init__(self, path: str, reason: str):
+        super().__init__(path, reason)
+        self.path = path
+        self.reason = reason
+
+    def __str__(self) -> str:
+        return f"{self.path}：{self.reason}"
+
+
+class PipelineError(PdfWorkException):
+    """多步骤的计划有误，或者其中某一步执行失败
+
+    :param problems: 发现的全部问题，每条一行
+    """
+
+    def __init__(self, problems: List[str]):
+        super().__init__(problems)
+        self.problems = problems
+
+    def __str__(self) -> str:
+        return "\n".join(self.problems)
@@ -17,16 +17,29 @@ Outline 的表示法可分为三个部分：
 3. 页码：大纲所跳转的逻辑页码。可以忽略，令解析器自动推导，在这种情况下会使用上一条大纲的页码。
     这里的页码只涉及逻辑页码，与物理页码的偏移是在 import_outline 模块处理的。
 """
+import json
 import re
+from array import array
 from dataclasses import dataclass
-from io import StringIO
+from itertools import zip_longest
+from typing import IO
+from typing import Any
+from typing import Iterable
+from typing import Iterator
 from typing import List
 from typing import Optional
 from typing import Tuple
+from typing import Union
 
 from .exceptions import OutlineParseError
 
-__all__ = ("outline_encode", "outline_decode", "Outline")
+__all__ = ("FORMATS", "outline_encode", "outline_encode_iter", "outline_decode",
+           "decode_outline_store", "decode_outline_format",
+           "iter_outline", "Outline", "OutlineStore", "OutlineNode")
+
+
+# outline import / export 支持的格式
+FORMATS = ("text", "json", "jsonl")
 
 
 class Outline():
@@ -94,13 +107,178 @@ class Outline():
             return None
 
     def __eq__(self, o: "Outline") -> bool:  # type: ignore
-        if all([
-                self.indent == o.indent, self.title == o.title,
-                self.index == o.index
-        ]):
-            if len(self.children) == len(self.children):
-                return all([a == b for a, b in zip(self.children, o.children)])
+        return _tree_equal(self, o)
+
+
+class OutlineStore():
+    """以并列数组存储的大纲树，适合数万条书签的大纲。
+
+    每个节点以整数编号，0 为根节点，其余节点按添加的顺序编号。
+    缩进、页码以及父节点、第一个子节点、最后一个子节点、下一个兄弟节点的编号各存放在一个
+    ``array`` 中，没有对应节点时为 -1；标题存放在一个列表中。
+    因此每个节点只占用几个机器整数，而不是一个带有 ``__dict__`` 与子节点列表的对象。
+
+    需要以对象的方式访问节点时，使用 :meth:`node` 返回的 :class:`OutlineNode` 。
+    """
+    __slots__ = ("indents", "titles", "indexes", "parents", "firsts", "lasts",
+                 "nexts")
+
+    def __init__(self):
+        self.indents = array("i", [-1])
+        self.titles: List[str] = ["OUTLINE ROOT"]
+        self.indexes = array("i", [0])
+        self.parents = array("i", [-1])
+        self.firsts = array("i", [-1])
+        self.lasts = array("i", [-1])
+        self.nexts = array("i", [-1])
+
+    def __len__(self) -> int:
+        "节点数，不含根节点"
+        return len(self.titles) - 1
+
+    def append(self, parent: int, indent: int, title: str, index: int) -> int:
+        """在 ``parent`` 的最后一个子节点之后添加节点
+
+        :returns: 新节点的编号
+        """
+        node = len(self.titles)
+        self.indents.append(indent)
+        self.titles.append(title)
+        self.indexes.append(index)
+        self.parents.append(parent)
+        self.firsts.append(-1)
+        self.lasts.append(-1)
+        self.nexts.append(-1)
+
+        last = self.lasts[parent]
+        if last < 0:
+            self.firsts[parent] = node
+        else:
+            self.nexts[last] = node
+        self.lasts[parent] = node
+        return node
+
+    def children(self, node: int = 0) -> Iterator[int]:
+        "依次产生 ``node`` 的子节点编号"
+        child = self.firsts[node]
+        while child >= 0:
+            yield child
+            child = self.nexts[child]
+
+    def walk(self, node: int = 0) -> Iterator[Tuple[int, int]]:
+        """以先序遍历 ``node`` 的全部后代（不含 ``node`` 本身），产生 ``(深度, 节点编号)``
+
+        不使用递归，深度从 0 开始。
+        """
+        firsts = self.firsts
+        nexts = self.nexts
+        stack = [(0, firsts[node])]
+        while stack:
+            depth, i = stack.pop()
+            if i < 0:
+                continue
+            yield depth, i
+            stack.append((depth, nexts[i]))
+            stack.append((depth + 1, firsts[i]))
+
+    def node(self, i: int = 0) -> "OutlineNode":
+        return OutlineNode(self, i)
+
+    @classmethod
+    def from_outline(cls, root: Outline) -> "OutlineStore":
+        store = cls()
+        # 每个深度上最近添加的节点编号
+        path = [0]
+        for depth, o in iter_outline(root):
+            del path[depth + 1:]
+            path.append(store.append(path[depth], o.indent, o.title, o.index))
+        return store
+
+    def to_outline(self) -> Outline:
+        root = Outline(-1, self.titles[0], self.indexes[0])
+        path = [root]
+        for depth, i in self.walk():
+            del path[depth + 1:]
+            o = Outline(self.indents[i], self.titles[i], self.indexes[i])
+            path[depth].add_child(o)
+            path.append(o)
+        return root
+
+    def __eq__(self, o: object) -> bool:
+        if isinstance(o, (OutlineStore, OutlineNode, Outline)):
+            return _tree_equal(self.node(), o)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"<OutlineStore of {len(self)} nodes>"
+
+
+class OutlineNode():
+    """:class:`OutlineStore` 中一个节点的视图，接口与 :class:`Outline` 相同
+    """
+    __slots__ = ("store", "id")
+
+    def __init__(self, store: OutlineStore, id: int):
+        self.store = store
+        self.id = id
+
+    @property
+    def indent(self) -> int:
+        return self.store.indents[self.id]
+
+    @property
+    def title(self) -> str:
+        return self.store.titles[self.id]
+
+    @property
+    def index(self) -> int:
+        return self.store.indexes[self.id]
+
+    @property
+    def parent(self) -> Optional["OutlineNode"]:
+        parent = self.store.parents[self.id]
+        return OutlineNode(self.store, parent) if parent >= 0 else None
+
+    @property
+    def children(self) -> List["OutlineNode"]:
+        return [OutlineNode(self.store, i) for i in self.store.children(self.id)]
+
+    def add_child(self, child: Union[Outline, "OutlineNode"]) -> "OutlineNode":
+        """添加一个叶节点，``child`` 的子节点不会被添加
+        """
+        return OutlineNode(
+            self.store,
+            self.store.append(self.id, child.indent, child.title, child.index))
+
+    def __eq__(self, o: object) -> bool:
+        if isinstance(o, (OutlineStore, OutlineNode, Outline)):
+            return _tree_equal(self, o)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"OutlineNode({self.indent!r}, {self.title!r}, {self.index!r})"
+
+
+AnyOutline = Union[Outline, OutlineStore, OutlineNode]
+
+
+def _tree_equal(a: AnyOutline, b: AnyOutline) -> bool:
+    "比较两棵大纲树的根节点与全部后代"
+    if isinstance(a, OutlineStore):
+        a = a.node()
+    if isinstance(b, OutlineStore):
+        b = b.node()
+    if (a.indent, a.title, a.index) != (b.indent, b.title, b.index):
         return False
+    # iter_outline 不会产生 None，为 None 说明两棵树的节点数不同
+    for x, y in zip_longest(iter_outline(a), iter_outline(b)):
+        if x is None or y is None:
+            return False
+        (dx, ox), (dy, oy) = x, y
+        if (dx, ox.indent, ox.title, ox.index) != (dy, oy.indent, oy.title,
+                                                   oy.index):
+            return False
+    return True
 
 
 @dataclass
@@ -108,7 +286,7 @@ class ParsingDebugInfo:
     """解析时的调试信息，精确到行。
 
     :param int linenum: 当前行号
-    :param int lines: 源码的全部行数
+    :param int lines: 源码的全部行数，流式解析时为已读取的行数
     :param str text: 当前行内容
     :param str filepath: 当前处理的源码文件路径
     """
@@ -117,11 +295,27 @@ class ParsingDebugInfo:
     text: str
 
 
-def outline_decode(text: str) -> Outline:
-    """解析大纲源码为大纲树
-    """
-    source = text.splitlines(False)
-    lines = len(source)
+# 空行
+_BLANK_PAT = re.compile(r"[ \t]*")
+# 自动推导缩进模式：第一个缩进条目的前缀空格或制表符
+_INDENT_DETECT_PAT = re.compile(r" +|\t+")
+# 行首的缩进
+_INDENT_PAT = re.compile(r"( +|\t+)?")
+# 缩进之后的部分
+_TITLE_PAT = re.compile(r"(?P<title>[^@ \n]+)(?: *@ *(?P<index>\d+))?")
+
+
+def _parse(text: Union[str, Iterable[str]]) -> Iterator[Outline]:
+    """逐行解析大纲源码，依次产生不含子节点的大纲条目，并检查缩进的跨度"""
+    lines: Optional[int]
+    if isinstance(text, str):
+        split = text.splitlines(False)
+        source: Iterable[str] = split
+        lines = len(split)
+    else:
+        source = text
+        # 流式读取时无法预知总行数
+        lines = None
 
     # 上一条目的缩进等级
     last_indent: int = 0
@@ -130,43 +324,226 @@ def outline_decode(text: str) -> Outline:
     # 上一条目的页码
     last_index = 0
 
-    tree = Outline(-1, "OUTLINE ROOT", 0)
-
     for i, line in enumerate(source):
-        dbg = ParsingDebugInfo(i, lines, line)
+        line = line.rstrip("\r\n")
+        dbg = ParsingDebugInfo(i, lines if lines is not None else i + 1, line)
         # 解析时忽略空行
-        if not re.fullmatch(r"^[ \t]*$", line):
+        if not _BLANK_PAT.fullmatch(line):
             oi, indent_pat = parse_line(line, indent_pat, last_index, dbg)
             if oi.indent > last_indent + 1:
                 raise OutlineParseError(f"{dbg.linenum}（缩进跨度过大）：{line!r}", dbg)
-            else:
-                tree.add_node(oi, oi.indent)
-                last_indent = oi.indent
-                last_index = oi.index
+            last_indent = oi.indent
+            last_index = oi.index
+            yield oi
+
+
+def outline_decode(text: Union[str, Iterable[str]]) -> Outline:
+    """解析大纲源码为大纲树
+
+    :param text: 大纲源码，或者逐行产生源码的可迭代对象（例如打开的文件、stdin），
+        后者不需要事先将全部源码读入内存。
+
+    解析只需遍历一遍源码：用一个栈记录从根节点出发、沿着每层最后一个子节点向下的路径，
+    新的节点总是挂在栈中对应层级的节点下，因此每一行的处理时间与树的深度无关。
+    """
+    tree = Outline(-1, "OUTLINE ROOT", 0)
+    # 从根节点出发，沿每层最后一个子节点向下的路径
+    stack = [tree]
+
+    for oi in _parse(text):
+        # 与 Outline.add_node 相同：路径不够深时挂在最深的节点下
+        level = min(oi.indent, len(stack) - 1)
+        stack[level].add_child(oi)
+        del stack[level + 1:]
+        stack.append(oi)
     return tree
 
 
-def outline_encode(root: Outline) -> str:
+def decode_outline_store(text: Union[str, Iterable[str]]) -> OutlineStore:
+    """与 :func:`outline_decode` 相同，但结果保存在 :class:`OutlineStore` 中
+    """
+    store = OutlineStore()
+    stack = [0]
+
+    for oi in _parse(text):
+        level = min(oi.indent, len(stack) - 1)
+        node = store.append(stack[level], oi.indent, oi.title, oi.index)
+        del stack[level + 1:]
+        stack.append(node)
+    return store
+
+
+def outline_encode(root: AnyOutline) -> str:
     """将大纲树编码为源码表示。
     """
-    linear_outlines: List[Outline] = []
-    flatten_outline(linear_outlines, root)
-    buf = StringIO()
-    # 排除 ROOT
-    for oi in linear_outlines[1:]:
-        buf.write("    " * oi.indent + f"{oi.title} @ {oi.index}\n")
-    buf.seek(0, 0)
-    text = buf.read()
-    return text
-
-
-def flatten_outline(array: List[Outline], o: Outline):
-    if o.children:
-        array.append(o)
-        for i in o.children:
-            flatten_outline(array, i)
+    return "".join(outline_encode_iter(root))
+
+
+def outline_encode_iter(root: AnyOutline, fmt: str = "text") -> Iterator[str]:
+    """将大纲树逐段编码，可以直接写入文件而无需在内存中拼接完整的结果。
+
+    :param str fmt: 输出格式，见 :data:`FORMATS`
+
+    + ``text``：大纲源码，每个书签一行
+    + ``json``：嵌套的数组 ``[{"title": ..., "page": ..., "children": [...]}, ...]``
+    + ``jsonl``：每行一个书签 ``{"level": ..., "title": ..., "page": ...}``，按先序排列，
+      ``level`` 从 0 开始
+
+    :raises ValueError: 未知的格式，在调用时而不是迭代时抛出
+    """
+    if fmt == "text":
+        return _encode_text(root)
+    elif fmt == "jsonl":
+        return _encode_jsonl(root)
+    elif fmt == "json":
+        return _encode_json(root)
     else:
-        array.append(o)
+        raise ValueError(f"未知的大纲格式 {fmt!r}，可选：{', '.join(FORMATS)}")
+
+
+def _encode_text(root: AnyOutline) -> Iterator[str]:
+    for _, oi in iter_outline(root):
+        yield "    " * oi.indent + f"{oi.title} @ {oi.index}\n"
+
+
+def _encode_jsonl(root: AnyOutline) -> Iterator[str]:
+    for depth, oi in iter_outline(root):
+        yield json.dumps({
+            "level": depth,
+            "title": oi.title,
+            "page": oi.index
+        },
+                         ensure_ascii=False) + "\n"
+
+
+def _encode_json(root: AnyOutline) -> Iterator[str]:
+    # 每个书签写出为 {"title": ..., "page": ..., "children": [ ，
+    # 遇到层级不深于上一个书签的书签时，补上上一个书签及其祖先的 ]}
+    yield "["
+    last = -1
+    for depth, oi in iter_outline(root):
+        if depth <= last:
+            yield "]}" * (last - depth + 1) + ","
+        item = json.dumps({"title": oi.title, "page": oi.index}, ensure_ascii=False)
+        yield "\n" + "  " * (depth + 1) + item[:-1] + ', "children": ['
+        last = depth
+    yield "]}" * (last + 1) + "\n]\n"
+
+
+def decode_outline_format(source: Union[str, Iterable[str], IO[str]],
+                          fmt: str = "text") -> OutlineStore:
+    """按照格式解析大纲，格式见 :func:`outline_encode_iter`
+
+    :param source: 文本，或者逐行产生文本的可迭代对象；``json`` 格式需要读入全部内容后解析
+
+    与大纲源码相同，``page`` 可以省略，此时继承上一个书签的页码。
+
+    :raises OutlineParseError: 格式错误
+    """
+    if fmt == "text":
+        return decode_outline_store(source)
+    elif fmt == "jsonl":
+        return _decode_jsonl(source)
+    elif fmt == "json":
+        return _decode_json(source)
+    else:
+        raise ValueError(f"未知的大纲格式 {fmt!r}，可选：{', '.join(FORMATS)}")
+
+
+def _check_entry(entry: Any, last_index: int,
+                 dbg: ParsingDebugInfo) -> Tuple[str, int]:
+    "检查一个 JSON 书签，返回 (标题, 页码)"
+    if not isinstance(entry, dict) or not isinstance(entry.get("title"), str):
+        raise OutlineParseError(f"{dbg.linenum}（缺少标题）：{dbg.text}", dbg)
+    index = entry.get("page", last_index)
+    if not isinstance(index, int) or isinstance(index, bool):
+        raise OutlineParseError(f"{dbg.linenum}（页码不是整数）：{dbg.text}", dbg)
+    return entry["title"], index
+
+
+def _decode_jsonl(source: Union[str, Iterable[str]]) -> OutlineStore:
+    lines = source.splitlines() if isinstance(source, str) else source
+    store = OutlineStore()
+    stack = [0]
+    last_index = 0
+    for i, line in enumerate(lines):
+        line = line.rstrip("\r\n")
+        if _BLANK_PAT.fullmatch(line):
+            continue
+        dbg = ParsingDebugInfo(i, i + 1, line)
+        try:
+            entry = json.loads(line)
+        except ValueError as e:
+            raise OutlineParseError(f"{dbg.linenum}（{e}）：{line!r}", dbg) from e
+        title, last_index = _check_entry(entry, last_index, dbg)
+        level = entry.get("level", 0)
+        if not isinstance(level, int) or not 0 <= level < len(stack):
+            raise OutlineParseError(f"{dbg.linenum}（层级跨度过大）：{line!r}", dbg)
+        node = store.append(stack[level], level, title, last_index)
+        del stack[level + 1:]
+        stack.append(node)
+    return store
+
+
+_END = object()
+
+
+def _decode_json(source: Union[str, Iterable[str]]) -> OutlineStore:
+    text = source if isinstance(source, str) else "".join(source)
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        dbg = ParsingDebugInfo(getattr(e, "lineno", 1) - 1, text.count("\n"), "")
+        raise OutlineParseError(f"{dbg.linenum}（{e}）", dbg) from e
+
+    store = OutlineStore()
+    last_index = 0
+    # (父节点编号, 子节点迭代器, 层级)
+    stack: List[Tuple[int, Iterator[Any], int]] = []
+    if not isinstance(data, list):
+        raise OutlineParseError("（顶层不是数组）", ParsingDebugInfo(0, 0, ""))
+    stack.append((0, iter(data), 0))
+    count = 0
+    while stack:
+        parent, items, level = stack[-1]
+        entry = next(items, _END)
+        if entry is _END:
+            stack.pop()
+            continue
+        dbg = ParsingDebugInfo(count, count + 1, json.dumps(entry, ensure_ascii=False)[:80])
+        title, last_index = _check_entry(entry, last_index, dbg)
+        node = store.append(parent, level, title, last_index)
+        count += 1
+        # _check_entry 已经检查过 entry 是对象
+        assert isinstance(entry, dict)
+        children = entry.get("children", [])
+        if not isinstance(children, list):
+            raise OutlineParseError(f"{dbg.linenum}（children 不是数组）：{dbg.text}", dbg)
+        if children:
+            stack.append((node, iter(children), level + 1))
+    return store
+
+
+def iter_outline(
+        root: AnyOutline) -> Iterator[Tuple[int, Union[Outline, OutlineNode]]]:
+    """以先序遍历大纲树（不含根节点），产生 ``(深度, 节点)``，深度从 0 开始。
+
+    不使用递归，因此不受 Python 递归深度的限制。
+    ``root`` 为 :class:`OutlineStore` 或 :class:`OutlineNode` 时，产生的节点为 :class:`OutlineNode` 。
+    """
+    if isinstance(root, OutlineStore):
+        root = root.node()
+    if isinstance(root, OutlineNode):
+        store = root.store
+        for depth, i in store.walk(root.id):
+            yield depth, OutlineNode(store, i)
+        return
+
+    stack = [(0, child) for child in reversed(root.children)]
+    while stack:
+        depth, node = stack.pop()
+        yield depth, node
+        stack.extend((depth + 1, child) for child in reversed(node.children))
 
 
 def parse_line(
@@ -188,22 +565,20 @@ def parse_line(
     if not indent_pat:
         # 自动推导缩进模式：第一个缩进条目的前缀空格或制表符
         # 要求：只能是纯空格或纯制表符，不能混用
-        m = re.match(r"^ +|\t+", line)
+        m = _INDENT_DETECT_PAT.match(line)
         indent_pat = m[0] if m else None
 
     if indent_pat:
         # 可以匹配空字符串，因此不可能为 None
-        indent = re.match(r"^( +|\t+)?",
-                          line)[0].count(indent_pat)  # type: ignore
+        indent = _INDENT_PAT.match(line)[0].count(indent_pat)  # type: ignore
         remain = line.lstrip(indent_pat * indent)
     else:
         indent = 0
         remain = line
 
-    pat = re.compile(r"(?P<title>[^@ \n]+)(?: *@ *(?P<index>\d+))?")
-    if (m := pat.match(remain)) is None:
+    if (m := _TITLE_PAT.match(remain)) is None:
         if dbg:
-            raise OutlineParseError(f"{dbg.linenum}（格式错误）：{line:!r}", dbg)
+            raise OutlineParseError(f"{dbg.linenum}（格式错误）：{line!r}", dbg)
         else:
             raise OutlineParseError(f"（格式错误）：{line!r}",
                                     ParsingDebugInfo(0, 0, line))
@@ -0,0 +1,358 @@
+"""多进程并行处理的辅助工具。
+
+pikepdf 的对象无法在进程之间传递，因此每个工作进程都需要自行打开源文件，
+主进程只负责分派任务、汇总进度与报告错误。
+"""
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from os import cpu_count
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Deque
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Type
+
+# mypy 无法导入类型声明
+from pikepdf import Pdf  # type: ignore
+from tqdm import tqdm  # type: ignore
+
+from .access import get_mode
+from .access import open_pdf
+from .access import set_mode
+from .dedup import DedupStats
+from .dedup import MergeDedup
+from .exceptions import MergeError
+from .exceptions import SplitError
+from .profiles import SaveProfile
+from .profiles import save_pdf
+from .prune import ResourceUsage
+from .prune import append_pruned
+from .utils import OutlineMerger
+
+__all__ = ("resolve_jobs", "split_parallel", "merge_tree", "prefetch_open")
+
+# 工作进程中打开的源文件，由 _init_split_worker 初始化
+_worker_pdf: Optional[Pdf] = None
+# 工作进程中的资源使用分析缓存，为 None 时不去除未使用的资源
+_worker_usage: Optional[ResourceUsage] = None
+
+
+def resolve_jobs(jobs: int) -> int:
+    """将 ``--jobs`` 参数解析为实际的进程数，小于等于 0 时使用全部 CPU 核心。
+    """
+    if jobs <= 0:
+        return cpu_count() or 1
+    return jobs
+
+
+def make_shards(total: int, count: int) -> List[Tuple[int, int]]:
+    """将 ``[0, total)`` 划分为至多 ``count`` 个连续的左闭右开区间。
+    """
+    count = max(1, min(count, total))
+    size, rest = divmod(total, count)
+    shards = []
+    start = 0
+    for i in range(count):
+        stop = start + size + (1 if i < rest else 0)
+        shards.append((start, stop))
+        start = stop
+    return shards
+
+
+def _wait_in_order(futures: List[Future], error: Type[Exception],
+                   done: Callable[[Any], None]):
+    """等待按输入顺序排列的一组任务，对每个成功的结果调用 ``done`` 。
+
+    某个任务抛出 ``error`` 时，取消排在它之后、尚未开始的任务，但继续等待排在它之前的任务，
+    最后抛出排在最前的任务的异常，即第一个出错的页面或文件，与各任务完成的先后无关。
+    其他异常（例如工作进程异常退出）立即抛出。
+    """
+    index = {future: i for i, future in enumerate(futures)}
+    failed: Optional[Tuple[int, Exception]] = None
+    for future in as_completed(futures):
+        if future.cancelled():
+            continue
+        i = index[future]
+        try:
+            result = future.result()
+        except error as e:
+            if failed is None or i < failed[0]:
+                failed = (i, e)
+                for later in futures[i + 1:]:
+                    later.cancel()
+            continue
+        done(result)
+    if failed is not None:
+        raise failed[1]
+
+
+def _init_split_worker(input: str, mode: str, prune: bool):
+    global _worker_pdf, _worker_usage
+    set_mode(mode)
+    _worker_pdf = open_pdf(input)
+    _worker_usage = ResourceUsage() if prune else None
+
+
+def _split_shard(fmt: str, chunks: List[Tuple[int, int]], first: int,
+                 profile: SaveProfile) -> Tuple[int, int]:
+    """在工作进程中依次将 ``chunks`` 中的各个页码区间保存为一个文件，第 j 个区间的文件序号为 ``first + j`` 。
+
+    :returns: (处理的页数, 去除的资源条目数)
+    """
+    assert _worker_pdf is not None
+    removed = _worker_usage.removed if _worker_usage is not None else 0
+    pages = 0
+    for j, (start, stop) in enumerate(chunks):
+        i = start
+        try:
+            pdfw: Pdf = Pdf.new()
+            for i in range(start, stop):
+                if _worker_usage is not None:
+                    append_pruned(pdfw, _worker_pdf.pages[i], _worker_usage)
+                else:
+                    pdfw.pages.append(_worker_pdf.pages[i])
+
+            path = Path(fmt.format(first + j))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            save_pdf(pdfw, path, profile)
+        except Exception as e:
+            # pikepdf 的异常未必能够跨进程序列化，转换为 SplitError 再抛出
+            raise SplitError(i, str(e)) from None
+        pages += stop - start
+    if _worker_usage is not None:
+        removed = _worker_usage.removed - removed
+    return pages, removed
+
+
+def split_parallel(input: str,
+                   fmt: str,
+                   total: int,
+                   jobs: int,
+                   profile: SaveProfile,
+                   prune: bool = True,
+                   chunks: Optional[List[Tuple[int, int]]] = None) -> int:
+    """用进程池并行拆分 PDF 文件。
+
+    输出文件被划分为若干连续的分片，每个工作进程只打开一次源文件，
+    然后依次处理分配给它的分片。分片数量多于进程数，以便汇总进度。
+
+    :param str input: 输入文件路径
+    :param str fmt: 由 :func:`pdfwork.utils.fmt_pat` 生成的文件名模板
+    :param int total: 总页数
+    :param int jobs: 工作进程数
+    :param SaveProfile profile: 保存方案
+    :param bool prune: 是否去除每一页未使用的资源，见 :mod:`pdfwork.prune`。
+        每个工作进程各自缓存分析结果
+    :param chunks: 每个输出文件的页码区间（左闭右开），见 :mod:`pdfwork.chunk` ；
+        默认每页一个文件
+
+    :returns: 去除的资源条目数
+    :raises SplitError: 第一个出错的页面
+    """
+    if chunks is None:
+        chunks = [(i, i + 1) for i in range(total)]
+    shards = make_shards(len(chunks), jobs * 4)
+    with ProcessPoolExecutor(max_workers=jobs,
+                             initializer=_init_split_worker,
+                             initargs=(input, get_mode(), prune)) as executor:
+        futures = [
+            executor.submit(_split_shard, fmt, chunks[start:stop], start, profile)
+            for start, stop in shards
+        ]
+        progress = tqdm(total=total, ascii=True, desc=f"拆分 {fmt!r}")
+        removed = 0
+
+        def done(result: Tuple[int, int]):
+            nonlocal removed
+            progress.update(result[0])
+            removed += result[1]
+
+        try:
+            _wait_in_order(futures, SplitError, done)
+        finally:
+            progress.close()
+    return removed
+
+
+def _open_checked(path: str) -> Pdf:
+    """打开并校验一个 PDF 文件：读取页面树，使结构错误尽早暴露。
+
+    :raises MergeError: 无法打开或校验失败
+    """
+    try:
+        pdf = open_pdf(path)
+    except Exception as e:
+        raise MergeError(path, str(e)) from None
+    try:
+        len(pdf.pages)
+    except Exception as e:
+        pdf.close()
+        raise MergeError(path, str(e)) from None
+    return pdf
+
+
+def prefetch_open(paths: List[str], prefetch: int = 4) -> Iterator[Tuple[str, Pdf]]:
+    """按顺序打开一系列 PDF 文件，同时在后台线程中预先打开之后的 ``prefetch`` 个文件。
+
+    打开文件时需要解析 xref 与 trailer，在网络存储上主要是在等待 I/O，
+    预先打开可以让这些等待与调用者处理当前文件的工作重叠。
+    任一时刻最多有 ``prefetch + 1`` 个文件处于打开状态，
+    调用者应在处理完每个文件后自行关闭它。
+
+    :param paths: 按顺序排列的文件路径
+    :param int prefetch: 预先打开的文件数，为 0 时不使用后台线程
+
+    :returns: 依次产生 ``(路径, Pdf)``
+    :raises MergeError: 无法打开的文件
+    """
+    if prefetch <= 0:
+        for path in paths:
+            yield path, _open_checked(path)
+        return
+
+    remain = iter(paths)
+    pending: Deque[Tuple[str, Future]] = deque()
+    with ThreadPoolExecutor(max_workers=prefetch) as executor:
+        try:
+            for path in remain:
+                pending.append((path, executor.submit(_open_checked, path)))
+                if len(pending) >= prefetch:
+                    break
+            while pending:
+                path, future = pending.popleft()
+                pdf = future.result()
+                # 在调用者处理当前文件之前补充下一个预取任务
+                for next_path in remain:
+                    pending.append(
+                        (next_path, executor.submit(_open_checked, next_path)))
+                    break
+                yield path, pdf
+        finally:
+            # 调用者提前结束或出错时，关闭已经预先打开的文件
+            while pending:
+                _, future = pending.popleft()
+                if not future.cancel() and future.exception() is None:
+                    future.result().close()
+
+
+def _merge_group(paths: List[str],
+                 output: str,
+                 prefetch: int = 0,
+                 outlines: Optional[str] = None,
+                 dedup: bool = False) -> Tuple[int, DedupStats]:
+    """在工作进程中按顺序合并一组文件，保存为中间文件。
+
+    同一时刻最多打开 ``prefetch + 1`` 个输入文件。
+
+    :param outlines: 为 ``keep`` 时保留书签，为 ``nest`` 时还将每个文件的书签放在以文件名为标题的书签下，
+        见 :class:`pdfwork.utils.OutlineMerger`
+    :param dedup: 为 True 时对各文件中重复的流对象去重，见 :class:`pdfwork.dedup.MergeDedup`
+    :returns: (合并的文件数, 去重的统计结果)
+    """
+    pdfw: Pdf = Pdf.new()
+    merger = OutlineMerger(pdfw) if outlines is not None else None
+    deduper = MergeDedup(pdfw) if dedup else None
+    for path, pdfr in prefetch_open(paths, prefetch):
+        try:
+            offset = len(pdfw.pages)
+            pdfw.pages.extend(pdfr.pages)
+            if deduper is not None:
+                deduper.add(pdfw.pages[offset:])
+            if merger is not None:
+                merger.add(pdfr, offset,
+                           Path(path).stem if outlines == "nest" else None)
+        except Exception as e:
+            raise MergeError(path, str(e)) from None
+        finally:
+            pdfr.close()
+    try:
+        if merger is not None:
+            merger.finish()
+        save_pdf(pdfw, output, "fast")
+    except Exception as e:
+        raise MergeError(output, str(e)) from None
+    return len(paths), deduper.stats if deduper is not None else DedupStats()
+
+
+def merge_tree(paths: List[str],
+               workdir: str,
+               jobs: int,
+               group_size: int,
+               max_open: Optional[int] = None,
+               prefetch: int = 0,
+               outlines: Optional[str] = None,
+               dedup: Optional[DedupStats] = None) -> List[str]:
+    """用进程池逐层合并文件，直到剩余的文件数不超过 ``group_size``。
+
+    每一层将输入按顺序划分为大小为 ``group_size`` 的组，每组合并为一个中间文件，
+    中间文件按组的顺序构成下一层的输入，因此最终的页面顺序与输入顺序完全一致。
+    最后剩下的不超过 ``group_size`` 个文件由调用者自行合并。
+
+    :param paths: 按顺序排列的输入文件
+    :param str workdir: 存放中间文件的目录，由调用者负责清理
+    :param int jobs: 工作进程数
+    :param int group_size: 每组的文件数，至少为 2
+    :param max_open: 同时打开的文件数上限。每个工作进程同一时刻最多打开
+        ``prefetch + 1`` 个输入文件和一个输出文件，
+        因此实际的进程数不会超过 ``max_open // (prefetch + 2)``。
+    :param int prefetch: 每个工作进程预先打开的文件数，见 :func:`prefetch_open`
+    :param outlines: 保留书签的方式，见 :func:`_merge_group` 。
+        ``nest`` 只作用于第一层，之后各层的输入已经带有以原文件名为标题的书签
+    :param dedup: 不为 None 时在每组内对重复的流对象去重，并将各组的统计结果累加到其中。
+        不同组之间的重复对象在下一层（或调用者最后的合并）中去除
+
+    :returns: 剩余的待合并文件
+    :raises MergeError: 第一个出错的文件
+    """
+    if group_size < 2:
+        raise ValueError(f"group_size={group_size!r} 至少为 2")
+    if max_open is not None:
+        jobs = max(1, min(jobs, max_open // (prefetch + 2)))
+
+    level = 0
+    # 工作进程使用与主进程相同的读取方式
+    with ProcessPoolExecutor(max_workers=jobs,
+                             initializer=set_mode,
+                             initargs=(get_mode(), )) as executor:
+        while len(paths) > group_size:
+            groups = [
+                paths[i:i + group_size]
+                for i in range(0, len(paths), group_size)
+            ]
+            outputs = [(Path(workdir) / f"{level:02d}-{i:06d}.pdf").as_posix()
+                       for i in range(len(groups))]
+            futures = [
+                executor.submit(_merge_group, group, output, prefetch,
+                                outlines if level == 0 or outlines is None else "keep",
+                                dedup is not None)
+                for group, output in zip(groups, outputs)
+            ]
+            progress = tqdm(total=len(paths),
+                            ascii=True,
+                            desc=f"合并 第 {level + 1} 层")
+
+            def done(result: Tuple[int, DedupStats]):
+                nonlocal dedup
+                progress.update(result[0])
+                if dedup is not None:
+                    dedup += result[1]
+
+            try:
+                _wait_in_order(futures, MergeError, done)
+            finally:
+                progress.close()
+
+            if level > 0:
+                # 上一层的中间文件已经不再需要
+                for path in paths:
+                    Path(path).unlink()
+            paths = outputs
+            level += 1
+    return paths
@@ -0,0 +1,404 @@
+"""``pdfwork pipe``：在一个内存中的文档上依次执行多个步骤，最后只保存一次。
+
+依次运行 merge、extract、outline import、optimize 等命令时，每一步都要完整地保存一次文件，
+下一步再重新解析。:class:`Pipeline` 在同一个 :class:`pikepdf.Pdf` 上依次执行各个步骤，中间不保存。
+
+计划是一个步骤列表，可以写在 YAML 或 JSON 文件中，路径都相对于当前目录::
+
+    output: book.pdf
+    profile: web
+    steps:
+      - merge: {inputs: [cover.pdf, body.pdf], outlines: nest}
+      - extract: {pages: "0:20,-5:"}
+      - import_outline: {input: toc.txt, offset: 2}
+      - optimize: {all_streams: true}
+
+也可以在命令行中用一个参数写一个步骤，位置参数对应步骤的主要参数（见 :data:`POSITIONAL` ），
+其余参数写作 ``键=值``::
+
+    "merge cover.pdf body.pdf outlines=nest" "extract 0:20,-5:" "optimize all_streams=true"
+
+各步骤的参数与对应的 ``action_*`` 函数相同，见 :data:`STEPS` 。
+执行之前先检查整个计划：步骤名、参数名、类型与取值，页码区间的写法，以及输入文件是否存在。
+发现的全部问题通过一个 :class:`PipelineError` 报告，此时还没有打开任何 PDF 文件。
+
+本模块只在执行时才导入 pikepdf，检查计划不需要加载它。
+"""
+import json
+import os
+import shlex
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from . import trace
+from .exceptions import PipelineError
+from .outline import FORMATS as OUTLINE_FORMATS
+from .profiles import PROFILES
+from .range import MultiRange
+from .range import RangeParseError
+
+if TYPE_CHECKING:
+    # mypy 无法导入类型声明
+    from pikepdf import Pdf  # type: ignore
+
+__all__ = ("Param", "STEPS", "POSITIONAL", "Step", "Pipeline")
+
+# 必须给出的参数的默认值
+REQUIRED = object()
+
+
+@dataclass(frozen=True)
+class Param:
+    """步骤的一个参数
+
+    :param type: 取值的类型：``str``、``int``、``bool`` 或 ``list`` （字符串列表）
+    :param default: 默认值，为 :data:`REQUIRED` 时必须给出
+    :param choices: 可选的取值，为空时不限制
+    :param minimum: ``int`` 类型的最小值
+    :param bool path: 取值是需要读取的文件路径，检查时确认文件存在
+    """
+    type: type
+    default: Any = REQUIRED
+    choices: Tuple[Any, ...] = ()
+    minimum: Optional[int] = None
+    path: bool = False
+
+
+# 步骤名 => 参数名 => 参数，参数名与对应的 action_* 函数相同
+STEPS: Dict[str, Dict[str, Param]] = {
+    "merge": {
+        "inputs": Param(list, path=True),
+        "jobs": Param(int, 1),
+        "group_size": Param(int, 64, minimum=2),
+        "max_open": Param(int, None, minimum=1),
+        "prefetch": Param(int, 4, minimum=0),
+        "outlines": Param(str, None, choices=(None, "keep", "nest")),
+        "dedup": Param(bool, False),
+    },
+    "extract": {
+        "pages": Param(str),
+    },
+    "import_outline": {
+        "input": Param(str, path=True),
+        "offset": Param(int, 0),
+        "fmt": Param(str, "text", choices=OUTLINE_FORMATS),
+    },
+    "erase_outline": {},
+    "optimize": {
+        "jobs": Param(int, 4),
+        "all_streams": Param(bool, False),
+    },
+}
+
+# 步骤名 => 命令行写法中位置参数对应的参数名
+POSITIONAL: Dict[str, str] = {
+    "merge": "inputs",
+    "extract": "pages",
+    "import_outline": "input",
+}
+
+_TRUE = ("true", "yes", "on", "1")
+_FALSE = ("false", "no", "off", "0")
+
+
+@dataclass
+class Step:
+    """计划中的一个步骤
+
+    :param str name: 步骤名，见 :data:`STEPS`
+    :param args: 参数，未检查；检查之后补全默认值并转换为参数的类型
+    """
+    name: str
+    args: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def parse(cls, text: str) -> "Step":
+        """解析命令行写法 ``名称 位置参数... 键=值...``
+
+        值保持为字符串，检查时再按参数的类型转换。
+        """
+        words = shlex.split(text)
+        if not words:
+            return cls("")
+        name, *rest = words
+        params = STEPS.get(name, {})
+        args: Dict[str, Any] = {}
+        positional: List[str] = []
+        for word in rest:
+            key, sep, value = word.partition("=")
+            if sep and key in params:
+                args[key] = value
+            else:
+                positional.append(word)
+        if positional:
+            # 没有位置参数的步骤以空字符串为键，检查时报告
+            key = POSITIONAL.get(name, "")
+            if key in params and params[key].type is not list and len(
+                    positional) == 1:
+                args[key] = positional[0]
+            else:
+                args[key] = positional
+        return cls(name, args)
+
+
+def _convert(param: Param, value: Any) -> Any:
+    """将参数转换为 ``param.type`` ，命令行中的字符串也在这里转换
+
+    :raises ValueError: 无法转换
+    """
+    if value is None:
+        if param.default is None:
+            return None
+        raise ValueError("不能为空")
+    if param.type is bool:
+        if isinstance(value, str) and value.lower() in _TRUE + _FALSE:
+            return value.lower() in _TRUE
+        if isinstance(value, bool):
+            return value
+    elif param.type is int:
+        if isinstance(value, str):
+            try:
+                return int(value)
+            except ValueError:
+                pass
+        elif isinstance(value, int) and not isinstance(value, bool):
+            return value
+    elif param.type is list:
+        if isinstance(value, str):
+            return [value]
+        if isinstance(value, list) and all(isinstance(i, str) for i in value):
+            return value
+    elif isinstance(value, str):
+        return value
+    raise ValueError(f"应当为 {param.type.__name__}，而不是 {value!r}")
+
+
+def _missing(value: Any) -> List[str]:
+    "不存在的输入文件；``@`` 开头的文件列表只检查列表本身"
+    paths = value if isinstance(value, list) else [value]
+    return [p for p in paths if not os.path.exists(p[1:] if p.startswith("@") else p)]
+
+
+class Pipeline:
+    """在一个文档上依次执行的一组步骤
+
+    :param steps: 步骤列表
+    :param output: 输出路径
+    :param str profile: 保存方案，见 :mod:`pdfwork.profiles`
+    """
+
+    def __init__(self,
+                 steps: List[Step],
+                 output: Optional[str] = None,
+                 profile: str = "web"):
+        self.steps = steps
+        self.output = output
+        self.profile = profile
+
+    @classmethod
+    def from_dict(cls, plan: Any) -> "Pipeline":
+        """从 YAML 或 JSON 解析出的对象构造，格式见模块说明
+
+        每个步骤可以是 ``{名称: {参数}}`` ，也可以是只有名称的字符串。
+
+        :raises PipelineError: 计划的结构不正确
+        """
+        if not isinstance(plan, dict):
+            raise PipelineError(["计划应当是一个包含 steps 的映射"])
+        problems = [f"未知的字段 {key!r}" for key in plan
+                    if key not in ("steps", "output", "profile")]
+        raw = plan.get("steps")
+        if not isinstance(raw, list):
+            raise PipelineError(problems + ["steps 应当是一个列表"])
+        steps: List[Step] = []
+        for i, item in enumerate(raw, 1):
+            if isinstance(item, str):
+                steps.append(Step(item))
+            elif (isinstance(item, dict) and len(item) == 1
+                  and isinstance(next(iter(item.values())), (dict, type(None)))):
+                name, args = next(iter(item.items()))
+                steps.append(Step(str(name), dict(args or {})))
+            else:
+                problems.append(f"第 {i} 步：应当写作 {{名称: {{参数}}}} 或者名称，而不是 {item!r}")
+        if problems:
+            raise PipelineError(problems)
+        return cls(steps, plan.get("output"), plan.get("profile", "web"))
+
+    @classmethod
+    def load(cls, path: str) -> "Pipeline":
+        """读取 YAML（``.yaml`` 或 ``.yml`` 后缀，需要 PyYAML）或 JSON 格式的计划文件
+
+        :raises PipelineError: 文件无法解析，或者计划的结构不正确
+        """
+        with open(path, "rt", encoding="utf-8") as file:
+            text = file.read()
+        if Path(path).suffix.lower() in (".yaml", ".yml"):
+            try:
+                import yaml  # type: ignore
+            except ImportError:
+                raise PipelineError([f"读取 YAML 格式的计划 {path} 需要安装 PyYAML"]) from None
+            try:
+                plan = yaml.safe_load(text)
+            except yaml.YAMLError as e:
+                raise PipelineError([f"无法解析 {path}：{e}"]) from None
+        else:
+            try:
+                plan = json.loads(text)
+            except ValueError as e:
+                raise PipelineError([f"无法解析 {path}：{e}"]) from None
+        return cls.from_dict(plan)
+
+    def check(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """检查整个计划，不打开任何 PDF 文件
+
+        :returns: 按顺序排列的 ``(步骤名, 参数)`` ，参数已经补全默认值并转换了类型
+        :raises PipelineError: 计划中的全部问题
+        """
+        problems: List[str] = []
+        if not self.output:
+            problems.append("没有指定输出路径")
+        elif not Path(self.output).absolute().parent.is_dir():
+            problems.append(f"输出路径所在的目录不存在：{self.output}")
+        if self.profile not in PROFILES:
+            problems.append(
+                f"未知的保存方案 {self.profile!r}，可选：{', '.join(PROFILES)}")
+        if not self.steps:
+            problems.append("计划中没有任何步骤")
+
+        plan: List[Tuple[str, Dict[str, Any]]] = []
+        # 只有 merge 能向文档中添加页面
+        has_pages = False
+        for i, step in enumerate(self.steps, 1):
+            where = f"第 {i} 步 {step.name}"
+            params = STEPS.get(step.name)
+            if params is None:
+                problems.append(f"第 {i} 步：未知的步骤 {step.name!r}，可选：{', '.join(STEPS)}")
+                continue
+            if step.name == "merge":
+                has_pages = True
+            elif not has_pages:
+                problems.append(f"{where}：文档还是空的，第一步应当是 merge")
+
+            args: Dict[str, Any] = {}
+            for key, value in step.args.items():
+                param = params.get(key)
+                if param is None:
+                    if key:
+                        problems.append(f"{where}：未知的参数 {key!r}，可选：{', '.join(params)}")
+                    else:
+                        problems.append(f"{where}：不接受位置参数 {value!r}")
+                    continue
+                try:
+                    value = _convert(param, value)
+                except ValueError as e:
+                    problems.append(f"{where}：参数 {key} {e}")
+                    continue
+                if param.choices and value not in param.choices:
+                    choices = ", ".join(str(c) for c in param.choices if c is not None)
+                    problems.append(f"{where}：参数 {key} 的取值 {value!r} 无效，可选：{choices}")
+                elif (param.minimum is not None and value is not None
+                      and value < param.minimum):
+                    problems.append(f"{where}：参数 {key} 至少为 {param.minimum}")
+                elif param.path and value is not None:
+                    for path in _missing(value):
+                        problems.append(f"{where}：文件不存在 {path}")
+                args[key] = value
+
+            for key, param in params.items():
+                if key in args or key in step.args:
+                    continue
+                if param.default is REQUIRED:
+                    problems.append(f"{where}：缺少参数 {key}")
+                else:
+                    args[key] = param.default
+
+            if step.name == "merge" and args.get("inputs") == []:
+                problems.append(f"{where}：没有输入文件")
+            if step.name == "extract" and isinstance(args.get("pages"), str):
+                try:
+                    MultiRange(args["pages"])
+                except (RangeParseError, ValueError) as e:
+                    problems.append(f"{where}：无法解析页码区间 {args['pages']!r}：{e}")
+            plan.append((step.name, args))
+
+        if problems:
+            raise PipelineError(problems)
+        return plan
+
+    def run(self):
+        """检查计划，然后依次执行各个步骤，最后保存一次
+
+        :raises PipelineError: 计划中的问题，此时还没有打开任何 PDF 文件
+        """
+        from pikepdf import Pdf  # type: ignore
+
+        from .profiles import get_profile
+        from .profiles import save_pdf
+
+        plan = self.check()
+        output: str = self.output  # type: ignore
+        with TemporaryDirectory(prefix=".pdfwork-",
+                                dir=Path(output).absolute().parent) as workdir:
+            pdf: "Pdf" = Pdf.new()
+            for i, (name, args) in enumerate(plan, 1):
+                with trace.phase(f"step_{name}"):
+                    try:
+                        pdf = _RUNNERS[name](pdf, workdir, **args)
+                    except Exception as e:
+                        raise PipelineError([f"第 {i} 步 {name}：{e}"]) from e
+            with trace.phase("save", len(pdf.pages)):
+                save_pdf(pdf, output, get_profile(self.profile))
+
+
+def _run_merge(pdf: "Pdf", workdir: str, inputs: List[str], **kwargs) -> "Pdf":
+    from .actions import merge_pages
+    from .utils import read_paths
+    merge_pages(pdf, read_paths(inputs), workdir, **kwargs)
+    return pdf
+
+
+def _run_extract(pdf: "Pdf", workdir: str, pages: str) -> "Pdf":
+    from .actions import select_pages
+    return select_pages(pdf, MultiRange(pages))
+
+
+def _run_import_outline(pdf: "Pdf", workdir: str, input: str, offset: int,
+                        fmt: str) -> "Pdf":
+    from .outline import decode_outline_format
+    from .utils import import_outline_bulk
+    with open(input, "rt", encoding="utf-8") as src:
+        root = decode_outline_format(src, fmt)
+    import_outline_bulk(pdf, root, offset)
+    return pdf
+
+
+def _run_erase_outline(pdf: "Pdf", workdir: str) -> "Pdf":
+    from pikepdf import Pdf  # type: ignore
+    pdfw = Pdf.new()
+    pdfw.pages.extend(pdf.pages)
+    return pdfw
+
+
+def _run_optimize(pdf: "Pdf", workdir: str, jobs: int,
+                  all_streams: bool) -> "Pdf":
+    from .actions import optimize_pdf
+    optimize_pdf(pdf, jobs, all_streams)
+    return pdf
+
+
+# 步骤名 => 执行函数，返回之后步骤使用的文档
+_RUNNERS = {
+    "merge": _run_merge,
+    "extract": _run_extract,
+    "import_outline": _run_import_outline,
+    "erase_outline": _run_erase_outline,
+    "optimize": _run_optimize,
+}
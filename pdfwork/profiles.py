@@ -0,0 +1,96 @@
+"""保存 PDF 文件时使用的配置方案。
+
+线性化需要额外遍历一遍文件，并且会让输出变大，只有在需要通过网络逐页加载时才有意义；
+生成对象流与重新压缩能减小体积，但更耗时。因此各个命令按用途选择不同的方案：
+
+==========  ======  ======  ========  ========
+方案        线性化  对象流  重新压缩  压缩级别
+==========  ======  ======  ========  ========
+``fast``    否      保留    否        1
+``compact`` 否      生成    是        9
+``web``     是      保留    否        默认
+==========  ======  ======  ========  ========
+
+命令行用 :data:`PROFILES` 检查 ``--save-profile`` 选项，pikepdf 推迟到 :func:`save_pdf` 中才导入。
+"""
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+from typing import Dict
+from typing import Optional
+from typing import Union
+
+if TYPE_CHECKING:
+    # mypy 无法导入类型声明
+    from pikepdf import Pdf  # type: ignore
+
+__all__ = ("SaveProfile", "PROFILES", "get_profile", "save_pdf")
+
+
+@dataclass(frozen=True)
+class SaveProfile:
+    """一个保存方案
+
+    :param str name: 方案名
+    :param bool linearize: 是否线性化
+    :param str object_stream_mode: 对象流的处理方式，可选 ``preserve``、``disable``、``generate``
+    :param bool compress_streams: 是否压缩未压缩的流
+    :param bool recompress_flate: 是否重新压缩已经用 Flate 压缩过的流
+    :param compression_level: Flate 压缩级别 0~9，None 表示使用 zlib 的默认值
+    """
+    name: str
+    linearize: bool
+    object_stream_mode: str = "preserve"
+    compress_streams: bool = True
+    recompress_flate: bool = False
+    compression_level: Optional[int] = None
+
+
+PROFILES: Dict[str, SaveProfile] = {
+    "fast":
+    SaveProfile("fast", linearize=False, compression_level=1),
+    "compact":
+    SaveProfile("compact",
+                linearize=False,
+                object_stream_mode="generate",
+                recompress_flate=True,
+                compression_level=9),
+    "web":
+    SaveProfile("web", linearize=True),
+}
+
+
+def get_profile(profile: Union[str, SaveProfile]) -> SaveProfile:
+    """按名称查找保存方案
+
+    :raises ValueError: 不存在的方案名
+    """
+    if isinstance(profile, SaveProfile):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"未知的保存方案 {profile!r}，可选：{', '.join(PROFILES)}") from None
+
+
+def save_pdf(pdf: "Pdf", output, profile: Union[str, SaveProfile] = "web"):
+    """按照保存方案保存 PDF 文件
+
+    :param output: 输出路径或可写的二进制流
+    :param profile: 保存方案或方案名，见 :data:`PROFILES`
+    """
+    import pikepdf  # type: ignore
+    from pikepdf import ObjectStreamMode
+    profile = get_profile(profile)
+
+    settings = getattr(pikepdf, "settings", None)
+    if settings is not None:
+        # 压缩级别是全局设置，每次保存前都重新设置，-1 表示 zlib 的默认值
+        level = profile.compression_level
+        settings.set_flate_compression_level(-1 if level is None else level)
+
+    pdf.save(output,
+             linearize=profile.linearize,
+             object_stream_mode=getattr(ObjectStreamMode,
+                                        profile.object_stream_mode),
+             compress_streams=profile.compress_streams,
+             recompress_flate=profile.recompress_flate)
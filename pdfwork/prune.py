@@ -0,0 +1,198 @@
+"""拆分时去除页面中未使用的资源。
+
+很多文档的所有页面共用一个资源字典，其中列出了全文用到的每一种字体和图像。
+拆分时如果原样复制，每个单页文件都会带上这些资源，输出的总大小可达源文件的许多倍。
+
+:class:`ResourceUsage` 解析页面的内容流，收集其中作为操作数出现的名称
+（``/F1 12 Tf`` 中的 ``/F1``、``/Im1 Do`` 中的 ``/Im1`` 等），
+资源字典的各个分类中只保留这些名称。判断是保守的：任何操作数中出现过的名称都会保留。
+
+没有自己的 ``/Resources`` 的表单 XObject 与 Type 3 字体会使用页面的资源，
+它们引用的名称也需要保留。这类对象与资源字典往往被许多页面共用，
+因此按对象编号缓存分析结果，每个共用的对象只解析一次。
+"""
+from contextlib import contextmanager
+from typing import Dict
+from typing import FrozenSet
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+# mypy 无法导入类型声明
+import pikepdf  # type: ignore
+from pikepdf import Dictionary
+from pikepdf import Name
+from pikepdf import Object
+from pikepdf import Pdf
+from pikepdf import Stream
+
+__all__ = ("ResourceUsage", "append_pruned")
+
+ObjGen = Tuple[int, int]
+
+# 按名称引用的资源分类，/ProcSet 等其他条目原样保留
+CATEGORIES = ("/ExtGState", "/ColorSpace", "/Pattern", "/Shading", "/XObject",
+              "/Font", "/Properties")
+
+
+def _names(obj: Object) -> Set[str]:
+    "内容流中作为操作数出现的全部名称，包括内嵌图像字典中的名称（例如色彩空间）"
+    names: Set[str] = set()
+    for operands, _ in pikepdf.parse_content_stream(obj):
+        for operand in operands:
+            if isinstance(operand, Name):
+                names.add(str(operand))
+            elif isinstance(operand, pikepdf.PdfInlineImage):
+                names.update(
+                    str(v) for v in operand.obj.values() if isinstance(v, Name))
+    return names
+
+
+def _page_resources(page: Object) -> Optional[Object]:
+    "页面的资源字典，可能继承自页面树的上层节点"
+    node = page
+    while node is not None:
+        resources = node.get("/Resources")
+        if resources is not None:
+            return resources
+        node = node.get("/Parent")
+    return None
+
+
+class ResourceUsage:
+    """分析页面实际使用的资源，并生成去除了未使用资源的资源字典。
+
+    同一个对象可以在拆分一个文档的全过程中复用，缓存以对象编号为键：
+
+    + 表单 XObject 与 Type 3 字体：从页面继承的资源名
+    + 资源字典：其中需要展开的名称，即没有自己的资源、会继承页面资源的表单与字体
+
+    :ivar int pages: 通过 :func:`append_pruned` 复制时去除了资源的页面数
+    :ivar int removed: 通过 :func:`append_pruned` 复制时去除的资源条目数
+    """
+
+    def __init__(self):
+        self._inherited: Dict[ObjGen, FrozenSet[str]] = {}
+        self._expand: Dict[ObjGen, Dict[str, FrozenSet[str]]] = {}
+        self.pages = 0
+        self.removed = 0
+
+    def _inherited_names(self, obj: Object) -> FrozenSet[str]:
+        "表单或 Type 3 字体从页面继承的资源名；有自己的 /Resources 时为空"
+        key = obj.objgen
+        cached = self._inherited.get(key) if obj.is_indirect else None
+        if cached is not None:
+            return cached
+        names: Set[str] = set()
+        if "/Resources" not in obj:
+            if obj.get("/Subtype") == Name.Form:
+                names = _names(obj)
+            elif obj.get("/Subtype") == Name.Type3:
+                for _, proc in obj.get("/CharProcs", Dictionary()).items():
+                    names |= _names(proc)
+        cached = frozenset(names)
+        if obj.is_indirect:
+            self._inherited[key] = cached
+        return cached
+
+    def _expansions(self, resources: Object) -> Dict[str, FrozenSet[str]]:
+        "资源名 => 使用它时需要额外保留的资源名，只包含非空的条目"
+        key = resources.objgen
+        cached = self._expand.get(key) if resources.is_indirect else None
+        if cached is not None:
+            return cached
+        cached = {}
+        for category in ("/XObject", "/Font"):
+            entries = resources.get(category)
+            if not isinstance(entries, Dictionary):
+                continue
+            for name, obj in entries.items():
+                # 表单是流对象，Type 3 字体是字典
+                if isinstance(obj, (Dictionary, Stream)):
+                    inherited = self._inherited_names(obj)
+                    if inherited:
+                        cached[name] = inherited
+        if resources.is_indirect:
+            self._expand[key] = cached
+        return cached
+
+    def used(self, page: Object, resources: Object) -> Set[str]:
+        "页面内容流直接或通过继承资源的表单、字体间接引用的资源名"
+        expansions = self._expansions(resources)
+        used = _names(page)
+        pending: List[str] = [name for name in used if name in expansions]
+        while pending:
+            for name in expansions[pending.pop()]:
+                if name not in used:
+                    used.add(name)
+                    if name in expansions:
+                        pending.append(name)
+        return used
+
+    def prune(self, page: Object) -> Optional[Dictionary]:
+        """返回只包含页面所用资源的新资源字典，没有可以去除的资源时返回 None。
+
+        新字典中的条目仍然指向原来的资源对象，原来的资源字典不会被修改。
+        内容流无法解析时不做处理，返回 None。
+        """
+        return self._prune(page)[0]
+
+    def _prune(self, page: Object) -> Tuple[Optional[Dictionary], int]:
+        "同 :meth:`prune` ，并返回去除的资源条目数"
+        resources = _page_resources(page)
+        if not isinstance(resources, Dictionary):
+            return None, 0
+        try:
+            used = self.used(page, resources)
+        except pikepdf.PdfError:
+            return None, 0
+
+        pruned = Dictionary()
+        removed = 0
+        for category, entries in resources.items():
+            if category in CATEGORIES and isinstance(entries, Dictionary):
+                kept = {k: v for k, v in entries.items() if k in used}
+                removed += len(entries) - len(kept)
+                if kept:
+                    pruned[category] = Dictionary(kept)
+            else:
+                pruned[category] = entries
+        if removed == 0:
+            return None, 0
+        return pruned, removed
+
+
+@contextmanager
+def _resources_replaced(page: Object, resources: Dictionary) -> Iterator[None]:
+    "临时替换页面的 /Resources，退出时恢复（或删除，如果原来是继承的）"
+    original = page.get("/Resources")
+    page.Resources = resources
+    try:
+        yield
+    finally:
+        if original is None:
+            del page["/Resources"]
+        else:
+            page.Resources = original
+
+
+def append_pruned(pdfw: Pdf, page, usage: ResourceUsage):
+    """将另一个文档中的页面添加到 ``pdfw`` 末尾，只带上页面实际使用的资源。
+
+    在复制之前替换源页面的资源字典，未使用的资源不会被复制到 ``pdfw`` 中；
+    复制完成后恢复源页面。
+
+    :param page: 源文档中的页面
+    :param ResourceUsage usage: 分析结果的缓存，拆分同一个文档时应当共用
+    """
+    obj = getattr(page, "obj", page)
+    pruned, removed = usage._prune(obj)
+    if pruned is None:
+        pdfw.pages.append(page)
+        return
+    with _resources_replaced(obj, pruned):
+        pdfw.pages.append(page)
+    usage.pages += 1
+    usage.removed += removed
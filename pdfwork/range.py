@@ -18,11 +18,26 @@
     1,3,2 => [1, 3, 2]
     ## 不会合并区间
     3,2:4 => [3, 2, 3]
+
+含有无穷区间或负数的表示法需要先用 :meth:`MultiRange.bind` 绑定到文档的页数，
+此时与 Python 的下标、切片规则相同：页码从 0 开始，``-1`` 表示最后一页，
+``-5:`` 表示最后 5 页，超出范围的切片会被截断::
+
+    MultiRange("0:20,399:420,-5:").bind(1000)
+    # => 0~19, 399~419, 995~999
+
+绑定之后，:meth:`MultiRange.pages` 给出合并、排序后的区间索引 :class:`PageSet` ，
+``in`` 判断的复杂度为 O(log n)，``len`` 与并、交、差运算都按区间进行，不会展开为页码列表。
 """
 import re
+from array import array
+from bisect import bisect_right
+from heapq import merge
 from typing import Iterable
 from typing import Iterator
 from typing import List
+from typing import Optional
+from typing import Tuple
 from typing import Union
 
 
@@ -30,54 +45,280 @@ class RangeParseError(Exception):
     pass
 
 
-__all__ = ("MultiRange", )
+__all__ = ("MultiRange", "PageSet")
+
+Component = Union[int, range, slice]
+
+
+class PageSet():
+    """一组互不相同的页码，以有序、互不相交且不相邻的左闭右开区间存储
+
+    :param intervals: ``(start, stop)`` 区间，可以无序、重叠。
+
+    区间在第一次使用时才会被排序、合并，因此并、交、差运算的结果都是惰性的，
+    只有在判断 ``in``、求长度或迭代时才会计算。
+    """
+    __slots__ = ("_source", "_starts", "_stops", "_len")
+
+    def __init__(self, intervals: Iterable[Tuple[int, int]] = ()):
+        self._source: Optional[Iterable[Tuple[int, int]]] = intervals
+        self._starts = array("q")
+        self._stops = array("q")
+        self._len = 0
+
+    @classmethod
+    def from_ranges(cls, ranges: Iterable[range]) -> "PageSet":
+        """由一组 ``range`` 构造
+
+        步长为 1 的 ``range`` 对应一个区间；带步长的 ``range`` 无法用区间表示，
+        会按元素展开为长度为 1 的区间。
+        """
+        def intervals() -> Iterator[Tuple[int, int]]:
+            for r in ranges:
+                if not r:
+                    continue
+                if r.step < 0:
+                    r = r[::-1]
+                if r.step == 1:
+                    yield r.start, r.stop
+                else:
+                    yield from ((i, i + 1) for i in r)
+
+        return cls(intervals())
+
+    def _normalize(self):
+        if self._source is None:
+            return
+        source, self._source = self._source, None
+        starts, stops = self._starts, self._stops
+        for start, stop in sorted(source):
+            if start >= stop:
+                continue
+            if stops and start <= stops[-1]:
+                if stop > stops[-1]:
+                    stops[-1] = stop
+            else:
+                starts.append(start)
+                stops.append(stop)
+        self._len = sum(stops) - sum(starts)
+
+    def intervals(self) -> Iterator[Tuple[int, int]]:
+        "按顺序产生 ``(start, stop)`` 区间"
+        self._normalize()
+        return zip(self._starts, self._stops)
+
+    def ranges(self) -> Iterator[range]:
+        "按顺序产生各个区间对应的 ``range``"
+        return (range(start, stop) for start, stop in self.intervals())
+
+    def __contains__(self, page: object) -> bool:
+        if not isinstance(page, int):
+            return False
+        self._normalize()
+        i = bisect_right(self._starts, page) - 1
+        return i >= 0 and page < self._stops[i]
+
+    def __len__(self) -> int:
+        self._normalize()
+        return self._len
+
+    def __iter__(self) -> Iterator[int]:
+        for r in self.ranges():
+            yield from r
+
+    def __or__(self, other: "PageSet") -> "PageSet":
+        return PageSet(_union(self, other))
+
+    def __and__(self, other: "PageSet") -> "PageSet":
+        return PageSet(_intersection(self, other))
+
+    def __sub__(self, other: "PageSet") -> "PageSet":
+        return PageSet(_difference(self, other))
+
+    def union(self, other: "PageSet") -> "PageSet":
+        return self | other
+
+    def intersection(self, other: "PageSet") -> "PageSet":
+        return self & other
+
+    def difference(self, other: "PageSet") -> "PageSet":
+        return self - other
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PageSet):
+            return NotImplemented
+        return list(self.intervals()) == list(other.intervals())
+
+    def __repr__(self) -> str:
+        return f"PageSet({list(self.intervals())!r})"
+
+
+def _union(a: PageSet, b: PageSet) -> Iterator[Tuple[int, int]]:
+    # 两侧都已有序，合并后再由 PageSet 合并重叠的区间
+    return merge(a.intervals(), b.intervals())
+
+
+def _intersection(a: PageSet, b: PageSet) -> Iterator[Tuple[int, int]]:
+    ia, ib = a.intervals(), b.intervals()
+    x, y = next(ia, None), next(ib, None)
+    while x is not None and y is not None:
+        start, stop = max(x[0], y[0]), min(x[1], y[1])
+        if start < stop:
+            yield start, stop
+        # 先结束的区间不会再与另一侧的后续区间相交
+        if x[1] < y[1]:
+            x = next(ia, None)
+        else:
+            y = next(ib, None)
+
+
+def _difference(a: PageSet, b: PageSet) -> Iterator[Tuple[int, int]]:
+    ib = b.intervals()
+    y = next(ib, None)
+    for start, stop in a.intervals():
+        while y is not None and y[1] <= start:
+            y = next(ib, None)
+        while y is not None and y[0] < stop:
+            if y[0] > start:
+                yield start, y[0]
+            start = max(start, y[1])
+            if y[1] >= stop:
+                break
+            y = next(ib, None)
+        if start < stop:
+            yield start, stop
 
 
 class MultiRange(Iterable):
-    components: List[range]
+    """一组按表示法顺序排列的区间
+
+    :param repr: 表示法字符串、``range`` 或单个页码
+
+    未绑定时只能迭代有界的组件；调用 :meth:`bind` 之后，负数与无穷区间按页数解析。
+    """
+    components: List[Component]
     # 一次检查一个组件
     comp_chker = re.compile(
-        r"(-?\d+)|(-?\d+)?:(-?\d+)?|(-?\d+)?:(-?\d+)?:(-?\d+)")
+        r"(-?\d+)|(-?\d+)?:(-?\d+)?|(-?\d+)?:(-?\d+)?:(-?\d+)?")
 
-    def __init__(self, *repr: Iterable[Union[str, range, int]]):
+    def __init__(self, *repr: Union[str, range, int]):
         self.components = []
+        # 绑定的页数
+        self.count: Optional[int] = None
+        self._pages: Optional[PageSet] = None
         for r in repr:
             if isinstance(r, str):
-                for comp in re.split(r" *, *", r):
+                for comp in re.split(r" *, *", r.strip()):
                     if self.comp_chker.fullmatch(comp):
-                        comp_: range = parse_component(comp)
-                        self.components.append(comp_)
+                        self.components.append(parse_component(comp))
                     else:
                         raise RangeParseError(
                             f"{comp!r} cann't represent a range")
-            elif isinstance(r, range):
+            elif isinstance(r, (range, int)):
                 self.components.append(r)
-            elif isinstance(r, int):
-                self.components.append(range(r, r + 1))
             else:
                 raise ValueError(f"{r!r} is not str or range or int")
 
+    def bind(self, count: int) -> "MultiRange":
+        """将区间绑定到页数为 ``count`` 的文档，返回新的 :class:`MultiRange`
+
+        解析规则与 Python 的下标、切片相同，结果中的组件都是有界的 ``range``。
+
+        :raises IndexError: 单个页码超出范围
+        """
+        pages = range(count)
+        bound = MultiRange()
+        bound.count = count
+        for comp in self.components:
+            if isinstance(comp, int):
+                try:
+                    page = pages[comp]
+                except IndexError:
+                    raise IndexError(
+                        f"page {comp} out of range for {count} pages") from None
+                bound.components.append(range(page, page + 1))
+            elif isinstance(comp, range):
+                bound.components.append(
+                    pages[comp.start:comp.stop:comp.step])
+            else:
+                bound.components.append(pages[comp])
+        return bound
+
+    def _ranges(self) -> Iterator[range]:
+        for comp in self.components:
+            if isinstance(comp, int):
+                yield range(comp, comp + 1)
+            elif isinstance(comp, range):
+                yield comp
+            else:
+                raise ValueError(f"open range {comp!r} must be bound first")
+
+    def ranges(self) -> List[range]:
+        "按表示法顺序排列的各个组件"
+        return list(self._ranges())
+
+    def pages(self) -> PageSet:
+        "合并、排序后的区间索引"
+        if self._pages is None:
+            self._pages = PageSet.from_ranges(self.ranges())
+        return self._pages
+
     def __iter__(self) -> Iterator[int]:
         return self.iter()
 
     def iter(self) -> Iterator[int]:
-        for comp in self.components:
+        for comp in self._ranges():
             yield from comp
 
+    def __len__(self) -> int:
+        "迭代产生的页码数，重复的页码会重复计数"
+        return sum(len(r) for r in self._ranges())
+
+    def __contains__(self, page: object) -> bool:
+        return page in self.pages()
+
+    def __or__(self, other: Union["MultiRange", PageSet]) -> PageSet:
+        return self.pages() | _as_pages(other)
+
+    def __and__(self, other: Union["MultiRange", PageSet]) -> PageSet:
+        return self.pages() & _as_pages(other)
+
+    def __sub__(self, other: Union["MultiRange", PageSet]) -> PageSet:
+        return self.pages() - _as_pages(other)
+
+    def __repr__(self) -> str:
+        return f"MultiRange({', '.join(_format_component(c) for c in self.components)!r})"
+
+
+def _as_pages(r: Union[MultiRange, PageSet]) -> PageSet:
+    return r.pages() if isinstance(r, MultiRange) else r
+
+
+def _format_component(comp: Component) -> str:
+    if isinstance(comp, int):
+        return str(comp)
+    start = "" if comp.start is None else str(comp.start)
+    stop = "" if comp.stop is None else str(comp.stop)
+    if comp.step is None or comp.step == 1:
+        return f"{start}:{stop}"
+    return f"{start}:{stop}:{comp.step}"
+
+
+def parse_component(pat: str) -> Component:
+    """解析单个组件
 
-def parse_component(pat: str) -> range:
+    :returns: 单个页码为 ``int``；两端都给出的区间为 ``range``；
+        省略了某一端的区间为 ``slice``，需要绑定页数后才能确定范围
+    """
     if m := re.fullmatch(r"-?\d+", pat):
         # 单个数字
-        num = int(m[0])
-        return range(num, num + 1)
-    elif m := re.fullmatch(r"(-?\d+)?:(-?\d+)?", pat):
-        start = int(m[1])
-        stop = int(m[2])
-        return range(start, stop)
-    elif m := re.fullmatch(r"(-?\d+)?:(-?\d+)?:(-?\d+)", pat):
-        start = int(m[1])
-        stop = int(m[2])
-        step = int(m[3])
-        return range(start, stop, step)
+        return int(m[0])
+    elif m := re.fullmatch(r"(-?\d+)?:(-?\d+)?(?::(-?\d+)?)?", pat):
+        start, stop, step = (None if g is None else int(g) for g in m.groups())
+        if step == 0:
+            raise RangeParseError(f"{pat!r}: step cann't be zero")
+        if start is not None and stop is not None:
+            return range(start, stop, 1 if step is None else step)
+        return slice(start, stop, step)
     else:
         raise RangeParseError(f"{pat!r} cann't represent a range")
@@ -0,0 +1,277 @@
+"""``pdfwork serve``：常驻的任务服务
+
+每次运行 ``pdfwork`` 都要启动解释器并导入 typer、tqdm 与 pikepdf，
+处理大量小文件时，这些开销往往超过任务本身。服务端预先启动一个进程池，
+工作进程在启动时就导入好 :mod:`pdfwork.actions` ，之后每个任务只需调用对应的 ``action_*`` 函数。
+
+协议见 :mod:`pdfwork.client` 。并发与排队都有上限：
+
++ 同时运行的任务数等于工作进程数 ``jobs``
++ 等待中的任务最多 ``queue`` 个，超出时立即拒绝（HTTP 下返回 503），而不是无限排队
+
+服务端只监听 Unix 套接字（权限为 0600）或 127.0.0.1 ，任务以服务端进程的用户身份读写文件。
+"""
+import io
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import redirect_stderr
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from multiprocessing import get_context
+from typing import Any
+from typing import Dict
+from typing import Optional
+
+__all__ = ("ACTIONS", "JobServer", "serve_unix", "serve_http", "init_worker",
+           "run_job")
+
+# 可以通过服务端执行的 action_* 函数
+ACTIONS = ("merge", "split", "extract", "import_outline", "export_outline",
+           "erase_outline", "optimize", "pipe")
+
+
+def init_worker(io_mode: str):
+    "工作进程的初始化：预先导入 :mod:`pdfwork.actions` ，设置读取方式"
+    # 进度条对服务端没有意义
+    os.environ["TQDM_DISABLE"] = "1"
+    from . import access
+    from . import actions  # noqa: F401
+    access.set_mode(io_mode)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def run_job(action: str, args: Dict[str, Any], cwd: Optional[str],
+            stdin: Optional[str]) -> Dict[str, Any]:
+    """在工作进程中执行一个任务，输出与异常都转换为可以序列化的应答
+
+    返回写出的文件列表的任务（split）在应答中带有 ``outputs`` 。
+    """
+    from . import actions
+    func = getattr(actions, f"action_{action}")
+    out, err = io.StringIO(), io.StringIO()
+    start = time.perf_counter()
+    result: Dict[str, Any] = {"ok": True}
+    old_cwd, old_stdin = os.getcwd(), sys.stdin
+    try:
+        if cwd:
+            os.chdir(cwd)
+        if stdin is not None:
+            sys.stdin = io.StringIO(stdin)
+        with redirect_stdout(out), redirect_stderr(err):
+            value = func(**args)
+        if isinstance(value, list):
+            result["outputs"] = value
+    except BaseException as e:
+        # 任务中的 SystemExit（如 typer.Exit）、KeyboardInterrupt 也只是这个任务失败，不能结束工作进程
+        result = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    finally:
+        os.chdir(old_cwd)
+        sys.stdin = old_stdin
+    result.update(stdout=out.getvalue(),
+                  stderr=err.getvalue(),
+                  seconds=round(time.perf_counter() - start, 6))
+    return result
+
+
+class JobServer():
+    """管理进程池，并限制同时运行与等待的任务数
+
+    :param int jobs: 工作进程数，即同时运行的任务数
+    :param int queue: 等待中的任务数上限
+    :param str io_mode: 工作进程读取输入的方式，见 :mod:`pdfwork.access`
+    """
+
+    def __init__(self, jobs: int = 4, queue: int = 16, io_mode: str = "default"):
+        self.jobs = jobs
+        self.queue = queue
+        self.io_mode = io_mode
+        self._slots = threading.BoundedSemaphore(jobs + queue)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._done = 0
+        self._rejected = 0
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # 服务端有多个线程，使用 spawn 启动工作进程以免复制锁的状态
+        return ProcessPoolExecutor(max_workers=self.jobs,
+                                   mp_context=get_context("spawn"),
+                                   initializer=init_worker,
+                                   initargs=(self.io_mode, ))
+
+    def warm(self):
+        "启动全部工作进程，使第一个任务不必等待进程启动与导入"
+        futures = [self._executor.submit(_ping) for _ in range(self.jobs)]
+        for future in futures:
+            future.result()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ok": True,
+                "jobs": self.jobs,
+                "queue": self.queue,
+                "active": self._active,
+                "done": self._done,
+                "rejected": self._rejected,
+            }
+
+    def submit(self, request: Any) -> Dict[str, Any]:
+        """执行一个请求并返回应答，格式见 :mod:`pdfwork.client`
+
+        应答中的 ``status`` 是建议的 HTTP 状态码。
+        """
+        if not isinstance(request, dict):
+            return {"ok": False, "status": 400, "error": "请求应为 JSON 对象"}
+        action = request.get("action")
+        if action == "status":
+            return self.status()
+        args = request.get("args", {})
+        if action not in ACTIONS:
+            return {
+                "ok": False,
+                "status": 400,
+                "error": f"未知的任务 {action!r}，可选：{', '.join(ACTIONS)}"
+            }
+        if not isinstance(args, dict):
+            return {"ok": False, "status": 400, "error": "args 应为 JSON 对象"}
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            return {
+                "ok": False,
+                "status": 503,
+                "error": f"任务过多：{self.jobs} 个运行中，{self.queue} 个等待中"
+            }
+        with self._lock:
+            self._active += 1
+        try:
+            executor = self._executor
+            future = executor.submit(run_job, action, args, request.get("cwd"),
+                                     request.get("stdin"))
+            return future.result()
+        except BrokenProcessPool as e:
+            # 工作进程异常退出（例如 qpdf 崩溃），换一个新的进程池
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = self._new_executor()
+            return {"ok": False, "status": 500, "error": f"工作进程异常退出：{e}"}
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._done += 1
+            self._slots.release()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+class _UnixHandler(socketserver.StreamRequestHandler):
+    server: "_UnixServer"
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                response = {"ok": False, "status": 400, "error": f"无法解析请求：{e}"}
+            else:
+                response = self.server.jobs.submit(request)
+            self.wfile.write(
+                json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, jobs: JobServer):
+        self.jobs = jobs
+        super().__init__(path, _UnixHandler)
+
+
+class _HTTPHandler(BaseHTTPRequestHandler):
+    server: "_HTTPServer"
+
+    def _reply(self, response: Dict[str, Any]):
+        body = json.dumps(response, ensure_ascii=False).encode("utf-8")
+        self.send_response(response.get("status", 200))
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/status":
+            self._reply(self.server.jobs.status())
+        else:
+            self._reply({"ok": False, "status": 404, "error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/jobs":
+            self._reply({"ok": False, "status": 404, "error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length))
+        except ValueError as e:
+            self._reply({"ok": False, "status": 400, "error": f"无法解析请求：{e}"})
+            return
+        self._reply(self.server.jobs.submit(request))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, jobs: JobServer):
+        self.jobs = jobs
+        super().__init__(("127.0.0.1", port), _HTTPHandler)
+
+
+def serve_unix(path: str, jobs: JobServer, ready=None):
+    """在 Unix 套接字 ``path`` 上提供服务，直到被中断
+
+    :param ready: 开始监听后调用的函数，参数为服务器对象，可用于在其他线程中调用 ``shutdown()``
+    """
+    if os.path.exists(path):
+        os.unlink(path)
+    server = _UnixServer(path, jobs)
+    try:
+        os.chmod(path, 0o600)
+        if ready is not None:
+            ready(server)
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def serve_http(port: int, jobs: JobServer, ready=None):
+    """在 127.0.0.1 的 ``port`` 端口上提供 HTTP 服务，直到被中断
+
+    :param ready: 同 :func:`serve_unix`
+    """
+    server = _HTTPServer(port, jobs)
+    try:
+        if ready is not None:
+            ready(server)
+        server.serve_forever()
+    finally:
+        server.server_close()
@@ -0,0 +1,219 @@
+"""分阶段的耗时与内存记录
+
+默认不记录任何内容。调用 :func:`enable` （命令行中为 ``pdfwork --trace PATH``）后，
+每个阶段结束时写出一条记录，包括墙钟时间、CPU 时间、处理的条目数，
+以及写出记录时进程的峰值 RSS（``process_peak_rss_kib``）。
+峰值 RSS 是进程启动以来的最大值，不是该阶段自身的峰值：
+内存占用最高的阶段之后，后续阶段记录的都是同一个数值，只有超过此前的峰值时才会增长。
+没有 ``resource`` 模块的平台（Windows）上为 null。
+支持两种格式：
+
++ ``jsonl``：每行一个 JSON 对象，便于在批量任务之间汇总
++ ``chrome``：Chrome trace-event 格式，可以用 ``chrome://tracing`` 或 Perfetto 打开
+
+用法::
+
+    with trace.phase("save"):
+        pdf.save(output)
+
+    # 交错执行的阶段可以多次进入同一个 Span，最后一次性写出
+    opening = trace.span("open_inputs")
+    for path in paths:
+        with opening:
+            pdf = Pdf.open(path)
+        ...
+    opening.finish(items=len(paths))
+"""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import IO
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+from typing import TypeVar
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore
+
+__all__ = ("FORMATS", "enable", "disable", "span", "phase", "timed", "Span")
+
+T = TypeVar("T")
+
+FORMATS = ("jsonl", "chrome")
+
+
+def _peak_rss() -> Optional[int]:
+    "进程启动以来的峰值 RSS，单位为 KiB，无法获取时为 None"
+    # Linux 上 ru_maxrss 在 exec 之后仍然保留父进程的数值，优先读取 VmHWM
+    try:
+        with open("/proc/self/status", "rt") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 上以字节为单位
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+class Tracer:
+    """将阶段记录写入文件
+
+    :param str path: 输出文件路径
+    :param str fmt: 输出格式，见 :data:`FORMATS`
+    """
+
+    def __init__(self, path: str, fmt: str = "jsonl"):
+        if fmt not in FORMATS:
+            raise ValueError(f"未知的记录格式 {fmt!r}，可选：{', '.join(FORMATS)}")
+        self.fmt = fmt
+        self.file: IO[str] = open(path, "at" if fmt == "jsonl" else "wt",
+                                  encoding="utf-8")
+        self.lock = threading.Lock()
+        self.first = True
+        if fmt == "chrome":
+            # trace-event 的 JSON 数组格式允许省略结尾的 ]，因此可以边运行边写出
+            self.file.write("[\n")
+
+    def write(self, span: "Span"):
+        peak = _peak_rss()
+        if self.fmt == "jsonl":
+            record = {
+                "phase": span.name,
+                "start": span.start,
+                "wall": span.wall,
+                "cpu": span.cpu,
+                "process_peak_rss_kib": peak,
+                "items": span.items,
+                "pid": os.getpid(),
+            }
+            line = json.dumps(record, ensure_ascii=False) + "\n"
+        else:
+            event = {
+                "name": span.name,
+                "ph": "X",
+                "ts": span.start * 1e6,
+                "dur": span.wall * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {
+                    "cpu": span.cpu,
+                    "process_peak_rss_kib": peak,
+                    "items": span.items,
+                },
+            }
+            line = ("" if self.first else ",\n") + json.dumps(
+                event, ensure_ascii=False)
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+            self.first = False
+
+    def close(self):
+        if self.fmt == "chrome":
+            self.file.write("\n]\n")
+        self.file.close()
+
+
+_tracer: Optional[Tracer] = None
+
+
+def enable(path: str, fmt: str = "jsonl"):
+    """开始记录，``jsonl`` 格式会追加到已有的文件末尾
+    """
+    global _tracer
+    disable()
+    _tracer = Tracer(path, fmt)
+
+
+def disable():
+    """停止记录并关闭输出文件
+    """
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+        _tracer = None
+
+
+class Span:
+    """一个阶段的累计耗时，可以多次进入
+
+    :param str name: 阶段名
+    """
+    __slots__ = ("name", "start", "wall", "cpu", "items", "_wall0", "_cpu0")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start: float = 0.0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.items = 0
+        self._wall0 = 0.0
+        self._cpu0 = 0.0
+
+    def __enter__(self) -> "Span":
+        if not self.start:
+            self.start = time.time()
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wall += time.perf_counter() - self._wall0
+        self.cpu += time.process_time() - self._cpu0
+
+    def add(self, items: int = 1):
+        "增加处理的条目数"
+        self.items += items
+
+    def finish(self, items: Optional[int] = None):
+        """写出这个阶段的记录
+
+        :param items: 处理的条目数，为 None 时使用 :meth:`add` 累计的数值
+        """
+        if items is not None:
+            self.items = items
+        if _tracer is not None:
+            _tracer.write(self)
+
+
+def span(name: str) -> Span:
+    "创建一个需要手动 :meth:`Span.finish` 的阶段"
+    return Span(name)
+
+
+@contextmanager
+def phase(name: str, items: Optional[int] = None) -> Iterator[Span]:
+    """记录一个连续执行的阶段，退出时写出记录
+
+    :param items: 处理的条目数，也可以在阶段内通过 :meth:`Span.add` 累计
+    """
+    s = Span(name)
+    with s:
+        yield s
+    s.finish(items)
+
+
+def timed(iterable: Iterable[T], s: Span) -> Iterator[T]:
+    """将取出每个元素的耗时计入 ``s``，并将元素数累计为条目数
+
+    适用于 :func:`pdfwork.parallel.prefetch_open` 这类在迭代时打开文件的生成器。
+    """
+    it = iter(iterable)
+    while True:
+        with s:
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+        s.add()
+        yield item
@@ -1,51 +1,150 @@
 import re
 from pathlib import Path
-from typing import Callable
+from sys import stdin
+from typing import Dict
 from typing import List
 from typing import Optional
+from typing import Tuple
+from typing import Union
 
 # mypy 无法导入类型声明
-from pikepdf import Outline as PikeOutline  # type: ignore
+from pikepdf import Array  # type: ignore
+from pikepdf import Dictionary
+from pikepdf import Name
+from pikepdf import Object
+from pikepdf import Outline as PikeOutline
 from pikepdf import OutlineItem
 from pikepdf import Pdf
+from pikepdf import String
 
+from .access import is_stdin
+from .outline import AnyOutline
 from .outline import Outline
+from .outline import OutlineStore
+from .outline import iter_outline
 
-__all__ = ("import_outline", "export_outline")
+__all__ = ("import_outline", "import_outline_bulk", "export_outline",
+           "export_outline_store", "OutlineMerger", "PageIndex")
 
 
 def export_outline(pdf: Pdf, pike: PikeOutline) -> Outline:
     """将 pdf 中的书签导出为一个 Outline 树
+
+    书签的目标可以是 ``/Dest`` 数组、命名目标或 GoTo 动作，都通过 :class:`PageIndex` 解析为页码，
+    无法解析的目标视为第 1 页。
+    """
+    return export_outline_store(pdf, pike).to_outline()
+
+
+def export_outline_store(pdf: Pdf, pike: PikeOutline) -> OutlineStore:
+    """与 :func:`export_outline` 相同，但结果保存在 :class:`OutlineStore` 中
     """
-    root = Outline(-1, "OUTLINE ROOT", 0)
-    pn_map = make_pagenum_search_table(pdf)
+    store = OutlineStore()
+    index = PageIndex(pdf)
 
-    def tree_copy(subtree: List[OutlineItem], level: int):
-        nonlocal root
+    # (父节点编号, 书签列表, 层级)
+    stack = [(0, pike.root, 0)]
+    while stack:
+        parent, subtree, level = stack.pop()
         for oi in subtree:
-            # Destination 结构为 [pageid, action, action_args]
-            # https://www.adobe.com/content/dam/acom/en/devnet/acrobat/pdfs/PDF32000_2008.pdf
-            # 374 页，第 12.3.2.2 章
-            pageid = oi.destination[0].to_json().decode()
-            pn = pn_map(pageid)
+            pn = index.item_page(oi)
             pn = pn if pn else 0
-            o = Outline(level, oi.title, pn + 1)
-            root.add_node(o, o.indent)
-            tree_copy(oi.children, level + 1)
+            node = store.append(parent, level, oi.title, pn + 1)
+            if oi.children:
+                stack.append((node, oi.children, level + 1))
+
+    return store
+
+
+def import_outline_bulk(pdfw: Pdf, root: AnyOutline, offset: int):
+    """将大纲导入到 pdf 中，结果与 :func:`import_outline` 相同。
+
+    不经过 pikepdf 的 ``OutlineItem``，而是遍历一遍大纲树，直接构建 ``/Outlines`` 下的字典，
+    并在遍历的同时填好 ``/First``、``/Last``、``/Next``、``/Prev``、``/Count`` 链接。
+    不使用递归，适合数万条书签、层级很深的大纲树。
 
-    tree_copy(pike.root, 0)
+    所有书签都是展开的，因此 ``/Count`` 为全部后代的数目。
+    如果文档中已有书签，新的书签追加在已有书签之后。
 
-    return root
+    :param root: 大纲树，可以是 :class:`Outline` 或 :class:`OutlineStore`
+
+    :raises IndexError: 页码超出文档的范围
+    """
+    pages = pdfw.pages
+    npages = len(pages)
+    page_objs: Dict[int, Object] = {}
+
+    if "/Outlines" in pdfw.Root:
+        outlines = pdfw.Root.Outlines
+    else:
+        outlines = pdfw.make_indirect(Dictionary(Type=Name.Outlines))
+        pdfw.Root.Outlines = outlines
+    existing = outlines.get("/Last")
+
+    # 每层的序号，用于生成 1.2.3 式的编号
+    seq: List[int] = []
+    # 从 /Outlines 出发的路径：(书签, 该书签的最后一个子书签, 创建时已创建的书签数)
+    chain: List[List] = [[outlines, existing, 0]]
+    created = 0
+
+    def close(entry: List):
+        # 在一个书签的全部后代都创建之后，其后代数就是期间创建的书签数
+        item, _, start = entry
+        if entry is not chain[0]:
+            item.Count = created - start
+
+    for depth, o in iter_outline(root):
+        if depth < len(seq):
+            del seq[depth + 1:]
+            seq[depth] += 1
+        else:
+            seq.append(1)
+        while len(chain) > depth + 1:
+            close(chain.pop())
+
+        n = o.index + offset - 1
+        if not 0 <= n < npages:
+            raise IndexError(f"页码 {o.index} 加上偏移量 {offset} 后超出文档的范围 1~{npages}")
+        if n not in page_objs:
+            page_objs[n] = getattr(pages[n], "obj", pages[n])
+
+        seqn = ".".join([f"{i}" for i in seq])
+        parent_entry = chain[-1]
+        parent, prev, _ = parent_entry
+        item = pdfw.make_indirect(
+            Dictionary(
+                Title=String(f"{seqn} {o.title}"),
+                # 跳转效果：适应页面
+                Dest=Array([page_objs[n], Name.Fit]),
+                Parent=parent))
+        if prev is None:
+            parent.First = item
+        else:
+            prev.Next = item
+            item.Prev = prev
+        parent.Last = item
+        parent_entry[1] = item
 
+        created += 1
+        chain.append([item, None, created])
 
-def import_outline(pdfw: Pdf, root: Outline, offset: int):
+    while len(chain) > 1:
+        close(chain.pop())
+    outlines.Count = outlines.get("/Count", 0) + created
+
+
+def import_outline(pdfw: Pdf, root: Union[Outline, OutlineStore], offset: int):
     """将大纲导入到 pdf 中。
+
+    递归地创建 pikepdf 的 ``OutlineItem``，书签很多时请使用 :func:`import_outline_bulk`。
     """
+    if isinstance(root, OutlineStore):
+        root = root.to_outline()
     with pdfw.open_outline() as outlines:
         pikeroot = outlines.root
         seq = [1]
         stack = [root]
-        bookmarks = [None]
+        bookmarks: List[Optional[OutlineItem]] = [None]
 
         def import_sub(o: Outline):
             nonlocal seq
@@ -94,31 +193,257 @@ def import_outline(pdfw: Pdf, root: Outline, offset: int):
             import_sub(node)
 
 
-def make_pagenum_search_table(pdf: Pdf) -> Callable[[str], Optional[int]]:
-    """构建 《Page Object 标识符》 => 《页码》 查询表。
+class OutlineMerger:
+    """合并文档时保留各个输入文件的书签。
+
+    每个输入文件的页面追加到合并后的文档之后，趁它还打开着调用 :meth:`add` ：
+    按照 ``/First``、``/Next`` 链接非递归地遍历其书签，通过 :class:`PageIndex`
+    将目标解析为页码，加上之前各文件的总页数后指向合并后文档中的页面。
+    目标数组中的显示方式与参数（如 ``/XYZ`` 的坐标）、标题、颜色、字体样式与展开状态都会保留；
+    无法解析的目标（如外部链接）会被丢弃，只保留标题。
 
-    返回一个可执行对象，输入标识符便返回对应的页码。
+    全部文件处理完之后调用 :meth:`finish` 填好 ``/Count`` ，之后与页面一起保存，不需要再次打开、保存文件。
+
+    :param Pdf pdfw: 合并后的文档
     """
-    id2num = {}
 
-    for i, page in enumerate(pdf.pages):
-        identifier = page.to_json().decode()
-        id2num[identifier] = i
+    def __init__(self, pdfw: Pdf):
+        self.pdfw = pdfw
+        self._items: List[Dictionary] = []
+        # 每个书签的父书签序号，-1 表示 /Outlines
+        self._parents: List[int] = []
+        self._open: List[bool] = []
+        # 父书签序号 => 最后一个子书签
+        self._last: Dict[int, Dictionary] = {}
+        if "/Outlines" in pdfw.Root:
+            self._root = pdfw.Root.Outlines
+            # 新的书签追加在已有书签之后
+            if "/Last" in self._root:
+                self._last[-1] = self._root.Last
+        else:
+            self._root = pdfw.make_indirect(Dictionary(Type=Name.Outlines))
+
+    def _append(self, parent: int, item: Dictionary, is_open: bool) -> int:
+        item = self.pdfw.make_indirect(item)
+        item.Parent = self._items[parent] if parent >= 0 else self._root
+        prev = self._last.get(parent)
+        if prev is None:
+            item.Parent.First = item
+        else:
+            prev.Next = item
+            item.Prev = prev
+        item.Parent.Last = item
+        self._last[parent] = item
+        self._items.append(item)
+        self._parents.append(parent)
+        self._open.append(is_open)
+        return len(self._items) - 1
+
+    def add(self, pdfr: Pdf, offset: int, title: Optional[str] = None) -> int:
+        """复制 ``pdfr`` 的书签，目标页码加上 ``offset``
+
+        :param int offset: ``pdfr`` 的第一页在合并后文档中的页码（从 0 开始）
+        :param title: 不为 None 时，先添加一个以此为标题、指向该文件第一页的书签，
+            该文件的书签都作为它的子书签
+        :returns: 复制的书签数，不包括 ``title``
+        """
+        pages = self.pdfw.pages
+        parent = -1
+        if title is not None and len(pdfr.pages) > 0:
+            page = pages[offset]
+            parent = self._append(
+                -1,
+                Dictionary(Title=String(title),
+                           Dest=Array([getattr(page, "obj", page), Name.Fit])),
+                True)
+
+        outlines = pdfr.Root.get("/Outlines")
+        first = outlines.get("/First") if outlines is not None else None
+        if first is None:
+            return 0
+
+        index = PageIndex(pdfr)
+        count = 0
+        seen = set()
+        # (源书签, 新的父书签序号)，先处理子书签再处理后续的兄弟书签，即按先序创建
+        stack: List[Tuple[Object, int]] = [(first, parent)]
+        while stack:
+            src, new_parent = stack.pop()
+            # 损坏的文件中链接可能成环
+            if src.objgen in seen:
+                continue
+            seen.add(src.objgen)
+
+            item = Dictionary(Title=src.get("/Title", String("")))
+            for key in ("/C", "/F"):
+                if key in src:
+                    item[key] = src[key]
+            dest = src.get("/Dest")
+            action = src.get("/A")
+            if dest is None and action is not None and action.get(
+                    "/S") == Name.GoTo:
+                dest = action.get("/D")
+            explicit = index.explicit(dest) if dest is not None else None
+            pn = index.resolve(explicit) if explicit is not None else None
+            if pn is not None and 0 <= pn < len(pdfr.pages):
+                page = pages[offset + pn]
+                view = list(explicit[1:]) or [Name.Fit]
+                item.Dest = Array([getattr(page, "obj", page), *view])
+
+            node = self._append(new_parent, item, src.get("/Count", 0) >= 0)
+            count += 1
+            if "/Next" in src:
+                stack.append((src.Next, new_parent))
+            if "/First" in src:
+                stack.append((src.First, node))
+        return count
+
+    def finish(self) -> int:
+        """填写各个书签的 ``/Count`` ，并将书签写入文档
+
+        :returns: 书签总数
+        """
+        # 展开时可见的后代数，按先序的逆序累加到父书签上
+        visible = [0] * len(self._items)
+        total = 0
+        for i in reversed(range(len(self._items))):
+            item, parent = self._items[i], self._parents[i]
+            if visible[i]:
+                item.Count = visible[i] if self._open[i] else -visible[i]
+            shown = 1 + (visible[i] if self._open[i] else 0)
+            if parent >= 0:
+                visible[parent] += shown
+            else:
+                total += shown
+        if self._items:
+            self._root.Count = self._root.get("/Count", 0) + total
+            self.pdfw.Root.Outlines = self._root
+        return len(self._items)
+
 
-    def query(pageid: str) -> Optional[int]:
-        return id2num.get(pageid, None)
+class PageIndex:
+    """《页面对象编号》 => 《页码》 查询表。
+
+    以页面对象的 ``(编号, 代数)`` 为键，不需要序列化任何对象。
+    查询表与命名目标表都在第一次需要时才建立，没有书签的文档不会产生任何开销。
+    """
 
-    return query
+    def __init__(self, pdf: Pdf):
+        self.pdf = pdf
+        self._pages: Optional[Dict[Tuple[int, int], int]] = None
+        self._names: Optional[Dict[str, Object]] = None
+
+    def page_number(self, page: Object) -> Optional[int]:
+        """返回页面对象的页码（从 0 开始），不是本文档的页面时返回 None
+        """
+        if self._pages is None:
+            self._pages = {
+                getattr(p, "obj", p).objgen: i
+                for i, p in enumerate(self.pdf.pages)
+            }
+        return self._pages.get(getattr(page, "obj", page).objgen, None)
+
+    def explicit(self, dest) -> Optional[Array]:
+        """解析命名目标，返回 ``[页面, 显示方式, 参数...]`` 形式的目标数组
+
+        :param dest: ``/Dest`` 数组、命名目标（名称或字符串），或者含有 ``/D`` 的字典
+        """
+        # 有限次解引用，避免命名目标互相引用造成死循环
+        for _ in range(8):
+            if isinstance(dest, Dictionary):
+                dest = dest.get("/D")
+            elif isinstance(dest, Name):
+                dest = self.named_destinations().get(str(dest)[1:])
+            elif isinstance(dest, (String, str)):
+                dest = self.named_destinations().get(str(dest))
+            elif isinstance(dest, Array) and len(dest) > 0:
+                return dest
+            else:
+                return None
+        return None
+
+    def resolve(self, dest) -> Optional[int]:
+        """解析一个目标，返回页码（从 0 开始）
+
+        :param dest: 同 :meth:`explicit`
+        """
+        dest = self.explicit(dest)
+        if dest is None:
+            return None
+        # Destination 结构为 [pageid, action, action_args]
+        # https://www.adobe.com/content/dam/acom/en/devnet/acrobat/pdfs/PDF32000_2008.pdf
+        # 374 页，第 12.3.2.2 章
+        target = dest[0]
+        if isinstance(target, int):
+            # 远程目标用整数表示页码
+            return target
+        return self.page_number(target)
+
+    def item_page(self, item: OutlineItem) -> Optional[int]:
+        """返回书签指向的页码（从 0 开始），支持 ``/Dest`` 与 GoTo 动作
+        """
+        if item.destination is not None:
+            return self.resolve(item.destination)
+        action = item.action
+        if action is not None and action.get("/S") == Name.GoTo:
+            return self.resolve(action.get("/D"))
+        return None
+
+    def named_destinations(self) -> Dict[str, Object]:
+        """收集文档中的命名目标：``/Root /Dests`` 字典与 ``/Root /Names /Dests`` 名称树
+        """
+        if self._names is None:
+            names: Dict[str, Object] = {}
+            root = self.pdf.Root
+            if "/Dests" in root:
+                for k, v in root.Dests.items():
+                    # 键为名称，去掉开头的 /
+                    names[k[1:]] = v
+            if "/Names" in root and "/Dests" in root.Names:
+                stack = [root.Names.Dests]
+                while stack:
+                    node = stack.pop()
+                    if "/Kids" in node:
+                        stack.extend(node.Kids)
+                    if "/Names" in node:
+                        pairs = node.Names
+                        for i in range(0, len(pairs) - 1, 2):
+                            names[str(pairs[i])] = pairs[i + 1]
+            self._names = names
+        return self._names
+
+
+def read_paths(inputs: List[str]) -> List[str]:
+    """读取需要处理的一系列文件路径，并检查它们是否存在。
+
+    :param inputs: 当输入一组路径时，直接使用这些路径；
+        当输入以 ``@`` 开头的文件名（如 ``@files.txt``）时，从中按行读取文件路径；
+        当为空时，从 stdin 按行读取文件路径。
+    """
+    if len(inputs) == 0:
+        # 从 stdin 读取文件路径
+        return check_paths_exists([i.rstrip("\n") for i in stdin.readlines()])
+    elif len(inputs) == 1 and inputs[0].startswith("@"):
+        # 从 @file.list 读取文件路径
+        with open(inputs[0], "rt", encoding="utf-8") as file_list:
+            return check_paths_exists(
+                [i.rstrip("\n") for i in file_list.readlines()])
+    else:
+        return check_paths_exists(inputs)
 
 
 def check_paths_exists(paths: List[str]) -> List[str]:
-    """检查文件是否存在
+    """检查文件是否存在，``-`` 表示 stdin，至多出现一次
     """
     valid = []
     invalid = []
+    stdin_used = False
     for i, p in enumerate(paths):
         path = Path(p)
-        if path.exists():
+        if is_stdin(p) and not stdin_used:
+            stdin_used = True
+            valid.append(p)
+        elif path.exists() and not is_stdin(p):
             valid.append(path.absolute().as_posix())
         else:
             invalid.append((i, p))
@@ -0,0 +1,70 @@
+import pytest
+from pikepdf import Dictionary
+from pikepdf import Name
+from pikepdf import Pdf
+
+
+def write_sample_pdf(path, pages: int, tag: str = ""):
+    """生成一个每页内容都不相同的测试用 PDF 文件"""
+    pdf = Pdf.new()
+    for i in range(pages):
+        pdf.add_blank_page()
+        pdf.pages[-1].Contents = pdf.make_stream(
+            f"BT /F1 12 Tf ({tag}{i}) Tj ET".encode())
+    pdf.save(path)
+    return path
+
+
+def write_shared_resources_pdf(path, pages=6, inherited=False):
+    """所有页面共用一个资源字典；第 0 页还使用一个没有自己资源的表单
+
+    :param bool inherited: 为 True 时资源字典放在页面树的根节点上，由页面继承
+    """
+    pdf = Pdf.new()
+    fonts = Dictionary()
+    images = Dictionary()
+    for i in range(pages):
+        fonts[f"/F{i}"] = pdf.make_indirect(
+            Dictionary(Type=Name.Font, Subtype=Name.Type1, BaseFont=Name(f"/Font{i}")))
+        images[f"/Im{i}"] = pdf.make_stream(bytes([i]) * 1000,
+                                            Type=Name.XObject,
+                                            Subtype=Name.Image,
+                                            Width=10,
+                                            Height=100,
+                                            ColorSpace=Name.DeviceGray,
+                                            BitsPerComponent=8)
+    images["/Fm"] = pdf.make_stream(b"/GS0 gs /Im5 Do",
+                                    Type=Name.XObject,
+                                    Subtype=Name.Form,
+                                    BBox=[0, 0, 10, 10])
+    resources = pdf.make_indirect(
+        Dictionary(Font=fonts,
+                   XObject=images,
+                   ExtGState=Dictionary(GS0=Dictionary(CA=0.5)),
+                   ProcSet=[Name.PDF]))
+    for i in range(pages):
+        pdf.add_blank_page()
+        page = pdf.pages[-1]
+        content = f"BT /F{i} 12 Tf (p{i}) Tj ET /Im{i} Do"
+        if i == 0:
+            content += " /Fm Do"
+        page.Contents = pdf.make_stream(content.encode())
+        if inherited:
+            del page.obj["/Resources"]
+        else:
+            page.Resources = resources
+    if inherited:
+        pdf.Root.Pages.Resources = resources
+    pdf.save(path)
+    return path
+
+
+def page_texts(path):
+    """读取每一页的内容流，用于比较页面顺序"""
+    with Pdf.open(path) as pdf:
+        return [page.Contents.read_bytes() for page in pdf.pages]
+
+
+@pytest.fixture
+def sample_pdf(tmp_path):
+    return write_sample_pdf(tmp_path / "sample.pdf", 10)
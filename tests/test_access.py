@@ -0,0 +1,80 @@
+import io
+import os
+import threading
+
+import pytest
+
+from pdfwork import access
+
+from .conftest import page_texts
+
+
+@pytest.fixture(autouse=True)
+def reset_mode():
+    yield
+    access.set_mode("default")
+
+
+def _feed(path, fd):
+    with open(path, "rb") as src, os.fdopen(fd, "wb") as dst:
+        dst.write(src.read())
+
+
+@pytest.mark.parametrize("mode", access.MODES)
+def test_open_modes(sample_pdf, mode):
+    access.set_mode(mode)
+    with access.open_pdf(sample_pdf) as pdf:
+        assert [p.Contents.read_bytes() for p in pdf.pages] == page_texts(sample_pdf)
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        access.set_mode("direct")
+
+
+def test_open_pipe(sample_pdf):
+    r, w = os.pipe()
+    feeder = threading.Thread(target=_feed, args=(sample_pdf, w))
+    feeder.start()
+    with os.fdopen(r, "rb") as src:
+        pdf = access.open_stream(src)
+    feeder.join()
+    assert len(pdf.pages) == 10
+
+
+def test_open_stdin(sample_pdf, monkeypatch):
+    with open(sample_pdf, "rb") as src:
+        # 重定向自普通文件的 stdin 不需要复制
+        assert access.spool(src) is src
+        monkeypatch.setattr("sys.stdin", io.TextIOWrapper(src))
+        with access.open_pdf("-") as pdf:
+            assert len(pdf.pages) == 10
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="需要命名管道")
+def test_open_fifo(tmp_path, sample_pdf):
+    fifo = tmp_path / "fifo"
+    os.mkfifo(fifo)
+    feeder = threading.Thread(
+        target=lambda: _feed(sample_pdf, os.open(fifo, os.O_WRONLY)),
+        daemon=True)
+    feeder.start()
+    with access.open_pdf(fifo) as pdf:
+        assert len(pdf.pages) == 10
+    feeder.join()
+
+
+def test_merge_stdin(tmp_path, sample_pdf, monkeypatch):
+    from pdfwork.actions import action_merge
+    from pdfwork.actions import action_optimize
+
+    out = tmp_path / "out.pdf"
+    with open(sample_pdf, "rb") as src:
+        monkeypatch.setattr("sys.stdin", io.TextIOWrapper(src))
+        action_merge(["-", str(sample_pdf)], str(out))
+    assert page_texts(out) == page_texts(sample_pdf) * 2
+
+    with pytest.raises(FileNotFoundError):
+        action_merge(["-", "-"], str(out))
+    with pytest.raises(ValueError):
+        action_optimize("-")
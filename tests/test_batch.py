@@ -0,0 +1,118 @@
+import json
+import os
+
+import pytest
+
+from pdfwork.batch import Job
+from pdfwork.batch import load_manifest
+from pdfwork.batch import read_log
+from pdfwork.batch import run_batch
+
+from .conftest import page_texts
+from .conftest import write_sample_pdf
+
+
+@pytest.fixture
+def inputs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_sample_pdf(tmp_path / "a.pdf", 2, "a")
+    write_sample_pdf(tmp_path / "b.pdf", 8, "b")
+    return tmp_path
+
+
+def _write_jsonl(path, records):
+    path.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+    return str(path)
+
+
+def _log(path):
+    with open(path, "rt", encoding="utf-8") as file:
+        return {r["id"]: r for r in map(json.loads, file)}
+
+
+def test_run_and_resume(inputs):
+    manifest = _write_jsonl(inputs / "m.jsonl", [
+        {"id": "ab", "action": "merge", "args": {"inputs": ["a.pdf", "b.pdf"], "output": "ab.pdf"}},
+        {"id": "bad", "action": "extract", "args": {"input": "a.pdf", "pages": "99", "output": "x.pdf"}},
+        {"action": "optimize", "args": {"src": "b.pdf"}},
+    ])
+    jobs = load_manifest(manifest)
+    assert [j.id for j in jobs] == ["ab", "bad", "3"]
+
+    log = str(inputs / "m.log")
+    summary = run_batch(jobs, log, workers=2, retries=1)
+    assert summary == {"ok": 2, "failed": 1, "timeout": 0, "crashed": 0, "skipped": 0}
+    assert len(page_texts(inputs / "ab.pdf")) == 10
+    records = _log(log)
+    assert records["ab"]["output_bytes"] == os.path.getsize(inputs / "ab.pdf")
+    assert records["3"]["output_bytes"] == os.path.getsize(inputs / "b_.pdf")
+    assert records["bad"]["status"] == "failed"
+    assert records["bad"]["attempts"] == 2
+    assert "error" in records["bad"]
+    assert read_log(log) == {"ab", "3"}
+
+    summary = run_batch(load_manifest(manifest), log, workers=2, retries=0, resume=True)
+    assert summary["skipped"] == 2
+    assert summary["failed"] == 1
+    with open(log, "rt", encoding="utf-8") as file:
+        assert len(file.readlines()) == 4
+
+
+def test_csv_manifest(inputs):
+    manifest = inputs / "m.csv"
+    manifest.write_text("id,action,inputs,output,src,all_streams,jobs\n"
+                        "c1,merge,a.pdf;b.pdf,c.pdf,,,\n"
+                        ",optimize,,,b.pdf,yes,2\n",
+                        encoding="utf-8")
+    jobs = load_manifest(str(manifest))
+    assert jobs[0].args == {"inputs": ["a.pdf", "b.pdf"], "output": "c.pdf"}
+    assert jobs[0].size == os.path.getsize("a.pdf") + os.path.getsize("b.pdf")
+    assert jobs[1].id == "3"
+    assert jobs[1].args == {"src": "b.pdf", "all_streams": True, "jobs": 2}
+
+
+def test_manifest_problems(inputs):
+    manifest = _write_jsonl(inputs / "m.jsonl", [
+        {"id": "x", "action": "nope"},
+        {"id": "y", "action": "merge", "args": {"output": "y.pdf"}},
+        {"id": "z", "action": "optimize", "args": {"src": "a.pdf"}},
+        {"id": "z", "action": "optimize", "args": {"src": "b.pdf"}},
+    ])
+    with pytest.raises(ValueError) as e:
+        load_manifest(manifest)
+    problems = str(e.value).splitlines()
+    assert len(problems) == 3
+    assert "'nope'" in problems[0]
+    assert "inputs" in problems[1]
+    assert "'z'" in problems[2]
+
+
+def test_largest_first():
+    jobs = [Job("s", "optimize", size=1), Job("l", "optimize", size=100), Job("m", "optimize", size=10)]
+    assert [j.id for j in sorted(jobs)] == ["l", "m", "s"]
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="需要命名管道")
+def test_timeout(inputs):
+    # 读取没有写入端的命名管道会一直阻塞
+    os.mkfifo("toc.txt")
+    jobs = [Job("slow", "import_outline", {"pdf": "a.pdf", "input": "toc.txt", "output": "o.pdf"})]
+    log = str(inputs / "m.log")
+    summary = run_batch(jobs, log, workers=1, retries=0, timeout=0.5)
+    assert summary["timeout"] == 1
+    assert _log(log)["slow"]["status"] == "timeout"
+
+
+def test_split_output_size(inputs):
+    # 两个拆分任务写入同一个目录，各自只统计自己写出的文件
+    (inputs / "out").mkdir()
+    jobs = [
+        Job("a", "split", {"input": "a.pdf", "outputs": "out/a.pdf"}),
+        Job("b", "split", {"input": "b.pdf", "outputs": "out/b.pdf"}),
+    ]
+    log = str(inputs / "m.log")
+    assert run_batch(jobs, log, workers=2)["ok"] == 2
+    records = _log(log)
+    for name, pages in (("a", 2), ("b", 8)):
+        files = [inputs / "out" / f"{name}{i}.pdf" for i in range(pages)]
+        assert records[name]["output_bytes"] == sum(os.path.getsize(f) for f in files)
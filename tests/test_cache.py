@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+import time
+
+import pytest
+
+from pdfwork.actions import action_merge
+from pdfwork.batch import Job
+from pdfwork.batch import run_batch
+from pdfwork.cache import ResultCache
+
+from .conftest import write_sample_pdf
+
+
+@pytest.fixture
+def inputs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_sample_pdf(tmp_path / "a.pdf", 3, "a")
+    write_sample_pdf(tmp_path / "b.pdf", 2, "b")
+    return tmp_path
+
+
+def _merge_args(*inputs, **kwargs):
+    args = {"inputs": list(inputs), "output": "ab.pdf", "profile": "web"}
+    args.update(kwargs)
+    return args
+
+
+def test_key(inputs):
+    cache = ResultCache("cache")
+    key = cache.key("merge", _merge_args("a.pdf", "b.pdf"))
+    assert key is not None
+    # 与路径和并行度无关
+    shutil.copy("a.pdf", "c.pdf")
+    assert cache.key("merge", _merge_args("c.pdf", "b.pdf", jobs=4)) == key
+    assert cache.key("merge", _merge_args("b.pdf", "a.pdf")) != key
+    assert cache.key("merge", _merge_args("a.pdf", "b.pdf", profile="fast")) != key
+    # nest 时文件名是书签标题
+    nest = cache.key("merge", _merge_args("a.pdf", "b.pdf", outlines="nest"))
+    assert cache.key("merge", _merge_args("c.pdf", "b.pdf", outlines="nest")) != nest
+
+    write_sample_pdf(inputs / "c.pdf", 3, "c")
+    assert cache.key("merge", _merge_args("c.pdf", "b.pdf")) != key
+
+    # 从 stdin 读取、不支持缓存的任务、输入不存在
+    assert cache.key("merge", _merge_args()) is None
+    assert cache.key("import_outline", {"pdf": "a.pdf", "input": None, "output": "o.pdf"}) is None
+    assert cache.key("split", {"input": "a.pdf", "outputs": "."}) is None
+    assert cache.key("merge", _merge_args("missing.pdf")) is None
+
+
+def test_fetch_and_store(inputs):
+    cache = ResultCache("cache")
+    args = _merge_args("a.pdf", "b.pdf")
+    key = cache.key("merge", args)
+    assert not cache.fetch(key, "ab.pdf")
+    action_merge(**args)
+    data = (inputs / "ab.pdf").read_bytes()
+    cache.store(key, "merge", "ab.pdf")
+
+    assert cache.fetch(key, "copy.pdf")
+    assert (inputs / "copy.pdf").read_bytes() == data
+    # 再次放到同一个路径
+    assert cache.fetch(key, "copy.pdf")
+    assert sorted(os.listdir(inputs)) == ["a.pdf", "ab.pdf", "b.pdf", "cache", "copy.pdf"]
+    assert cache.stats()["hits"] == 2
+
+    # 在缓存之外改写了输出文件，结果不再有效
+    with open("copy.pdf", "ab") as file:
+        file.write(b"junk")
+    assert not cache.fetch(key, "other.pdf")
+    assert cache.stats()["entries"] == 0
+
+
+def test_prune(inputs):
+    cache = ResultCache("cache")
+    keys = []
+    for i, name in enumerate(("a.pdf", "b.pdf", "ab.pdf")):
+        if name == "ab.pdf":
+            action_merge(**_merge_args("a.pdf", "b.pdf"))
+        args = {"input": name, "pages": "0", "output": f"out{i}.pdf"}
+        key = cache.key("extract", args)
+        shutil.copy(name, f"out{i}.pdf")
+        cache.store(key, "extract", f"out{i}.pdf")
+        keys.append(key)
+        past = time.time() - 100 + i
+        os.utime(cache._paths(key)[1], (past, past))
+
+    # 使用过的结果最后淘汰
+    assert cache.fetch(keys[0], "x.pdf")
+    sizes = [os.path.getsize(f"out{i}.pdf") for i in range(3)]
+    removed, freed = cache.prune(sizes[0] + sizes[2])
+    assert (removed, freed) == (1, sizes[1])
+    assert sorted(e.key for e in cache.entries()) == sorted([keys[0], keys[2]])
+
+    assert cache.prune(0) == (2, sizes[0] + sizes[2])
+    assert cache.stats()["entries"] == 0
+
+
+def test_batch(inputs):
+    cache = ResultCache("cache")
+    jobs = [Job("ab", "merge", _merge_args("a.pdf", "b.pdf"))]
+    log = str(inputs / "m.log")
+    assert run_batch(jobs, log, workers=1, cache=cache)["ok"] == 1
+    os.unlink("ab.pdf")
+    jobs[0].attempts = 0
+    assert run_batch(jobs, log, workers=1, cache=cache)["ok"] == 1
+    assert os.path.isfile("ab.pdf")
+    with open(log, "rt", encoding="utf-8") as file:
+        assert json.loads(file.read())["cached"] is True
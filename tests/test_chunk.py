@@ -0,0 +1,57 @@
+import pytest
+from pikepdf import Pdf
+
+from pdfwork.actions import action_split
+from pdfwork.chunk import SizeEstimator
+from pdfwork.chunk import chunk_by_bytes
+from pdfwork.chunk import chunk_by_pages
+
+from .conftest import page_texts
+from .conftest import write_shared_resources_pdf
+
+
+@pytest.mark.parametrize("total, pages, expect", [
+    (10, 4, [(0, 4), (4, 8), (8, 10)]),
+    (3, 5, [(0, 3)]),
+    (0, 2, []),
+])
+def test_chunk_by_pages(total, pages, expect):
+    assert chunk_by_pages(total, pages) == expect
+
+
+def _texts(paths):
+    return [text for path in paths for text in page_texts(path)]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_split_chunk_pages(sample_pdf, tmp_path, jobs):
+    action_split(str(sample_pdf), (tmp_path / "out").as_posix(), jobs=jobs,
+                 chunk_pages=4)
+    parts = sorted((tmp_path / "out").iterdir())
+    assert [p.name for p in parts] == ["0.pdf", "1.pdf", "2.pdf"]
+    assert [len(page_texts(p)) for p in parts] == [4, 4, 2]
+    assert _texts(parts) == page_texts(sample_pdf)
+
+
+@pytest.mark.parametrize("profile", ["fast", "web", "compact"])
+def test_split_chunk_size(tmp_path, profile):
+    src = write_shared_resources_pdf(tmp_path / "src.pdf", pages=30)
+    limit = 12 * 1024
+    with Pdf.open(src) as pdf:
+        plan = chunk_by_bytes(pdf, limit, SizeEstimator())
+    assert len(plan) > 1
+    assert [start for start, _, _ in plan[1:]] == [stop for _, stop, _ in plan[:-1]]
+
+    action_split(str(src), (tmp_path / "out").as_posix(),
+                 profile=profile,
+                 chunk_size=limit)
+    parts = sorted((tmp_path / "out").iterdir())
+    assert len(parts) <= len(plan)
+    assert all(p.stat().st_size <= limit for p in parts)
+    assert _texts(parts) == page_texts(src)
+
+
+def test_split_chunk_size_oversized_page(sample_pdf, tmp_path, capsys):
+    action_split(str(sample_pdf), (tmp_path / "out").as_posix(), chunk_size=100)
+    assert len(list((tmp_path / "out").iterdir())) == 10
+    assert "WARNING" in capsys.readouterr().err
@@ -0,0 +1,53 @@
+import subprocess
+import sys
+
+import pytest
+
+from .conftest import write_sample_pdf
+
+# 运行命令后列出已导入的重量级模块
+_SCRIPT = """
+import sys
+from pdfwork.cli import cli_main
+try:
+    cli_main(sys.argv[1:], prog_name="pdfwork")
+finally:
+    heavy = ("pikepdf", "tqdm", "rich", "pdfwork.actions", "pdfwork.parallel", "pdfwork.dedup")
+    print(" ".join(m for m in heavy if m in sys.modules), file=sys.stderr)
+"""
+
+
+def _loaded(*args):
+    proc = subprocess.run([sys.executable, "-c", _SCRIPT, *args],
+                          capture_output=True,
+                          text=True)
+    assert proc.returncode == 0, proc.stderr
+    return proc.stdout, proc.stderr.split()
+
+
+@pytest.mark.parametrize("args", [["--help"], ["outline", "--help"], ["version"]])
+def test_lightweight_commands(args):
+    _, loaded = _loaded(*args)
+    assert loaded == []
+
+
+def test_version():
+    out, _ = _loaded("version")
+    assert out.splitlines()[1].startswith("+ pikepdf ")
+
+
+def test_outline_export_imports(tmp_path):
+    pdf = write_sample_pdf(tmp_path / "a.pdf", 2, "a")
+    _, loaded = _loaded("outline", "export", str(pdf))
+    assert loaded == ["pikepdf", "pdfwork.actions"]
+
+
+def test_cache_hit_skips_pikepdf(tmp_path):
+    a = write_sample_pdf(tmp_path / "a.pdf", 2, "a")
+    b = write_sample_pdf(tmp_path / "b.pdf", 2, "b")
+    args = ["--cache", str(tmp_path / "cache"), "merge", str(a), str(b), "-o", str(tmp_path / "ab.pdf")]
+    _, loaded = _loaded(*args)
+    assert "pikepdf" in loaded
+    _, loaded = _loaded(*args)
+    assert loaded[0].startswith("使用缓存的结果：")
+    assert loaded[1:] == []
@@ -0,0 +1,166 @@
+import zlib
+
+import pytest
+from pikepdf import Dictionary
+from pikepdf import Name
+from pikepdf import Pdf
+
+from pdfwork.actions import action_merge
+from pdfwork.actions import action_optimize
+from pdfwork.dedup import MergeDedup
+from pdfwork.dedup import dedup_images
+from pdfwork.dedup import dedup_streams
+
+from .conftest import page_texts
+
+
+def make_image(pdf, data: bytes):
+    return pdf.make_stream(zlib.compress(data),
+                           Type=Name.XObject,
+                           Subtype=Name.Image,
+                           Width=4,
+                           Height=4,
+                           BitsPerComponent=8,
+                           ColorSpace=Name.DeviceGray,
+                           Filter=Name.FlateDecode)
+
+
+def make_image_pdf(path, pages: int):
+    pdf = Pdf.new()
+    shared = make_image(pdf, b"\x01" * 16)
+    for i in range(pages):
+        pdf.add_blank_page()
+        page = pdf.pages[-1]
+        page.Resources = Dictionary(XObject=Dictionary(
+            # 每页一个内容相同的独立对象，以及一个共享对象
+            Im0=make_image(pdf, b"\x00" * 16),
+            Im1=shared,
+        ))
+        page.Contents = pdf.make_stream(b"q 4 0 0 4 0 0 cm /Im0 Do /Im1 Do Q")
+    pdf.save(path)
+    return path
+
+
+def test_dedup_images(tmp_path):
+    path = make_image_pdf(tmp_path / "images.pdf", 5)
+    with Pdf.open(path) as pdf:
+        stats = dedup_images(pdf, jobs=2)
+        assert stats.objects == 4
+        assert stats.bytes == 4 * len(zlib.compress(b"\x00" * 16))
+        objgens = {page.Resources.XObject.Im0.objgen for page in pdf.pages}
+        assert len(objgens) == 1
+
+
+def test_optimize_removes_duplicates(tmp_path):
+    path = make_image_pdf(tmp_path / "images.pdf", 5)
+    out = tmp_path / "optimized.pdf"
+    action_optimize(path.as_posix(), out.as_posix())
+    with Pdf.open(out) as pdf:
+        images = {
+            page.Resources.XObject[name].objgen
+            for page in pdf.pages for name in ("/Im0", "/Im1")
+        }
+        assert len(images) == 2
+
+
+def make_font_pdf(path, pages: int, direct_font: bool = False):
+    """每页引用一个表单对象，表单对象引用内容相同但彼此独立的字体程序"""
+    pdf = Pdf.new()
+    for i in range(pages):
+        pdf.add_blank_page()
+        page = pdf.pages[-1]
+        fontfile = pdf.make_stream(b"fake font program", Length1=17)
+        font = Dictionary(Type=Name.Font,
+                          Subtype=Name.TrueType,
+                          BaseFont=Name.Fake,
+                          FontDescriptor=Dictionary(Type=Name.FontDescriptor,
+                                                    FontName=Name.Fake,
+                                                    FontFile2=fontfile))
+        if not direct_font:
+            font = pdf.make_indirect(font)
+        form = pdf.make_stream(b"BT /F1 12 Tf (x) Tj ET",
+                               Type=Name.XObject,
+                               Subtype=Name.Form,
+                               BBox=[0, 0, 10, 10],
+                               Resources=Dictionary(Font=Dictionary(F1=font)))
+        page.Resources = Dictionary(XObject=Dictionary(Fm0=form))
+        page.Contents = pdf.make_stream(b"/Fm0 Do")
+    pdf.save(path)
+    return path
+
+
+def _fontfiles(pdf):
+    return {
+        page.Resources.XObject.Fm0.Resources.Font.F1.FontDescriptor.FontFile2.
+        objgen
+        for page in pdf.pages
+    }
+
+
+def test_dedup_streams(tmp_path):
+    path = make_font_pdf(tmp_path / "fonts.pdf", 4)
+    with Pdf.open(path) as pdf:
+        size = len(pdf.pages[0].Resources.XObject.Fm0.Resources.Font.F1.
+                   FontDescriptor.FontFile2.read_raw_bytes())
+        stats = dedup_streams(pdf, jobs=2)
+        assert stats["FontFile"].objects == 3
+        assert stats["FontFile"].bytes == 3 * size
+        # 字体的描述字典仍是独立的，因此表单对象的字典不同，不会被合并
+        assert "Form" not in stats
+        assert len(_fontfiles(pdf)) == 1
+
+
+def test_dedup_streams_follows_references(tmp_path):
+    # 字体字典直接嵌入表单的资源中，字体程序去重后，表单对象也成为重复对象
+    path = make_font_pdf(tmp_path / "fonts.pdf", 4, direct_font=True)
+    with Pdf.open(path) as pdf:
+        stats = dedup_streams(pdf, jobs=2)
+        assert stats["FontFile"].objects == 3
+        assert stats["Form"].objects == 3
+        assert len({page.Resources.XObject.Fm0.objgen
+                    for page in pdf.pages}) == 1
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_merge_dedup_across_files(tmp_path, capsys, jobs):
+    paths = [
+        make_font_pdf(tmp_path / f"{i}.pdf", 2, direct_font=True).as_posix()
+        for i in range(5)
+    ]
+    out = tmp_path / "merged.pdf"
+    action_merge(paths, out.as_posix(), jobs=jobs, group_size=2, dedup=True)
+    assert len(page_texts(out)) == 10
+    with Pdf.open(out) as pdf:
+        assert len(_fontfiles(pdf)) == 1
+        assert len({page.Resources.XObject.Fm0.objgen
+                    for page in pdf.pages}) == 1
+    # 每页的字体程序、表单与内容流都相同，只保留第一页的
+    assert "去除了 27 个重复对象" in capsys.readouterr().err
+
+
+def test_merge_without_dedup(tmp_path, capsys):
+    paths = [
+        make_font_pdf(tmp_path / f"{i}.pdf", 2).as_posix() for i in range(2)
+    ]
+    out = tmp_path / "merged.pdf"
+    action_merge(paths, out.as_posix())
+    with Pdf.open(out) as pdf:
+        assert len(_fontfiles(pdf)) == 4
+    assert "重复对象" not in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("max_entries, found", [(None, 1), (4, 1), (2, 0)])
+def test_merge_dedup_index_bound(max_entries, found):
+    pdf = Pdf.new()
+    # 图像 a、b、a，每页的内容流各不相同
+    for i, data in enumerate((b"\x0a", b"\x0b", b"\x0a")):
+        pdf.add_blank_page()
+        page = pdf.pages[-1]
+        page.Resources = Dictionary(XObject=Dictionary(Im0=make_image(pdf, data * 16)))
+        page.Contents = pdf.make_stream(f"q {i + 1} 0 0 4 0 0 cm /Im0 Do Q".encode())
+    deduper = MergeDedup(pdf, max_entries)
+    for page in pdf.pages:
+        deduper.add([page])
+    # 索引只能容纳两个摘要时，a 在再次出现之前已经被淘汰
+    assert deduper.stats.objects == found
+    assert len(deduper._index) <= (max_entries or 5)
@@ -0,0 +1,50 @@
+import pytest
+from pikepdf import Dictionary
+from pikepdf import Name
+from pikepdf import Pdf
+
+from pdfwork.actions import action_extract
+from pdfwork.range import RangeParseError
+
+from .conftest import page_texts
+
+
+def test_extract_order(tmp_path, sample_pdf):
+    out = tmp_path / "out.pdf"
+    action_extract(str(sample_pdf), "0:2,-3:,5,0", str(out))
+    texts = page_texts(sample_pdf)
+    assert page_texts(out) == texts[0:2] + texts[-3:] + [texts[5], texts[0]]
+
+
+def test_extract_shares_resources(tmp_path):
+    src = tmp_path / "img.pdf"
+    pdf = Pdf.new()
+    image = pdf.make_stream(b"\x00" * 300,
+                            Type=Name.XObject,
+                            Subtype=Name.Image,
+                            Width=10,
+                            Height=10,
+                            ColorSpace=Name.DeviceRGB,
+                            BitsPerComponent=8)
+    for _ in range(4):
+        pdf.add_blank_page()
+        pdf.pages[-1].Resources = Dictionary(XObject=Dictionary(Im0=image))
+    pdf.save(src)
+
+    out = tmp_path / "out.pdf"
+    action_extract(str(src), "1:", str(out))
+    with Pdf.open(out) as pdf:
+        assert len(pdf.pages) == 3
+        assert len({p.Resources.XObject.Im0.objgen for p in pdf.pages}) == 1
+
+
+@pytest.mark.parametrize("pages, error", [
+    ("10", IndexError),
+    ("20:", IndexError),
+    ("1-3", RangeParseError),
+])
+def test_extract_errors(tmp_path, sample_pdf, pages, error):
+    out = tmp_path / "out.pdf"
+    with pytest.raises(error):
+        action_extract(str(sample_pdf), pages, str(out))
+    assert not out.exists()
@@ -0,0 +1,154 @@
+"测试两种导入书签的方式结果一致"
+import io
+import os
+import threading
+
+import pytest
+from pikepdf import OutlineItem
+from pikepdf import Pdf
+
+from pdfwork.actions import action_import_outline
+from pdfwork.outline import decode_outline_store
+from pdfwork.outline import iter_outline
+from pdfwork.outline import outline_decode
+from pdfwork.utils import import_outline
+from pdfwork.utils import import_outline_bulk
+
+from .conftest import write_sample_pdf
+
+text = """\
+前言 @ 1
+第一章 @ 2
+    第一节 @ 2
+        引言
+        概述 @ 3
+    第二节 @ 4
+第二章 @ 5
+    第一节 @ 6
+附录 @ 8
+"""
+
+
+def dump(pdf: Pdf):
+    """以 (层级, 标题, 页码, 是否展开, /Count) 列出全部书签，并检查链接的一致性"""
+    pages = {p.obj.objgen: i for i, p in enumerate(pdf.pages)}
+    result = []
+    outlines = pdf.Root.Outlines
+    assert outlines.Type == "/Outlines"
+
+    def walk(parent, level):
+        count = 0
+        item = parent.get("/First")
+        prev = None
+        while item is not None:
+            assert item.Parent.objgen == parent.objgen
+            if prev is not None:
+                assert item.Prev.objgen == prev.objgen
+            else:
+                assert "/Prev" not in item
+            result.append((level, str(item.Title),
+                           pages[item.Dest[0].objgen], str(item.Dest[1]),
+                           int(item.Count)))
+            count += 1 + walk(item, level + 1)
+            prev, item = item, item.get("/Next")
+        if prev is not None:
+            assert parent.Last.objgen == prev.objgen
+        return count
+
+    total = walk(outlines, 0)
+    assert int(outlines.Count) == total
+    return result
+
+
+@pytest.mark.parametrize("existing", [False, True])
+@pytest.mark.parametrize("offset", [0, 1])
+def test_bulk_matches_recursive(tmp_path, existing, offset):
+    path = write_sample_pdf(tmp_path / "in.pdf", 10)
+    results = []
+    for func in (import_outline, import_outline_bulk):
+        with Pdf.open(path) as pdf:
+            if existing:
+                with pdf.open_outline() as outline:
+                    outline.root.append(OutlineItem("已有", 0))
+            func(pdf, outline_decode(text), offset)
+            out = tmp_path / f"{func.__name__}.pdf"
+            pdf.save(out)
+        with Pdf.open(out) as pdf:
+            results.append(dump(pdf))
+    assert results[0] == results[1]
+    assert results[1][-1][1] == "4 附录"
+
+
+def test_bulk_deep_tree(tmp_path):
+    # 递归实现会超出默认的递归深度
+    depth = 3000
+    lines = ["    " * i + f"t{i} @ 1\n" for i in range(depth)]
+    root = outline_decode(lines)
+    assert [d for d, _ in iter_outline(root)] == list(range(depth))
+
+    path = write_sample_pdf(tmp_path / "in.pdf", 1)
+    with Pdf.open(path) as pdf:
+        import_outline_bulk(pdf, root, 0)
+        assert int(pdf.Root.Outlines.Count) == depth
+        assert int(pdf.Root.Outlines.First.Count) == depth - 1
+
+
+def test_bulk_page_out_of_range(tmp_path):
+    path = write_sample_pdf(tmp_path / "in.pdf", 3)
+    with Pdf.open(path) as pdf:
+        with pytest.raises(IndexError):
+            import_outline_bulk(pdf, outline_decode("a @ 4\n"), 0)
+
+
+def test_bulk_accepts_store(tmp_path):
+    path = write_sample_pdf(tmp_path / "in.pdf", 10)
+    results = []
+    for root in (outline_decode(text), decode_outline_store(text)):
+        with Pdf.open(path) as pdf:
+            import_outline_bulk(pdf, root, 0)
+            out = tmp_path / "out.pdf"
+            pdf.save(out)
+        with Pdf.open(out) as pdf:
+            results.append(dump(pdf))
+    assert results[0] == results[1]
+
+
+def _import_from(tmp_path, pdf):
+    toc = tmp_path / "toc.txt"
+    toc.write_text(text, encoding="utf-8")
+    out = tmp_path / "out.pdf"
+    action_import_outline(str(pdf), str(toc), str(out))
+    with Pdf.open(out) as result:
+        return dump(result)
+
+
+def test_action_stdin(tmp_path, monkeypatch):
+    path = write_sample_pdf(tmp_path / "in.pdf", 10)
+    with open(path, "rb") as src:
+        monkeypatch.setattr("sys.stdin", io.TextIOWrapper(src))
+        assert len(_import_from(tmp_path, "-")) == 9
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="需要命名管道")
+def test_action_fifo(tmp_path):
+    path = write_sample_pdf(tmp_path / "in.pdf", 10)
+    fifo = tmp_path / "fifo"
+    os.mkfifo(fifo)
+
+    def feed():
+        with open(path, "rb") as src, open(fifo, "wb") as dst:
+            dst.write(src.read())
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+    assert len(_import_from(tmp_path, fifo)) == 9
+    feeder.join()
+
+
+def test_action_in_place(tmp_path):
+    path = write_sample_pdf(tmp_path / "in.pdf", 10)
+    toc = tmp_path / "toc.txt"
+    toc.write_text(text, encoding="utf-8")
+    action_import_outline(str(path), str(toc), str(path))
+    with Pdf.open(path) as result:
+        assert len(dump(result)) == 9
@@ -0,0 +1,94 @@
+import pytest
+from pikepdf import Array
+from pikepdf import Dictionary
+from pikepdf import Name
+from pikepdf import OutlineItem
+from pikepdf import Pdf
+from pikepdf import String
+
+from pdfwork.actions import action_merge
+from pdfwork.utils import export_outline_store
+
+from .conftest import page_texts
+from .conftest import write_sample_pdf
+
+
+def _outlined_pdf(path, tag):
+    """3 页，书签：第 1 章（关闭）/ 1.1 -> 第 2 页 /XYZ；附录 -> 命名目标第 3 页"""
+    write_sample_pdf(path, 3, tag)
+    with Pdf.open(path, allow_overwriting_input=True) as pdf:
+        pages = [p.obj for p in pdf.pages]
+        pdf.Root.Dests = Dictionary(App=Array([pages[2], Name.Fit]))
+        with pdf.open_outline() as outline:
+            chapter = OutlineItem(f"{tag} 第 1 章", 0)
+            section = OutlineItem(f"{tag} 1.1")
+            section.destination = Array([pages[1], Name.XYZ, 0, 700, 0])
+            chapter.children.append(section)
+            outline.root.append(chapter)
+            outline.root.append(OutlineItem(f"{tag} 附录", Name("/App")))
+        pdf.Root.Outlines.First.Count = -1
+        pdf.save(path)
+    return path
+
+
+def _dump(path):
+    with Pdf.open(path) as pdf:
+        store = export_outline_store(pdf, pdf.open_outline())
+        return [(depth, store.titles[i], store.indexes[i])
+                for depth, i in store.walk()]
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    return [_outlined_pdf(tmp_path / f"{tag}.pdf", tag) for tag in "abcde"]
+
+
+def _expect(tags, nest):
+    expect = []
+    for i, tag in enumerate(tags):
+        offset = i * 3
+        depth = 1 if nest else 0
+        if nest:
+            expect.append((0, tag, offset + 1))
+        expect += [(depth, f"{tag} 第 1 章", offset + 1),
+                   (depth + 1, f"{tag} 1.1", offset + 2),
+                   (depth, f"{tag} 附录", offset + 3)]
+    return expect
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+@pytest.mark.parametrize("nest", [False, True])
+def test_merge_keeps_outlines(tmp_path, inputs, jobs, nest):
+    output = tmp_path / "merged.pdf"
+    action_merge([str(p) for p in inputs], str(output), jobs=jobs, group_size=2,
+                 outlines="nest" if nest else "keep")
+    assert page_texts(output) == [t for p in inputs for t in page_texts(p)]
+    assert _dump(output) == _expect("abcde", nest)
+
+    with Pdf.open(output) as pdf:
+        first = pdf.Root.Outlines.First
+        if nest:
+            first = first.First
+        # 展开状态与显示方式保留
+        assert first.Count == -1
+        assert list(first.First.Dest[1:]) == [Name.XYZ, 0, 700, 0]
+        assert first.First.Dest[0].objgen == pdf.pages[1].obj.objgen
+        # 可见的书签：每个文件中关闭的章节下的书签不计入
+        assert pdf.Root.Outlines.Count == (3 if nest else 2) * 5
+
+
+def test_merge_drops_outlines_by_default(tmp_path, inputs):
+    output = tmp_path / "merged.pdf"
+    action_merge([str(p) for p in inputs[:2]], str(output))
+    assert _dump(output) == []
+
+
+def test_merge_without_outlines(tmp_path):
+    a = write_sample_pdf(tmp_path / "a.pdf", 2, "a")
+    b = _outlined_pdf(tmp_path / "b.pdf", "b")
+    output = tmp_path / "merged.pdf"
+    action_merge([str(a), str(b)], str(output), outlines="keep")
+    assert _dump(output) == [(0, "b 第 1 章", 3), (1, "b 1.1", 4), (0, "b 附录", 5)]
+    with Pdf.open(output) as pdf:
+        assert pdf.Root.Outlines.Count == 2
+        assert isinstance(pdf.Root.Outlines.First.Title, String)
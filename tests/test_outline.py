@@ -1,8 +1,19 @@
 "测试解析目录的能力"
+import io
+import json
+
 import pytest
 
+from pdfwork.exceptions import OutlineParseError
+from pdfwork.outline import FORMATS
 from pdfwork.outline import Outline
+from pdfwork.outline import OutlineStore
+from pdfwork.outline import decode_outline_format
+from pdfwork.outline import decode_outline_store
+from pdfwork.outline import iter_outline
 from pdfwork.outline import outline_decode
+from pdfwork.outline import outline_encode
+from pdfwork.outline import outline_encode_iter
 from pdfwork.outline import parse_line
 
 test_str = [
@@ -85,3 +96,100 @@ def test_outline_decode_tab():
     out = outline_decode(src)
     print(f"{out!r}")
     assert tree == out
+
+
+def test_outline_decode_stream():
+    src = "".join(test_str)
+    assert outline_decode(io.StringIO(src)) == outline_decode(src)
+
+
+def test_outline_decode_attach_like_add_node():
+    # 首行就有缩进、以及回退到比首行更浅的层级时，与 Outline.add_node 的行为一致
+    src = "    a @ 1\n        b\n    c\nd\n"
+    expect = Outline(-1, 'OUTLINE ROOT', 0)
+    for line in src.splitlines():
+        oi, _ = parse_line(line, "    ", 1, None)
+        expect.add_node(oi, oi.indent)
+    assert outline_decode(src) == expect
+
+
+def test_outline_decode_error_linenum():
+    src = "a @ 1\n    b\n\n            c\n"
+    with pytest.raises(OutlineParseError) as e:
+        outline_decode(io.StringIO(src))
+    assert e.value.args[1].linenum == 3
+    assert e.value.args[1].text == "            c"
+
+
+def test_outline_eq_children():
+    assert Outline(0, "a", 1, [Outline(1, "b", 1)]) != Outline(0, "a", 1)
+    assert Outline(0, "a", 1) != Outline(0, "a", 1, [Outline(1, "b", 1)])
+
+
+def test_outline_store():
+    src = "".join(test_str)
+    store = decode_outline_store(io.StringIO(src))
+    tree = outline_decode(src)
+    assert len(store) == len(test_str)
+    assert store == tree
+    assert store.to_outline() == tree
+    assert OutlineStore.from_outline(tree) == store
+    assert outline_encode(store) == outline_encode(tree)
+
+    [first] = store.node().children
+    assert (first.indent, first.title, first.index) == test_str_out[0]
+    assert [c.title for c in first.children] == ["晶体学概述", "晶体与晶体材料"]
+    assert first.children[0].parent.id == first.id
+
+
+def test_outline_store_deep():
+    depth = 5000
+    store = OutlineStore()
+    parent = 0
+    for i in range(depth):
+        parent = store.append(parent, i, f"t{i}", 1)
+    assert [d for d, _ in store.walk()] == list(range(depth))
+    assert store.to_outline() == store
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_outline_formats_roundtrip(fmt):
+    store = decode_outline_store("".join(test_str))
+    text = "".join(outline_encode_iter(store, fmt))
+    assert decode_outline_format(io.StringIO(text), fmt) == store
+    assert decode_outline_format(text, fmt) == store
+
+
+def test_outline_format_json():
+    src = "a @ 1\n    b @ 2\n        c @ 3\nd @ 4\n"
+    data = json.loads("".join(outline_encode_iter(decode_outline_store(src), "json")))
+    assert data == [
+        {"title": "a", "page": 1, "children": [
+            {"title": "b", "page": 2, "children": [
+                {"title": "c", "page": 3, "children": []}]}]},
+        {"title": "d", "page": 4, "children": []},
+    ]
+    assert json.loads("".join(outline_encode_iter(OutlineStore(), "json"))) == []
+
+
+def test_outline_format_inherit_page():
+    store = decode_outline_format('[{"title": "a", "page": 3}, {"title": "b"}]', "json")
+    assert [n.index for _, n in iter_outline(store)] == [3, 3]
+
+
+@pytest.mark.parametrize("fmt, src", [
+    ("jsonl", '{"level": 0, "title": "a"}\n{"level": 2, "title": "b"}\n'),
+    ("jsonl", '{"level": 0, "title": "a", "page": "1"}\n'),
+    ("jsonl", "not json\n"),
+    ("json", '[{"page": 1}]'),
+    ("json", '{"title": "a"}'),
+    ("json", "[\n{]"),
+])
+def test_outline_format_errors(fmt, src):
+    with pytest.raises(OutlineParseError):
+        decode_outline_format(src, fmt)
+
+
+def test_outline_format_unknown():
+    with pytest.raises(ValueError):
+        outline_encode_iter(OutlineStore(), "yaml")
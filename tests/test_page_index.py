@@ -0,0 +1,50 @@
+from pikepdf import Array
+from pikepdf import Dictionary
+from pikepdf import Name
+from pikepdf import OutlineItem
+from pikepdf import Pdf
+from pikepdf import String
+
+from pdfwork.utils import PageIndex
+from pdfwork.utils import export_outline
+
+from .conftest import write_sample_pdf
+
+
+def test_export_outline_destinations(tmp_path):
+    path = write_sample_pdf(tmp_path / "dests.pdf", 6)
+    with Pdf.open(path, allow_overwriting_input=True) as pdf:
+        pages = [p.obj for p in pdf.pages]
+        # PDF 1.1 风格的 /Dests 字典，以及 PDF 1.2 风格的名称树
+        pdf.Root.Dests = Dictionary(Old=Array([pages[2], Name.Fit]))
+        pdf.Root.Names = Dictionary(Dests=Dictionary(Kids=[
+            Dictionary(Names=[String("new"),
+                              Dictionary(D=[pages[3], Name.Fit])])
+        ]))
+        with pdf.open_outline() as outline:
+            outline.root.append(OutlineItem("array", 1))
+            outline.root.append(OutlineItem("old", Name("/Old")))
+            outline.root.append(OutlineItem("new", String("new")))
+            goto = OutlineItem("goto")
+            goto.action = Dictionary(S=Name.GoTo, D=[pages[4], Name.Fit])
+            outline.root.append(goto)
+            outline.root[0].children.append(OutlineItem("missing", Name("/None")))
+        pdf.save()
+
+    with Pdf.open(path) as pdf:
+        with pdf.open_outline() as outline:
+            root = export_outline(pdf, outline)
+    assert [(o.title, o.index) for o in root.children] == [
+        ("array", 2), ("old", 3), ("new", 4), ("goto", 5)
+    ]
+    assert [(o.title, o.index) for o in root.children[0].children] == [
+        ("missing", 1)
+    ]
+
+
+def test_page_index_is_lazy(sample_pdf):
+    with Pdf.open(sample_pdf) as pdf:
+        index = PageIndex(pdf)
+        assert index._pages is None
+        assert index.page_number(pdf.pages[7]) == 7
+        assert index._names is None
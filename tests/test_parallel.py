@@ -0,0 +1,115 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pdfwork.actions import action_merge
+from pdfwork.actions import action_split
+from pdfwork.exceptions import MergeError
+from pdfwork.exceptions import SplitError
+from pdfwork.parallel import _wait_in_order
+from pdfwork.parallel import make_shards
+from pdfwork.parallel import merge_tree
+from pdfwork.parallel import prefetch_open
+
+from .conftest import page_texts
+from .conftest import write_sample_pdf
+
+
+@pytest.mark.parametrize("total, count, expect", [
+    (10, 3, [(0, 4), (4, 7), (7, 10)]),
+    (2, 4, [(0, 1), (1, 2)]),
+    (5, 1, [(0, 5)]),
+])
+def test_make_shards(total, count, expect):
+    assert make_shards(total, count) == expect
+
+
+def test_split_parallel_same_as_serial(sample_pdf, tmp_path):
+    action_split(str(sample_pdf), (tmp_path / "serial").as_posix(), jobs=1)
+    action_split(str(sample_pdf), (tmp_path / "parallel").as_posix(), jobs=3)
+
+    serial = sorted(p.name for p in (tmp_path / "serial").iterdir())
+    parallel = sorted(p.name for p in (tmp_path / "parallel").iterdir())
+    assert serial == parallel
+    assert len(serial) == 10
+    for name in serial:
+        assert page_texts(tmp_path / "serial" / name) == page_texts(
+            tmp_path / "parallel" / name)
+
+
+def test_merge_tree_keeps_order(tmp_path):
+    inputs = [
+        write_sample_pdf(tmp_path / f"in{i:02d}.pdf", 2, f"f{i}-").as_posix()
+        for i in range(11)
+    ]
+    action_merge(inputs, (tmp_path / "serial.pdf").as_posix())
+    action_merge(inputs, (tmp_path / "tree.pdf").as_posix(),
+                 jobs=2,
+                 group_size=2)
+
+    assert len(page_texts(tmp_path / "tree.pdf")) == 22
+    assert page_texts(tmp_path / "serial.pdf") == page_texts(tmp_path /
+                                                             "tree.pdf")
+    # 中间文件已被清理
+    assert sorted(p.name for p in tmp_path.iterdir()
+                  if not p.name.startswith("in")) == ["serial.pdf", "tree.pdf"]
+
+
+@pytest.mark.parametrize("prefetch", [0, 1, 3])
+def test_prefetch_open_keeps_order(tmp_path, prefetch):
+    inputs = [
+        write_sample_pdf(tmp_path / f"in{i}.pdf", 1, f"f{i}-").as_posix()
+        for i in range(5)
+    ]
+    seen = []
+    for path, pdf in prefetch_open(inputs, prefetch):
+        seen.append(path)
+        pdf.close()
+    assert seen == inputs
+
+
+def test_prefetch_open_reports_path(tmp_path):
+    good = write_sample_pdf(tmp_path / "good.pdf", 1).as_posix()
+    bad = tmp_path / "bad.pdf"
+    bad.write_bytes(b"not a pdf")
+    with pytest.raises(MergeError) as e:
+        for _, pdf in prefetch_open([good, bad.as_posix(), good], 2):
+            pdf.close()
+    assert e.value.path == bad.as_posix()
+
+
+def _shard(page: int, delay: float, fail: bool) -> int:
+    time.sleep(delay)
+    if fail:
+        raise SplitError(page, "bad")
+    return page
+
+
+def test_wait_in_order_reports_first_error():
+    # 后面的分片先出错，报告的仍然是前面的分片
+    done = []
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [
+            executor.submit(_shard, 0, 0.0, False),
+            executor.submit(_shard, 1, 0.3, True),
+            executor.submit(_shard, 2, 0.0, True),
+            executor.submit(_shard, 3, 0.0, False),
+        ]
+        with pytest.raises(SplitError) as e:
+            _wait_in_order(futures, SplitError, done.append)
+    assert e.value.page == 1
+    assert sorted(done) == [0, 3]
+
+
+def test_merge_tree_reports_first_bad_file(tmp_path):
+    inputs = [
+        write_sample_pdf(tmp_path / f"in{i}.pdf", 1).as_posix() for i in range(8)
+    ]
+    for i in (2, 6):
+        (tmp_path / f"in{i}.pdf").write_bytes(b"not a pdf")
+    workdir = tmp_path / "work"
+    workdir.mkdir()
+    with pytest.raises(MergeError) as e:
+        merge_tree(inputs, workdir.as_posix(), jobs=2, group_size=2)
+    assert e.value.path == inputs[2]
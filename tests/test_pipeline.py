@@ -0,0 +1,107 @@
+import json
+
+import pikepdf
+import pytest
+
+from pdfwork.actions import action_export_outline
+from pdfwork.actions import action_extract
+from pdfwork.actions import action_import_outline
+from pdfwork.actions import action_merge
+from pdfwork.actions import action_optimize
+from pdfwork.actions import action_pipe
+from pdfwork.exceptions import PipelineError
+from pdfwork.pipeline import Pipeline
+from pdfwork.pipeline import Step
+
+from .conftest import page_texts
+from .conftest import write_sample_pdf
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    a = write_sample_pdf(tmp_path / "a.pdf", 4, "a")
+    b = write_sample_pdf(tmp_path / "b.pdf", 3, "b")
+    toc = tmp_path / "toc.txt"
+    toc.write_text("x @ 1\n    y @ 2\nz @ 4\n", encoding="utf-8")
+    return str(a), str(b), str(toc)
+
+
+def _outline(path, capsys):
+    capsys.readouterr()
+    action_export_outline(str(path), None)
+    return capsys.readouterr().out
+
+
+def test_pipe_matches_separate_commands(tmp_path, capsys, inputs):
+    a, b, toc = inputs
+    # 依次运行各个命令，每一步都保存一次
+    action_merge([a, b], str(tmp_path / "1.pdf"))
+    action_extract(str(tmp_path / "1.pdf"), "1:3,-2:", str(tmp_path / "2.pdf"))
+    action_import_outline(str(tmp_path / "2.pdf"), toc, str(tmp_path / "3.pdf"))
+    action_optimize(str(tmp_path / "3.pdf"), str(tmp_path / "4.pdf"))
+
+    action_pipe(steps=[f"merge {a} {b}", "extract 1:3,-2:", f"import_outline {toc}",
+                       "optimize"],
+                output=str(tmp_path / "piped.pdf"))
+    assert page_texts(tmp_path / "piped.pdf") == page_texts(tmp_path / "4.pdf")
+    assert page_texts(tmp_path / "piped.pdf") == [
+        b"BT /F1 12 Tf (%s) Tj ET" % i for i in (b"a1", b"a2", b"b1", b"b2")
+    ]
+    assert (_outline(tmp_path / "piped.pdf", capsys) == _outline(
+        tmp_path / "4.pdf", capsys) == "1 x @ 1\n    1.1 y @ 2\n2 z @ 4\n")
+
+
+def test_pipe_plan_file(tmp_path, capsys, inputs):
+    a, b, toc = inputs
+    plan = tmp_path / "plan.json"
+    plan.write_text(json.dumps({
+        "output": str(tmp_path / "out.pdf"),
+        "steps": [{"merge": {"inputs": [a]}}, "erase_outline",
+                  {"merge": {"inputs": b, "dedup": True}}]
+    }), encoding="utf-8")
+    action_pipe(str(plan), profile="fast")
+    assert page_texts(tmp_path / "out.pdf") == page_texts(a) + page_texts(b)
+
+
+def test_step_parse():
+    assert Step.parse("merge 'a b.pdf' c.pdf outlines=keep dedup=yes") == Step(
+        "merge", {"inputs": ["a b.pdf", "c.pdf"], "outlines": "keep", "dedup": "yes"})
+    assert Step.parse("extract -5:") == Step("extract", {"pages": "-5:"})
+    assert Step.parse("optimize x=1") == Step("optimize", {"": ["x=1"]})
+
+
+def test_check_reports_all_problems_without_opening(tmp_path, monkeypatch, inputs):
+    a, b, toc = inputs
+
+    def fail(*args, **kwargs):
+        raise AssertionError("检查计划时不应打开 PDF 文件")
+
+    monkeypatch.setattr(pikepdf.Pdf, "open", fail)
+    monkeypatch.setattr(pikepdf.Pdf, "new", fail)
+    pipeline = Pipeline([
+        Step("extract", {"pages": "0:1"}),
+        Step("merge", {"inputs": [a, "missing.pdf"], "jobs": "two", "dedup": 1}),
+        Step.parse("extract 1::x"),
+        Step.parse("import_outline"),
+        Step("compress"),
+    ], str(tmp_path / "out.pdf"), "tiny")
+    with pytest.raises(PipelineError) as e:
+        pipeline.run()
+    assert e.value.problems == [
+        "未知的保存方案 'tiny'，可选：fast, compact, web",
+        "第 1 步 extract：文档还是空的，第一步应当是 merge",
+        "第 2 步 merge：文件不存在 missing.pdf",
+        "第 2 步 merge：参数 jobs 应当为 int，而不是 'two'",
+        "第 2 步 merge：参数 dedup 应当为 bool，而不是 1",
+        "第 3 步 extract：无法解析页码区间 '1::x'：'1::x' cann't represent a range",
+        "第 4 步 import_outline：缺少参数 input",
+        "第 5 步：未知的步骤 'compress'，可选：merge, extract, import_outline, erase_outline, optimize",
+    ]
+    assert not (tmp_path / "out.pdf").exists()
+
+
+def test_step_failure(tmp_path, inputs):
+    a, b, toc = inputs
+    with pytest.raises(PipelineError, match="第 2 步 extract：.*"):
+        action_pipe(steps=[f"merge {a}", "extract 10"], output=str(tmp_path / "out.pdf"))
+    assert not (tmp_path / "out.pdf").exists()
@@ -0,0 +1,24 @@
+import pytest
+from pikepdf import Pdf
+
+from pdfwork.profiles import get_profile
+from pdfwork.profiles import save_pdf
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError):
+        get_profile("fastest")
+
+
+@pytest.mark.parametrize("profile, linearized", [
+    ("fast", False),
+    ("compact", False),
+    ("web", True),
+])
+def test_save_profile(sample_pdf, tmp_path, profile, linearized):
+    out = tmp_path / f"{profile}.pdf"
+    with Pdf.open(sample_pdf) as pdf:
+        save_pdf(pdf, out, profile)
+    with Pdf.open(out) as pdf:
+        assert pdf.is_linearized == linearized
+        assert len(pdf.pages) == 10
@@ -0,0 +1,53 @@
+import pytest
+from pikepdf import Pdf
+
+from pdfwork import prune
+from pdfwork.actions import action_split
+from pdfwork.prune import ResourceUsage
+from pdfwork.prune import append_pruned
+
+from .conftest import write_shared_resources_pdf
+
+
+def _resource_names(path):
+    with Pdf.open(path) as pdf:
+        resources = pdf.pages[0].Resources
+        return sorted(k for category in ("/Font", "/XObject", "/ExtGState")
+                      for k in resources.get(category, {}).keys())
+
+
+@pytest.mark.parametrize("inherited", [False, True])
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_split_prunes(tmp_path, inherited, jobs):
+    src = write_shared_resources_pdf(tmp_path / "src.pdf", inherited=inherited)
+    action_split(str(src), (tmp_path / "pruned").as_posix(), jobs=jobs)
+    action_split(str(src), (tmp_path / "full").as_posix(), jobs=jobs, prune=False)
+
+    pruned = sorted((tmp_path / "pruned").iterdir())
+    full = sorted((tmp_path / "full").iterdir())
+    assert _resource_names(pruned[0]) == ["/F0", "/Fm", "/GS0", "/Im0", "/Im5"]
+    assert _resource_names(pruned[3]) == ["/F3", "/Im3"]
+    assert len(_resource_names(full[3])) == 6 + 7 + 1
+    for a, b in zip(pruned, full):
+        assert a.stat().st_size < b.stat().st_size
+        with Pdf.open(a) as pa, Pdf.open(b) as pb:
+            assert pa.pages[0].Contents.read_bytes() == pb.pages[0].Contents.read_bytes()
+
+
+def test_shared_objects_analyzed_once(tmp_path, monkeypatch):
+    src = write_shared_resources_pdf(tmp_path / "src.pdf")
+    calls = []
+    names = prune._names
+    monkeypatch.setattr(prune, "_names", lambda obj: calls.append(obj) or names(obj))
+
+    usage = ResourceUsage()
+    with Pdf.open(src) as pdf:
+        for page in pdf.pages:
+            append_pruned(Pdf.new(), page, usage)
+        # 源文档不受影响
+        assert len(pdf.pages[0].Resources.XObject) == 7
+    # 每页的内容流各一次，共用的表单只解析一次
+    assert len(calls) == 6 + 1
+    assert usage.pages == 6
+    # 每页 14 个条目，第 0 页保留 5 个，其余各页保留 2 个
+    assert usage.removed == 9 + 5 * 12
@@ -0,0 +1,90 @@
+"测试页码区间的解析、绑定与集合运算"
+import random
+
+import pytest
+
+from pdfwork.range import MultiRange
+from pdfwork.range import PageSet
+from pdfwork.range import RangeParseError
+from pdfwork.range import parse_component
+
+
+def test_parse_component():
+    assert parse_component("3") == 3
+    assert parse_component("1:3") == range(1, 3)
+    assert parse_component("1:10:2") == range(1, 10, 2)
+    assert parse_component("1:") == slice(1, None)
+    assert parse_component(":") == slice(None, None)
+    assert parse_component("-5:") == slice(-5, None)
+    assert parse_component("::2") == slice(None, None, 2)
+    with pytest.raises(RangeParseError):
+        parse_component("1:5:0")
+    with pytest.raises(RangeParseError):
+        MultiRange("1-3")
+
+
+def test_iter_expression_order():
+    assert list(MultiRange("1,3,2")) == [1, 3, 2]
+    assert list(MultiRange("3,2:4")) == [3, 2, 3]
+    assert list(MultiRange(" 1:10:2 ")) == [1, 3, 5, 7, 9]
+    assert list(MultiRange(range(2), 5)) == [0, 1, 5]
+    with pytest.raises(ValueError):
+        list(MultiRange("1:"))
+
+
+def test_bind_like_python_slices():
+    pages = list(range(30))
+    for expr, expect in [
+        ("1:", pages[1:]),
+        (":", pages[:]),
+        ("-5:", pages[-5:]),
+        ("-1", [pages[-1]]),
+        ("25:100", pages[25:100]),
+        ("::-7", pages[::-7]),
+        ("0:3,-2:", pages[0:3] + pages[-2:]),
+    ]:
+        bound = MultiRange(expr).bind(30)
+        assert list(bound) == expect, expr
+        assert len(bound) == len(expect), expr
+    with pytest.raises(IndexError):
+        MultiRange("30").bind(30)
+
+
+def test_bind_does_not_expand():
+    bound = MultiRange("0:20,399:420,-5:").bind(10**9)
+    assert len(bound) == 20 + 21 + 5
+    assert bound.ranges()[-1] == range(10**9 - 5, 10**9)
+    assert 410 in bound and 420 not in bound and 10**9 - 1 in bound
+    assert list(bound.pages().intervals()) == [(0, 20), (399, 420),
+                                               (10**9 - 5, 10**9)]
+
+
+def test_pageset_normalize():
+    pages = MultiRange("5:8,0:3,2:5,10,9,1:10:3").bind(20).pages()
+    assert list(pages.intervals()) == [(0, 8), (9, 11)]
+    assert len(pages) == 10
+    assert list(PageSet([(3, 3)]).intervals()) == []
+    assert "1" not in pages
+
+
+def test_pageset_operations():
+    rnd = random.Random(0)
+    for _ in range(200):
+        a = PageSet((s, s + rnd.randrange(1, 8)) for s in rnd.sample(range(60), 6))
+        b = PageSet((s, s + rnd.randrange(1, 8)) for s in rnd.sample(range(60), 6))
+        sa, sb = set(a), set(b)
+        assert len(a) == len(sa)
+        for got, expect in [(a | b, sa | sb), (a & b, sa & sb), (a - b, sa - sb),
+                            (b - a, sb - sa)]:
+            assert list(got) == sorted(expect)
+            assert len(got) == len(expect)
+            assert all(i in got for i in expect)
+
+
+def test_multirange_operations_are_lazy():
+    a = MultiRange(":").bind(10**9)
+    b = MultiRange("10:20").bind(10**9)
+    diff = a - b
+    assert len(diff) == 10**9 - 10
+    assert 15 not in diff and 20 in diff
+    assert list((a & b).intervals()) == [(10, 20)]
@@ -0,0 +1,121 @@
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from pdfwork import client
+from pdfwork.server import JobServer
+from pdfwork.server import run_job
+from pdfwork.server import serve_http
+from pdfwork.server import serve_unix
+
+from .conftest import page_texts
+from .conftest import write_sample_pdf
+
+
+@pytest.fixture(scope="module")
+def jobserver():
+    jobs = JobServer(jobs=1, queue=1)
+    jobs.warm()
+    yield jobs
+    jobs.close()
+
+
+def _start(target, *args):
+    ready = threading.Event()
+    servers = []
+
+    def on_ready(server):
+        servers.append(server)
+        ready.set()
+
+    thread = threading.Thread(target=target, args=(*args, on_ready), daemon=True)
+    thread.start()
+    assert ready.wait(10)
+    return servers[0], thread
+
+
+def test_unix_jobs(tmp_path, jobserver):
+    a = write_sample_pdf(tmp_path / "a.pdf", 2, "a")
+    b = write_sample_pdf(tmp_path / "b.pdf", 3, "b")
+    sock = str(tmp_path / "s.sock")
+    server, thread = _start(serve_unix, sock, jobserver)
+    try:
+        # 相对路径按照 cwd 解析
+        response = client.request(
+            sock, {
+                "action": "merge",
+                "args": {"inputs": ["a.pdf", "b.pdf"], "output": "ab.pdf"},
+                "cwd": str(tmp_path)
+            })
+        assert response["ok"], response
+        assert page_texts(tmp_path / "ab.pdf") == page_texts(a) + page_texts(b)
+
+        response = client.submit(sock,
+                                 "import_outline",
+                                 stdin="x @ 1\n    y @ 2\n",
+                                 pdf=str(a),
+                                 input=None,
+                                 output=str(tmp_path / "o.pdf"))
+        assert response["ok"], response
+        response = client.submit(sock,
+                                 "export_outline",
+                                 pdf=str(tmp_path / "o.pdf"),
+                                 output=None)
+        assert response["stdout"] == "1 x @ 1\n    1.1 y @ 2\n"
+
+        response = client.submit(sock, "extract", input=str(a), pages="9",
+                                 output=str(tmp_path / "e.pdf"))
+        assert not response["ok"]
+        assert response["error"].startswith("IndexError")
+
+        assert client.request(sock, {"action": "rm"})["status"] == 400
+        assert client.request(sock, {"action": "status"})["done"] >= 3
+    finally:
+        server.shutdown()
+        thread.join()
+
+
+def test_http_queue_limit(tmp_path, jobserver):
+    server, thread = _start(serve_http, 0, jobserver)
+    address = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        assert client.request(address, {"action": "status"})["jobs"] == 1
+        # 占满运行与等待的名额
+        for _ in range(2):
+            assert jobserver._slots.acquire(blocking=False)
+        try:
+            response = client.submit(address, "split", input="a.pdf", outputs=".")
+            assert response["status"] == 503
+        finally:
+            for _ in range(2):
+                jobserver._slots.release()
+        assert client.request(address, {"action": "status"})["rejected"] == 1
+    finally:
+        server.shutdown()
+        thread.join()
+
+
+def test_job_exit(monkeypatch):
+    from pdfwork import actions
+
+    def bail(**args):
+        raise SystemExit(3)
+
+    monkeypatch.setattr(actions, "action_erase_outline", bail)
+    result = run_job("erase_outline", {}, None, None)
+    assert not result["ok"]
+    assert result["error"] == "SystemExit: 3"
+
+
+def test_reject_stdin_pdf(tmp_path):
+    # 在连接服务端之前就报错
+    script = "from pdfwork.cli import cli_main; cli_main(prog_name='pdfwork')"
+    args = ["--server", str(tmp_path / "none.sock"), "merge", "-", "b.pdf", "-o", "c.pdf"]
+    proc = subprocess.run([sys.executable, "-c", script, *args],
+                          capture_output=True,
+                          text=True,
+                          stdin=subprocess.DEVNULL)
+    assert proc.returncode == 2
+    assert "不能为 -" in proc.stderr
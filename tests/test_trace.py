@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from pdfwork import trace
+from pdfwork.actions import action_erase_outline
+
+
+def test_trace_jsonl(sample_pdf, tmp_path):
+    path = tmp_path / "trace.jsonl"
+    trace.enable(path.as_posix(), "jsonl")
+    try:
+        action_erase_outline(sample_pdf.as_posix(),
+                             (tmp_path / "out.pdf").as_posix())
+    finally:
+        trace.disable()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r["phase"] for r in records] == ["open_inputs", "copy_pages", "save"]
+    assert records[1]["items"] == 10
+    for r in records:
+        assert r["wall"] >= 0 and r["cpu"] >= 0 and r["process_peak_rss_kib"] > 0
+
+
+def test_trace_chrome(tmp_path):
+    path = tmp_path / "trace.json"
+    trace.enable(path.as_posix(), "chrome")
+    try:
+        opening = trace.span("open_inputs")
+        assert list(trace.timed(range(3), opening)) == [0, 1, 2]
+        opening.finish()
+        with trace.phase("save", 5):
+            pass
+    finally:
+        trace.disable()
+
+    events = json.loads(path.read_text())
+    assert [(e["name"], e["args"]["items"]) for e in events] == [
+        ("open_inputs", 3), ("save", 5)
+    ]
+    assert all(e["ph"] == "X" for e in events)
+
+
+def test_trace_disabled_writes_nothing(tmp_path):
+    with trace.phase("save") as ph:
+        ph.add(1)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        trace.enable((tmp_path / "trace").as_posix(), "xml")